@@ -1,3 +1,72 @@
+import json
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import SlowRequest
+
+
+@admin.register(SlowRequest)
+class SlowRequestAdmin(admin.ModelAdmin):
+    list_display = (
+        'created_at', 'method', 'path', 'status', 'duration',
+        'query_count', 'query_time', 'profiler',
+    )
+    list_filter = ('route', 'method', 'profiler')
+    search_fields = ('path',)
+    date_hierarchy = 'created_at'
+    fields = (
+        'created_at', 'method', 'path', 'route', 'status', 'user_id',
+        'duration', 'query_count', 'query_time', 'sql', 'profiler',
+        'profile_link', 'profile',
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='SQL')
+    def sql(self, obj):
+        return format_html(
+            '<pre style="white-space: pre-wrap">{}</pre>',
+            '\n\n'.join(
+                f'-- {item["time"] * 1000:.2f} мс\n{item["sql"]}'
+                for item in obj.queries
+            ) or json.dumps(obj.queries),
+        )
+
+    @admin.display(description='Файл профиля')
+    def profile_link(self, obj):
+        if not obj.profile:
+            return '—'
+        url = reverse('admin:api_slowrequest_profile', args=(obj.pk,))
+        return format_html('<a href="{}">Скачать</a>', url)
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/profile/',
+                self.admin_site.admin_view(self.download_profile),
+                name='api_slowrequest_profile',
+            ),
+        ] + super().get_urls()
 
-# Register your models here.
+    def download_profile(self, request, pk):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        entry = get_object_or_404(SlowRequest, pk=pk)
+        extension = 'folded' if entry.profiler == SlowRequest.SAMPLE else 'txt'
+        response = HttpResponse(
+            entry.profile, content_type='text/plain; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="profile-{entry.pk}.{extension}"'
+        )
+        return response
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import authentication, catalogue, fragments  # noqa: F401
+
+        if settings.API_WARMUP:
+            from . import warmup
+
+            warmup.run()
@@ -0,0 +1,235 @@
+"""Архив данных пользователя в ZIP.
+
+Состав архива::
+
+    profile.json          профиль
+    recipes.jsonl         рецепты пользователя в формате api/bulk.py
+    favorites.json        избранное
+    shopping_cart.json    корзина
+    subscriptions.json    подписки
+    media/blobs/...       картинки рецептов и аватар под именами из хранилища
+
+ZIP собирается на лету: ``ZipFile`` пишет в буфер без позиционирования
+(размеры и CRC членов идут в дескрипторах данных после содержимого), и
+``stream`` отдаёт накопленное каждые ``CHUNK_SIZE`` байт. Документы
+строятся пачками по первичному ключу, картинки читаются из хранилища
+кусками, так что память не зависит от объёма данных; растёт лишь
+оглавление архива — по записи на файл.
+
+Архив, который по оценке ``estimate`` больше ``USER_EXPORT_STREAM_LIMIT``
+байт, собирается фоновой задачей в личный файл пользователя
+(``foodgram.media.private_name``) и отдаётся по подписанной ссылке.
+"""
+import os
+import time
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from foodgram.media import private_name, private_storage
+from jobs.models import Job
+from jobs.queue import enqueue
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+from . import bulk
+from .renderers import FastJSONRenderer
+
+CONTENT_TYPE = 'application/zip'
+JOB = 'api.export_user_data'
+CHUNK_SIZE = 64 * 1024
+MEDIA_DIR = 'media'
+PREFIX = 'export-'
+
+# Средний размер записи для оценки архива, байты.
+RECIPE_SIZE = 2048
+ROW_SIZE = 256
+
+PROFILE_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'date_joined'
+)
+RECIPE_FIELDS = {
+    'recipe': 'recipe_id',
+    'short_code': 'recipe__short_code',
+    'name': 'recipe__name',
+    'author': 'recipe__author__username',
+}
+AUTHOR_FIELDS = {
+    'id': 'id',
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+}
+
+
+class _Pipe:
+    """Приёмник ``ZipFile``: копит записанное до ``drain``."""
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def _rows(queryset, fields):
+    """Словари ``{ключ: значение пути}`` пачками по первичному ключу."""
+    queryset = queryset.order_by('pk').values('pk', *fields.values())
+    last = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last)[:settings.BULK_CHUNK_SIZE])
+        if not chunk:
+            return
+        for row in chunk:
+            yield {key: row[path] for key, path in fields.items()}
+        last = chunk[-1]['pk']
+
+
+def _json_array(rows):
+    renderer = FastJSONRenderer()
+    separator = b'['
+    for row in rows:
+        yield separator + renderer.render(row)
+        separator = b','
+    yield b'[]' if separator == b'[' else b']'
+
+
+def _profile(user):
+    renderer = FastJSONRenderer()
+    data = {field: getattr(user, field) for field in PROFILE_FIELDS}
+    data['avatar'] = user.avatar.name or None
+    yield renderer.render(data)
+
+
+def _images(user):
+    """Имена картинок пользователя в хранилище, без повторов."""
+    names = Recipe.objects.filter(author=user).order_by(
+        'image'
+    ).values_list('image', flat=True).distinct()
+    for name in names.iterator(chunk_size=settings.BULK_CHUNK_SIZE):
+        if name and name != user.avatar.name:
+            yield name
+    if user.avatar.name:
+        yield user.avatar.name
+
+
+def _file_chunks(name):
+    try:
+        file = default_storage.open(name, 'rb')
+    except OSError:
+        return
+    with file:
+        yield from file.chunks(CHUNK_SIZE)
+
+
+def _members(user):
+    """(имя в архиве, сжимать ли, итератор байтов)."""
+    yield 'profile.json', True, _profile(user)
+    yield 'recipes.jsonl', True, bulk.export_lines(
+        Recipe.objects.filter(author=user)
+    )
+    yield 'favorites.json', True, _json_array(
+        _rows(Favorite.objects.filter(user=user), RECIPE_FIELDS)
+    )
+    yield 'shopping_cart.json', True, _json_array(
+        _rows(ShoppingCart.objects.filter(user=user), RECIPE_FIELDS)
+    )
+    yield 'subscriptions.json', True, _json_array(
+        _rows(User.objects.filter(followers=user), AUTHOR_FIELDS)
+    )
+    # Картинки уже сжаты: кладутся как есть.
+    for name in _images(user):
+        yield f'{MEDIA_DIR}/{name}', False, _file_chunks(name)
+
+
+def stream(user):
+    """Байты ZIP-архива данных ``user``."""
+    pipe = _Pipe()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(pipe, 'w') as archive:
+        for name, compress, chunks in _members(user):
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = (
+                zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            )
+            with archive.open(info, 'w', force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    if pipe.size >= CHUNK_SIZE:
+                        yield pipe.drain()
+    yield pipe.drain()
+
+
+def estimate(user):
+    """Примерный размер архива в байтах: картинки точно, записи в среднем."""
+    size = 0
+    for name in _images(user):
+        try:
+            size += default_storage.size(name)
+        except OSError:
+            pass
+    size += Recipe.objects.filter(author=user).count() * RECIPE_SIZE
+    size += ROW_SIZE * (
+        Favorite.objects.filter(user=user).count()
+        + ShoppingCart.objects.filter(user=user).count()
+        + user.subscriptions.count()
+    )
+    return size
+
+
+def filename(user):
+    return f'foodgram-{user.pk}-{timezone.now():%Y%m%d}.zip'
+
+
+def save(user):
+    """Записывает архив в личные файлы ``user``; прежние удаляются."""
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+    name = private_name(user.pk, f'{PREFIX}{stamp}.zip')
+    path = private_storage.path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    partial = f'{path}.partial'
+    try:
+        with open(partial, 'wb') as file:
+            for chunk in stream(user):
+                file.write(chunk)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    for old in os.listdir(directory):
+        if old.startswith(PREFIX) and old != os.path.basename(path):
+            os.remove(os.path.join(directory, old))
+    return name
+
+
+def _expired(job):
+    age = timezone.now() - job.finished_at
+    if age > timedelta(seconds=settings.USER_EXPORT_TTL):
+        return True
+    return not private_storage.exists(job.result['name'])
+
+
+def background(user):
+    """Последняя фоновая выгрузка ``user``; новая, если готовой нет."""
+    job = Job.objects.filter(name=JOB, payload__user_id=user.pk).first()
+    if job is None or job.status == Job.FAILED or (
+        job.status == Job.DONE and _expired(job)
+    ):
+        job = enqueue(JOB, max_attempts=3, user_id=user.pk)
+    return job
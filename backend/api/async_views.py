@@ -0,0 +1,336 @@
+"""Асинхронные обработчики чтения для запуска под ASGI.
+
+Теги и ингредиенты отдаются из снимков ``api.catalogue`` прямо в
+цикле событий. Всё, что обращается к базе (рецепты, короткие ссылки,
+загрузка снимков), выполняется в отдельном ограниченном пуле потоков
+``ASYNC_DB_THREADS``, поэтому медленные запросы не занимают цикл и не
+исчерпывают общий пул ``sync_to_async``. Небезопасные методы
+(POST/PUT/PATCH/DELETE) передаются обычным представлениям DRF.
+
+Чтение рецептов проходит те же проверки, что и во вьюсете: маркерные
+корзины ``TokenBucketThrottle``, сброс нагрузки ``LoadSheddingMixin`` и
+общий кеш страниц для анонимов (``single_flight``). Автодополнение
+ингредиентов (``?name=``) расходует ту же корзину ``ingredient_search``,
+что и ``IngredientViewSet``.
+
+Подключаются в ``api/urls.py`` при ``ASYNC_READ_VIEWS = True``.
+"""
+import asyncio
+import functools
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.urls import path
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from foodgram import metrics
+from recipes.models import Recipe
+
+from . import batch, catalogue, fastpath, fragments
+from .fieldsets import requested_fields
+from .lru import LRUCache
+from .pagination import CustomPaginator
+from .renderers import FastJSONRenderer
+from .singleflight import cache_key, fetch
+from .throttling import get_scope, limiter
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet, feed_key
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS,
+    thread_name_prefix='async-db',
+)
+
+
+def _call_blocking(func, *args):
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_blocking(func, *args):
+    """Выполняет блокирующую функцию в пуле потоков для работы с базой."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, functools.partial(_call_blocking, func, *args)
+    )
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status,
+        content_type='application/json',
+    )
+
+
+def _error_response(exc):
+    response = json_response(
+        exc.detail if isinstance(exc.detail, (list, dict))
+        else {'detail': exc.detail},
+        status=exc.status_code,
+    )
+    if exc.status_code == 401:
+        response['WWW-Authenticate'] = 'Token'
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = str(math.ceil(exc.wait))
+    return response
+
+
+def _not_found():
+    return _error_response(exceptions.NotFound())
+
+
+def _read_only(handler, drf_view, drf_params=()):
+    """GET обрабатывает ``handler``, остальные методы — представление DRF.
+
+    GET с любым из параметров ``drf_params`` тоже уходит в DRF.
+    """
+    drf_view = sync_to_async(drf_view)
+
+    @functools.wraps(handler)
+    async def view(request, *args, **kwargs):
+        if request.method != 'GET' or any(
+            param in request.GET for param in drf_params
+        ):
+            return await drf_view(request, *args, **kwargs)
+        try:
+            return await handler(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return _error_response(exc)
+
+    view.csrf_exempt = True
+    return view
+
+
+async def _snapshot(source):
+    return source.cached() or await run_blocking(source.load)
+
+
+async def tag_list(request):
+    snapshot = await _snapshot(catalogue.tags)
+    return HttpResponse(snapshot.content, content_type='application/json')
+
+
+async def tag_detail(request, pk):
+    snapshot = await _snapshot(catalogue.tags)
+    if pk not in snapshot.by_id:
+        return _not_found()
+    return json_response(snapshot.by_id[pk])
+
+
+async def ingredient_list(request):
+    name = request.GET.get('name')
+    if name:
+        # Автодополнение ограничено корзиной ``ingredient_search``.
+        await run_blocking(_throttle_search, request)
+    snapshot = await _snapshot(catalogue.ingredients)
+    if not name:
+        return HttpResponse(snapshot.content, content_type='application/json')
+    return json_response(catalogue.search_ingredients(snapshot, name))
+
+
+async def ingredient_detail(request, pk):
+    snapshot = await _snapshot(catalogue.ingredients)
+    if pk not in snapshot.by_id:
+        return _not_found()
+    return json_response(snapshot.by_id[pk])
+
+
+def _drf_request(request):
+    request = Request(
+        request,
+        authenticators=[
+            auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ],
+    )
+    request.accepted_renderer = FastJSONRenderer()
+    return request
+
+
+def _check_throttles(request, action, viewset=RecipeViewSet):
+    """Частота запросов, как у действия ``action`` вьюсета ``viewset``."""
+    view = viewset(
+        action=action, request=request, args=(), kwargs={}, format_kwarg=None
+    )
+    view.check_throttles(request)
+    return view
+
+
+def _throttle_search(request):
+    _check_throttles(_drf_request(request), 'list', IngredientViewSet)
+
+
+def _guard(request, action):
+    """Частота и одновременность, как у действия ``RecipeViewSet``.
+
+    Возвращает функцию, освобождающую занятое место.
+    """
+    view = _check_throttles(request, action)
+    return limiter.acquire(
+        get_scope(view), view.action_priorities.get(action, view.priority)
+    )
+
+
+def _filtered_recipes(request, columns):
+    queryset = DjangoFilterBackend().filter_queryset(
+        request, Recipe.objects.all(), RecipeViewSet
+    )
+    return queryset.values(*columns)
+
+
+def _use_fragments(fields):
+    return fragments.enabled() and fields == fastpath.PAYLOAD_FIELDS
+
+
+def _recipe_page(request):
+    fields = requested_fields(
+        request, fastpath.PAYLOAD_FIELDS, fastpath.EXPANDABLE_FIELDS
+    )
+    paginator = CustomPaginator()
+    if _use_fragments(fields):
+        page = paginator.paginate_queryset(
+            _filtered_recipes(request, fragments.ROW_FIELDS), request
+        )
+        content = fragments.render_page(
+            paginator, fragments.render(page, request)
+        )
+    else:
+        rows = _filtered_recipes(request, fastpath.recipe_columns(fields))
+        page = paginator.paginate_queryset(rows, request)
+        response = paginator.get_paginated_response(
+            fastpath.recipe_payloads(page, request, fields)
+        )
+        content = FastJSONRenderer().render(response.data)
+    return HttpResponse(content, content_type='application/json')
+
+
+def _recipe_list(request):
+    request = _drf_request(request)
+    release = _guard(request, 'list')
+    try:
+        raw_key = feed_key(None, request)
+        if raw_key is None:
+            return _recipe_page(request)
+        return fetch(
+            cache_key(f'{__name__}.recipe_list', request, raw_key),
+            request,
+            lambda: _recipe_page(request),
+            ttl=settings.FEED_CACHE_TTL,
+            stale=settings.FEED_CACHE_STALE,
+        )
+    finally:
+        release()
+
+
+def _recipe(request, pk):
+    request = _drf_request(request)
+    release = _guard(request, 'retrieve')
+    try:
+        fields = requested_fields(
+            request, fastpath.PAYLOAD_FIELDS, fastpath.EXPANDABLE_FIELDS
+        )
+        if _use_fragments(fields):
+            rows = _filtered_recipes(
+                request, fragments.ROW_FIELDS
+            ).filter(pk=pk)
+            items = fragments.render(rows, request)
+            if not items:
+                raise exceptions.NotFound()
+            return items[0]
+        rows = list(_filtered_recipes(
+            request, fastpath.recipe_columns(fields)
+        ).filter(pk=pk))
+        if not rows:
+            raise exceptions.NotFound()
+        return FastJSONRenderer().render(
+            fastpath.recipe_payloads(rows, request, fields)[0]
+        )
+    finally:
+        release()
+
+
+async def recipe_list(request):
+    return await run_blocking(_recipe_list, request)
+
+
+async def recipe_detail(request, pk):
+    content = await run_blocking(_recipe, request, pk)
+    return HttpResponse(content, content_type='application/json')
+
+
+# short_code -> id рецепта.
+short_links = LRUCache(maxsize=10000)
+metrics.track_cache('short_links', short_links)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def forget_short_link(instance, **kwargs):
+    short_links.pop_matching(lambda pk: pk == instance.pk)
+
+
+def _short_link_target(code):
+    return (
+        Recipe.objects.filter(short_code=code)
+        .values_list('pk', flat=True)
+        .first()
+    )
+
+
+async def redirect_short_link(request, short_code):
+    """Перенаправление по короткой ссылке на рецепт."""
+    pk = short_links.get(short_code)
+    if pk is None:
+        pk = await run_blocking(_short_link_target, short_code)
+        if pk is None:
+            return redirect('/404/')
+        short_links.set(short_code, pk)
+    return redirect(f'/recipes/{pk}/')
+
+
+def _drf(viewset, actions, detail):
+    return viewset.as_view(actions, basename=None, detail=detail)
+
+
+_list_actions = {'get': 'list', 'post': 'create'}
+_detail_actions = {
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}
+
+urlpatterns = [
+    path('tags/', _read_only(
+        tag_list, _drf(TagViewSet, {'get': 'list'}, False)
+    )),
+    path('tags/<int:pk>/', _read_only(
+        tag_detail, _drf(TagViewSet, {'get': 'retrieve'}, True)
+    )),
+    path('ingredients/', _read_only(
+        ingredient_list, _drf(IngredientViewSet, {'get': 'list'}, False)
+    )),
+    path('ingredients/<int:pk>/', _read_only(
+        ingredient_detail,
+        _drf(IngredientViewSet, {'get': 'retrieve'}, True),
+    )),
+    path('recipes/', _read_only(
+        recipe_list,
+        _drf(RecipeViewSet, _list_actions, False),
+        drf_params=(batch.PARAM,),
+    )),
+    path('recipes/<int:pk>/', _read_only(
+        recipe_detail, _drf(RecipeViewSet, _detail_actions, True)
+    )),
+]
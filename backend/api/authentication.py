@@ -0,0 +1,125 @@
+"""Аутентификация по токену с кешем процесса.
+
+``TokenAuthentication`` на каждый запрос выполняет запрос Token JOIN User.
+``CachedTokenAuthentication`` держит снимок пользователя по ключу токена
+в LRU-кеше (``TOKEN_CACHE_SIZE`` записей, ``TOKEN_CACHE_TTL`` секунд).
+Запись удаляется при удалении токена (выход через djoser) и при любом
+сохранении пользователя — смене пароля, деактивации, правке профиля.
+
+Сигналы действуют только в своём процессе, поэтому другие процессы
+узнают об изменениях через версию токена в общем кеше
+``TOKEN_CACHE_VERSIONS``: после фиксации изменения версия токена
+меняется, а снимок из LRU принимается, только пока его версия совпадает
+с текущей. Версия читается до запроса к базе, так что снимок,
+собранный по старым данным, получает старую версию и отбрасывается при
+следующем обращении. Без версии в кеше (вытеснена) снимок тоже
+отбрасывается.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.authtoken.models import Token
+
+from foodgram import metrics
+
+from .lru import LRUCache
+
+User = get_user_model()
+
+token_cache = LRUCache(
+    maxsize=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL,
+)
+metrics.track_cache('tokens', token_cache)
+
+
+# В кеше лежат только значения колонок пользователя: каждый запрос
+# получает новый экземпляр со своим ``_state`` и без загруженных связей,
+# поэтому ничего из одного запроса не попадает в другие.
+USER_FIELDS = tuple(field.attname for field in User._meta.concrete_fields)
+_PK_INDEX = USER_FIELDS.index(User._meta.pk.attname)
+
+
+def _snapshot(user, version):
+    values = tuple(getattr(user, name) for name in USER_FIELDS)
+    return user._state.db, values, version
+
+
+def _restore(snapshot):
+    db, values, _ = snapshot
+    return User.from_db(db, USER_FIELDS, values)
+
+
+def _versions():
+    return caches[settings.TOKEN_CACHE_VERSIONS]
+
+
+def _version_key(key):
+    return f'token-version:{key}'
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def bump_versions(keys):
+    """Меняет версии токенов: их снимки в других процессах устаревают."""
+    _versions().set_many(
+        {_version_key(key): _new_version() for key in keys}, timeout=None
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        snapshot = token_cache.get(key)
+        if snapshot is not None:
+            if _versions().get(_version_key(key)) == snapshot[2]:
+                user = _restore(snapshot)
+                return user, Token(key=key, user=user)
+            token_cache.pop(key)
+        version = _versions().get_or_set(
+            _version_key(key), _new_version, timeout=None
+        )
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, _snapshot(user, version))
+        return user, token
+
+
+def request_user(request):
+    """Пользователь обычного Django-запроса: по сессии или по токену."""
+    if request.user.is_authenticated:
+        return request.user
+    try:
+        result = CachedTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(instance, **kwargs):
+    token_cache.pop(instance.key)
+    key = instance.key
+    transaction.on_commit(lambda: bump_versions([key]))
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(instance, created, **kwargs):
+    token_cache.pop_matching(
+        lambda snapshot: snapshot[1][_PK_INDEX] == instance.pk
+    )
+    if created:
+        return
+    keys = list(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+    if keys:
+        transaction.on_commit(lambda: bump_versions(keys))
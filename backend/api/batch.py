@@ -0,0 +1,39 @@
+"""Пакетное чтение объектов по ``?ids=1,2,3``.
+
+Вместо запроса на каждый объект клиент получает их одним ответом —
+списком в порядке ``ids``. На месте отсутствующих объектов стоит
+``{"id": ..., "errors": "Не найдено"}``. Число id ограничено
+``BATCH_MAX_IDS``. Фильтры списка при этом не применяются, а
+``?fields=``/``?expand=`` работают как обычно.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+PARAM = 'ids'
+
+
+def requested_ids(request):
+    """Список id из ``?ids=`` или None, если параметра нет."""
+    value = request.query_params.get(PARAM)
+    if value is None:
+        return None
+    try:
+        ids = [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise ValidationError({PARAM: 'Ожидается список целых чисел.'})
+    if not ids:
+        raise ValidationError({PARAM: 'Список пуст.'})
+    if len(ids) > settings.BATCH_MAX_IDS:
+        raise ValidationError({
+            PARAM: f'Не больше {settings.BATCH_MAX_IDS} id за запрос.'
+        })
+    return ids
+
+
+def not_found(pk):
+    return {'id': pk, 'errors': 'Не найдено'}
+
+
+def ordered(ids, found):
+    """Объекты ``found`` (id -> данные) в порядке ``ids`` с пропусками."""
+    return [found[pk] if pk in found else not_found(pk) for pk in ids]
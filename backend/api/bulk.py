@@ -0,0 +1,354 @@
+"""Выгрузка и загрузка рецептов в формате JSON Lines.
+
+Строка — один рецепт::
+
+    {"short_code": "...", "name": "...", "text": "...", "cooking_time": 10,
+     "created": "...", "author": "username", "image": "blobs/...png",
+     "tags": ["breakfast"], "ingredients": [
+         {"name": "соль", "measurement_unit": "г", "amount": 5}]}
+
+Авторы, теги и ингредиенты ссылаются на существующие записи по
+естественным ключам, картинка — по имени существующего файла в
+хранилище. Рецепт узнаётся по уникальному ``short_code``: уже загруженные
+при повторном запуске пропускаются, а после ``bulk_create`` (SQLite не
+возвращает id) по нему же находятся id новых рецептов. Строка без
+``short_code`` — ошибка. Если те же коды одновременно загрузил другой
+процесс, пачка откатывается и вставляется снова без них.
+
+Выгрузка идёт пачками по первичному ключу: в Django 3.2 ``iterator()``
+не выполняет ``prefetch_related``, поэтому каждая пачка — отдельный
+запрос с предвыборкой тегов и ингредиентов, и память не зависит от
+размера базы. Загрузка проверяет и вставляет рецепты пачками, каждая в
+своей транзакции, и после каждой пачки записывает номер обработанной
+строки в файл контрольной точки.
+"""
+import json
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_datetime
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    Tag,
+    tags_mask,
+)
+
+from .renderers import FastJSONRenderer
+
+User = get_user_model()
+
+CONTENT_TYPE = 'application/x-ndjson'
+SHORT_CODE_LENGTH = Recipe._meta.get_field('short_code').max_length
+NAME_LENGTH = Recipe._meta.get_field('name').max_length
+
+
+def _max_value(model, name):
+    field_type = model._meta.get_field(name).get_internal_type()
+    return BaseDatabaseOperations.integer_field_ranges[field_type][1]
+
+
+COOKING_TIME_MAX = _max_value(Recipe, 'cooking_time')
+AMOUNT_MAX = _max_value(RecipeIngredient, 'amount')
+
+
+def _is_number(value, limit):
+    # bool — подкласс int, но числом в JSON не является.
+    return (
+        isinstance(value, int) and not isinstance(value, bool)
+        and 1 <= value <= limit
+    )
+
+
+def _stored(name):
+    try:
+        return default_storage.exists(name)
+    except SuspiciousFileOperation:
+        return False
+
+
+def _record(recipe):
+    return {
+        'short_code': recipe.short_code,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'created': recipe.created,
+        'author': recipe.author.username,
+        'image': recipe.image.name,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipe_ingredients.all()
+        ],
+    }
+
+
+def export_lines(queryset=None, chunk_size=None):
+    """Строки JSONL (bytes) рецептов ``queryset`` в порядке id."""
+    chunk_size = chunk_size or settings.BULK_CHUNK_SIZE
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    queryset = queryset.select_related(
+        'author'
+    ).prefetch_related(
+        'tags',
+        Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient'),
+        ),
+    ).order_by('pk')
+    renderer = FastJSONRenderer()
+    last = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last)[:chunk_size])
+        if not chunk:
+            return
+        for recipe in chunk:
+            yield renderer.render(_record(recipe)) + b'\n'
+        last = chunk[-1].pk
+
+
+class Importer:
+    """Загрузка строк JSONL; итоги — в атрибутах и ``report()``."""
+
+    def __init__(self, chunk_size=None, checkpoint=None, progress=None):
+        self.chunk_size = chunk_size or settings.BULK_CHUNK_SIZE
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+        self.line = 0
+        self.elapsed = 0.0
+        self._tags = dict(Tag.objects.values_list('slug', 'id'))
+        self._ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator()
+        }
+
+    def _resume_from(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint) as file:
+            return json.load(file)['line']
+
+    def _save_checkpoint(self):
+        if not self.checkpoint:
+            return
+        with open(f'{self.checkpoint}.tmp', 'w') as file:
+            json.dump({'line': self.line}, file)
+        os.replace(f'{self.checkpoint}.tmp', self.checkpoint)
+
+    def run(self, lines):
+        started = time.monotonic()
+        resume = self._resume_from()
+        chunk = []
+        for number, line in enumerate(lines, 1):
+            if number <= resume or not line.strip():
+                continue
+            chunk.append((number, line))
+            if len(chunk) >= self.chunk_size:
+                self._load(chunk)
+                chunk = []
+        if chunk:
+            self._load(chunk)
+        self.elapsed = time.monotonic() - started
+        return self.report()
+
+    def report(self):
+        return {
+            'created': self.created,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'last_line': self.line,
+            'seconds': round(self.elapsed, 3),
+            'per_second': round(self.created / self.elapsed, 1)
+            if self.elapsed else 0.0,
+        }
+
+    def _error(self, number, message):
+        self.errors.append({'line': number, 'errors': message})
+
+    def _validate(self, data, authors):
+        if not isinstance(data, dict):
+            raise ValueError('Ожидается объект')
+        short_code = data.get('short_code')
+        if not isinstance(short_code, str) or not short_code:
+            raise ValueError('Нет short_code')
+        if len(short_code) > SHORT_CODE_LENGTH:
+            raise ValueError('Слишком длинный short_code')
+        name = data.get('name')
+        if not isinstance(name, str) or not 0 < len(name) <= NAME_LENGTH:
+            raise ValueError('Неверное название')
+        if not isinstance(data.get('text'), str) or not data['text']:
+            raise ValueError('Нет описания')
+        cooking_time = data.get('cooking_time')
+        if not _is_number(cooking_time, COOKING_TIME_MAX):
+            raise ValueError('Неверное время приготовления')
+        image = data.get('image')
+        if not isinstance(image, str) or not image:
+            raise ValueError('Картинка обязательна')
+        if not _stored(image):
+            raise ValueError(f'Нет файла картинки {image!r}')
+        author = data.get('author')
+        if not isinstance(author, str) or author not in authors:
+            raise ValueError(f'Нет пользователя {author!r}')
+        slugs = data.get('tags')
+        if not isinstance(slugs, list) or not slugs:
+            raise ValueError('Нужен хотя бы один тег')
+        if not all(isinstance(slug, str) for slug in slugs):
+            raise ValueError('Теги задаются слагами')
+        if len(set(slugs)) != len(slugs):
+            raise ValueError('Теги не должны повторяться')
+        unknown = [slug for slug in slugs if slug not in self._tags]
+        if unknown:
+            raise ValueError(f'Нет тегов {unknown}')
+        items = data.get('ingredients')
+        if not isinstance(items, list) or not items:
+            raise ValueError('Список ингредиентов не может быть пустым')
+        ingredients = {}
+        for item in items:
+            if not isinstance(item, dict):
+                raise ValueError('Ингредиент задаётся объектом')
+            key = (item.get('name'), item.get('measurement_unit'))
+            if not all(isinstance(part, str) for part in key):
+                raise ValueError(f'Неверный ингредиент {key}')
+            pk = self._ingredients.get(key)
+            if pk is None:
+                raise ValueError(f'Нет ингредиента {key}')
+            if not _is_number(item.get('amount'), AMOUNT_MAX):
+                raise ValueError(f'Неверное количество для {key}')
+            if pk in ingredients:
+                raise ValueError('Ингредиенты не должны повторяться')
+            ingredients[pk] = item['amount']
+        created = data.get('created')
+        if created is not None:
+            if not isinstance(created, str):
+                raise ValueError('Неверная дата created')
+            created = parse_datetime(created)
+            if created is None:
+                raise ValueError('Неверная дата created')
+        recipe = Recipe(
+            author_id=authors[author],
+            name=name,
+            text=data['text'],
+            cooking_time=cooking_time,
+            image=image,
+            short_code=short_code,
+            tags_mask=tags_mask(self._tags[slug] for slug in slugs),
+        )
+        tags = [self._tags[slug] for slug in slugs]
+        return recipe, created, tags, ingredients
+
+    def _load(self, chunk):
+        records = []
+        for number, line in chunk:
+            try:
+                records.append((number, json.loads(line)))
+            except ValueError:
+                self._error(number, 'Неверный JSON')
+        usernames = {
+            data['author'] for _, data in records
+            if isinstance(data, dict) and isinstance(data.get('author'), str)
+        }
+        authors = dict(User.objects.filter(
+            username__in=usernames
+        ).values_list('username', 'id'))
+        checked = []
+        for number, data in records:
+            try:
+                checked.append((number, self._validate(data, authors)))
+            except (ValueError, TypeError, AttributeError) as error:
+                self._error(number, str(error))
+        existing = set(Recipe.objects.filter(
+            short_code__in=[item[0].short_code for _, item in checked]
+        ).values_list('short_code', flat=True))
+        valid = {}
+        for number, (recipe, created, tags, ingredients) in checked:
+            if recipe.short_code in existing:
+                self.skipped += 1
+                continue
+            if recipe.short_code in valid:
+                self._error(number, 'short_code повторяется')
+                continue
+            valid[recipe.short_code] = (recipe, created, tags, ingredients)
+        while True:
+            try:
+                self._insert(valid)
+                break
+            except IntegrityError:
+                # Те же коды успел загрузить другой процесс.
+                taken = set(Recipe.objects.filter(
+                    short_code__in=list(valid)
+                ).values_list('short_code', flat=True))
+                if not taken:
+                    raise
+                self.skipped += len(taken)
+                valid = {
+                    code: item for code, item in valid.items()
+                    if code not in taken
+                }
+                for recipe, *_ in valid.values():
+                    recipe.pk = None
+        self.created += len(valid)
+        self.line = chunk[-1][0]
+        self._save_checkpoint()
+        if self.progress:
+            self.progress(self)
+
+    @staticmethod
+    def _insert(valid):
+        """Вставляет проверенные рецепты пачки одной транзакцией."""
+        with transaction.atomic():
+            Recipe.objects.bulk_create(
+                [item[0] for item in valid.values()],
+                batch_size=settings.BULK_INSERT_BATCH_SIZE,
+            )
+            ids = dict(Recipe.objects.filter(
+                short_code__in=list(valid)
+            ).values_list('short_code', 'id'))
+            dated = []
+            links = []
+            amounts = []
+            for code, (recipe, created, tags, ingredients) in valid.items():
+                recipe.pk = ids[code]
+                if created is not None:
+                    recipe.created = created
+                    dated.append(recipe)
+                links.extend(
+                    RecipeTag(recipe_id=recipe.pk, tag_id=tag) for tag in tags
+                )
+                amounts.extend(
+                    RecipeIngredient(
+                        recipe_id=recipe.pk, ingredient_id=pk, amount=amount
+                    )
+                    for pk, amount in ingredients.items()
+                )
+            if dated:
+                Recipe.objects.bulk_update(
+                    dated, ('created',),
+                    batch_size=settings.BULK_INSERT_BATCH_SIZE,
+                )
+            RecipeTag.objects.bulk_create(
+                links, batch_size=settings.BULK_INSERT_BATCH_SIZE
+            )
+            RecipeIngredient.objects.bulk_create(
+                amounts, batch_size=settings.BULK_INSERT_BATCH_SIZE
+            )
@@ -0,0 +1,81 @@
+"""Снимки справочников (теги, ингредиенты) в памяти процесса.
+
+Справочники меняются редко, а читаются на каждой странице фронтенда,
+поэтому их содержимое держится в памяти вместе с готовым JSON всего
+списка. Снимок сбрасывается сигналами при изменении модели в этом
+процессе и устаревает через ``CATALOGUE_TTL`` секунд — так подхватываются
+изменения, сделанные другими процессами.
+"""
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Tag
+
+from .renderers import FastJSONRenderer
+
+Snapshot = namedtuple('Snapshot', ('items', 'by_id', 'content', 'loaded_at'))
+
+
+class Catalogue:
+    """Неизменяемый снимок всех строк справочника."""
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self._snapshot = None
+
+    def cached(self):
+        """Актуальный снимок или None; в базу не обращается."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        if time.monotonic() - snapshot.loaded_at > settings.CATALOGUE_TTL:
+            return None
+        return snapshot
+
+    def get(self):
+        """Снимок справочника, при необходимости загруженный из базы."""
+        return self.cached() or self.load()
+
+    def load(self):
+        items = tuple(self.model.objects.values(*self.fields))
+        snapshot = Snapshot(
+            items=items,
+            by_id={item['id']: item for item in items},
+            content=FastJSONRenderer().render(list(items)),
+            loaded_at=time.monotonic(),
+        )
+        self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+tags = Catalogue(Tag, ('id', 'name', 'slug'))
+ingredients = Catalogue(Ingredient, ('id', 'name', 'measurement_unit'))
+
+
+def search_ingredients(snapshot, name):
+    """Ингредиенты, чьё название начинается с ``name``, без учёта регистра."""
+    prefix = name.lower()
+    return [
+        item for item in snapshot.items
+        if item['name'].lower().startswith(prefix)
+    ]
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(**kwargs):
+    tags.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    ingredients.invalidate()
@@ -0,0 +1,197 @@
+"""Server-Sent Events: новые рецепты и изменения числа добавлений в избранное.
+
+Представления публикуют события в ``hub`` — шину в памяти процесса.
+Каждый подписчик ``/api/events/`` получает собственную очередь на
+``EVENTS_QUEUE_SIZE`` событий. Если клиент не успевает их забирать,
+очередь очищается и вместо пропущенных событий он получает одно событие
+``overflow`` — после него клиенту нужно перечитать данные (например,
+через ``/api/sync/``). Так медленный клиент не раздувает память процесса.
+
+Поток отдаётся отдельным ASGI-приложением (``with_events`` в
+``foodgram/asgi.py``): Django 3.2 читает потоковые ответы синхронно и
+занимал бы поток на каждого подписчика. События видят только подписчики
+того же процесса, что обработал запрос на запись.
+"""
+import asyncio
+import itertools
+import json
+import threading
+
+from django.conf import settings
+
+PATH = '/api/events/'
+
+RECIPE_CREATED = 'recipe_created'
+FAVORITE_COUNT = 'favorite_count'
+OVERFLOW = 'overflow'
+
+
+def format_event(event_id, event, data):
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    message = f'event: {event}\ndata: {payload}\n\n'
+    if event_id is not None:
+        message = f'id: {event_id}\n{message}'
+    return message.encode()
+
+
+class Subscriber:
+    """Очередь событий одного клиента в цикле событий ``loop``."""
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, message):
+        """Кладёт событие; вызывается только в потоке ``loop``."""
+        if not self.queue.full():
+            self.queue.put_nowait(message)
+            return
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(format_event(None, OVERFLOW, {}))
+
+
+class Hub:
+    """Шина событий процесса; ``publish`` можно вызывать из любого потока."""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self, loop, maxsize):
+        with self._lock:
+            if len(self._subscribers) >= settings.EVENTS_MAX_SUBSCRIBERS:
+                return None
+            subscriber = Subscriber(loop, maxsize)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        with self._lock:
+            subscribers = tuple(self._subscribers)
+            event_id = next(self._ids)
+        if not subscribers:
+            return
+        message = format_event(event_id, event, data)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.put, message)
+            except RuntimeError:
+                # Цикл событий клиента уже закрыт.
+                self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            subscribers = tuple(self._subscribers)
+        return {
+            'subscribers': len(subscribers),
+            'queued': sum(item.queue.qsize() for item in subscribers),
+            'dropped': sum(item.dropped for item in subscribers),
+        }
+
+
+hub = Hub()
+
+
+def recipe_created(recipe):
+    hub.publish(RECIPE_CREATED, {
+        'id': recipe.pk,
+        'author': recipe.author_id,
+        'name': recipe.name,
+    })
+
+
+def favorite_count_changed(recipe_id):
+    if not len(hub):
+        return
+    from recipes.models import Favorite
+
+    hub.publish(FAVORITE_COUNT, {
+        'id': recipe_id,
+        'count': Favorite.objects.filter(recipe_id=recipe_id).count(),
+    })
+
+
+async def _response_start(send, status, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (name.encode(), value.encode()) for name, value in headers
+        ],
+    })
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream(scope, receive, send):
+    """ASGI-приложение потока событий."""
+    if scope['method'] != 'GET':
+        await _response_start(send, 405, [('allow', 'GET')])
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    subscriber = hub.subscribe(
+        asyncio.get_running_loop(), settings.EVENTS_QUEUE_SIZE
+    )
+    if subscriber is None:
+        await _response_start(send, 503, [('retry-after', '5')])
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await _response_start(send, 200, [
+            ('content-type', 'text/event-stream'),
+            ('cache-control', 'no-cache'),
+            ('x-accel-buffering', 'no'),
+        ])
+        await send({
+            'type': 'http.response.body',
+            'body': b'retry: 5000\n\n',
+            'more_body': True,
+        })
+        while not disconnected.done():
+            message = asyncio.ensure_future(subscriber.queue.get())
+            await asyncio.wait(
+                (message, disconnected),
+                timeout=settings.EVENTS_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if message.done():
+                body = message.result()
+            else:
+                message.cancel()
+                body = b': ping\n\n'
+            if disconnected.done():
+                break
+            await send({
+                'type': 'http.response.body',
+                'body': body,
+                'more_body': True,
+            })
+    finally:
+        hub.unsubscribe(subscriber)
+        disconnected.cancel()
+
+
+def with_events(application):
+    """Оборачивает ASGI-приложение Django, добавляя поток ``PATH``."""
+
+    async def router(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == PATH:
+            return await stream(scope, receive, send)
+        return await application(scope, receive, send)
+
+    return router
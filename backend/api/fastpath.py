@@ -0,0 +1,186 @@
+"""Быстрое чтение рецептов без ModelSerializer.
+
+Строит те же словари, что ``RecipeReadSerializer``, но из строк
+``.values()`` и фиксированного числа запросов на страницу: авторы, теги,
+ингредиенты и пользовательские флаги загружаются пачкой для всех рецептов.
+Порядок ключей совпадает с ``RecipeReadSerializer.Meta.fields``.
+"""
+from collections import defaultdict
+
+from recipes.models import (
+    Favorite, Recipe, RecipeIngredient, RecipeTag, ShoppingCart
+)
+from users.models import User
+
+RECIPE_FIELDS = ('id', 'author_id', 'name', 'image', 'text', 'cooking_time')
+PAYLOAD_FIELDS = (
+    'id',
+    'author',
+    'name',
+    'image',
+    'text',
+    'cooking_time',
+    'tags',
+    'ingredients',
+    'is_favorited',
+    'is_in_shopping_cart',
+)
+EXPANDABLE_FIELDS = ('author', 'tags', 'ingredients')
+AUTHOR_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'avatar'
+)
+
+_recipe_image = Recipe._meta.get_field('image')
+_user_avatar = User._meta.get_field('avatar')
+
+
+def image_url(name):
+    """Относительный URL картинки рецепта, как в ``get_image``."""
+    return _recipe_image.storage.url(name) if name else ''
+
+
+def avatar_url(name, request):
+    """URL аватара, как его отдаёт ``serializers.ImageField``."""
+    if not name:
+        return None
+    url = _user_avatar.storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def subscribed_ids(user, author_ids):
+    if not author_ids or not user.is_authenticated:
+        return set()
+    return set(
+        User.subscriptions.through.objects
+        .filter(from_user_id=user.pk, to_user_id__in=author_ids)
+        .values_list('to_user_id', flat=True)
+    )
+
+
+def author_payloads(author_ids, request):
+    """Словари ``CustomUserSerializer`` по id авторов.
+
+    Без ``request`` подписка не проверяется, а URL аватара относительный.
+    """
+    subscribed = (
+        subscribed_ids(request.user, author_ids) if request else set()
+    )
+    return {
+        row['id']: {
+            'id': row['id'],
+            'email': row['email'],
+            'username': row['username'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'is_subscribed': row['id'] in subscribed,
+            'avatar': avatar_url(row['avatar'], request),
+        }
+        for row in User.objects.filter(
+            id__in=author_ids
+        ).values(*AUTHOR_FIELDS)
+    }
+
+
+def tags_by_recipe(recipe_ids):
+    tags = defaultdict(list)
+    rows = (
+        RecipeTag.objects
+        .filter(recipe_id__in=recipe_ids)
+        .order_by('tag_id')
+        .values_list('recipe_id', 'tag_id', 'tag__name', 'tag__slug')
+    )
+    for recipe_id, tag_id, name, slug in rows:
+        tags[recipe_id].append({'id': tag_id, 'name': name, 'slug': slug})
+    return tags
+
+
+def ingredients_by_recipe(recipe_ids):
+    ingredients = defaultdict(list)
+    rows = (
+        RecipeIngredient.objects
+        .filter(recipe_id__in=recipe_ids)
+        .order_by('pk')
+        .values_list(
+            'recipe_id',
+            'ingredient_id',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'amount',
+        )
+    )
+    for recipe_id, ingredient_id, name, unit, amount in rows:
+        ingredients[recipe_id].append({
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        })
+    return ingredients
+
+
+def user_recipe_ids(model, user, recipe_ids):
+    if user is None or not user.is_authenticated:
+        return set()
+    return set(
+        model.objects
+        .filter(user_id=user.pk, recipe_id__in=recipe_ids)
+        .values_list('recipe_id', flat=True)
+    )
+
+
+def recipe_columns(fields=PAYLOAD_FIELDS):
+    """Колонки ``Recipe`` для ``.values()``, нужные под набор полей."""
+    return tuple(
+        column for column in RECIPE_FIELDS
+        if column == 'id'
+        or (column == 'author_id' and 'author' in fields)
+        or column in fields
+    )
+
+
+def recipe_payloads(rows, request, fields=PAYLOAD_FIELDS):
+    """Список словарей рецептов по строкам ``.values(*recipe_columns())``.
+
+    Связанные объекты и флаги, не вошедшие в ``fields``, не запрашиваются.
+    Без ``request`` пользовательские флаги ложны (как для анонима).
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    recipe_ids = [row['id'] for row in rows]
+    user = request.user if request else None
+    authors = (
+        author_payloads({row['author_id'] for row in rows}, request)
+        if 'author' in fields else {}
+    )
+    tags = tags_by_recipe(recipe_ids) if 'tags' in fields else {}
+    ingredients = (
+        ingredients_by_recipe(recipe_ids) if 'ingredients' in fields else {}
+    )
+    favorited = (
+        user_recipe_ids(Favorite, user, recipe_ids)
+        if 'is_favorited' in fields else set()
+    )
+    in_cart = (
+        user_recipe_ids(ShoppingCart, user, recipe_ids)
+        if 'is_in_shopping_cart' in fields else set()
+    )
+    payloads = []
+    for row in rows:
+        recipe_id = row['id']
+        payload = {
+            'id': recipe_id,
+            'author': authors.get(row.get('author_id')),
+            'name': row.get('name'),
+            'image': image_url(row.get('image')),
+            'text': row.get('text'),
+            'cooking_time': row.get('cooking_time'),
+            'tags': tags.get(recipe_id, []),
+            'ingredients': ingredients.get(recipe_id, []),
+            'is_favorited': recipe_id in favorited,
+            'is_in_shopping_cart': recipe_id in in_cart,
+        }
+        if fields != PAYLOAD_FIELDS:
+            payload = {name: payload[name] for name in fields}
+        payloads.append(payload)
+    return payloads
@@ -0,0 +1,54 @@
+"""Разреженные наборы полей: ``?fields=`` и ``?expand=``.
+
+Без параметров ответ содержит все поля. ``fields`` оставляет только
+перечисленные поля; ``expand`` добавляет связанные объекты
+(``expandable``) — без ``fields`` к ним добавляются все простые поля.
+Например, ``?expand=author`` отдаёт карточки рецептов без тегов
+и ингредиентов, ``?fields=id,name`` — только id и название.
+Неизвестные имена игнорируются.
+"""
+from rest_framework.serializers import ListSerializer
+
+
+def _param(request, name):
+    params = getattr(request, 'query_params', request.GET)
+    value = params.get(name)
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def requested_fields(request, fields, expandable=()):
+    """Поля ``fields``, запрошенные клиентом, в исходном порядке."""
+    if request is None:
+        return tuple(fields)
+    only = _param(request, 'fields')
+    expand = _param(request, 'expand')
+    if only is None and expand is None:
+        return tuple(fields)
+    if only is None:
+        only = {name for name in fields if name not in expandable}
+    only |= expand or set()
+    return tuple(name for name in fields if name in only)
+
+
+class SparseFieldsMixin:
+    """Оставляет в сериализаторе верхнего уровня только запрошенные поля.
+
+    Вложенные сериализаторы (например, ``author`` в рецепте) отдаются
+    целиком.
+    """
+
+    expandable_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if parent is not None and not (
+            isinstance(parent, ListSerializer) and parent.parent is None
+        ):
+            return fields
+        names = requested_fields(
+            self.context.get('request'), fields, self.expandable_fields
+        )
+        return {name: fields[name] for name in names}
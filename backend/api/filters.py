@@ -1,28 +1,124 @@
 import django_filters
-from recipes.models import Recipe, Tag
+from django import forms
+from django.db.models import Exists, F, OuterRef, Q
+from django_filters.widgets import BooleanWidget
+from recipes.models import (
+    Favorite, Recipe, RecipeTag, ShoppingCart, Tag, tag_bit
+)
+
+from . import catalogue
+
+
+def tag_choices():
+    return [(tag['slug'], tag['name']) for tag in catalogue.tags.get().items]
+
+
+def tag_ids(slugs):
+    """{слаг: id} по одному снимку справочника; недостающие — из базы.
+
+    Тег, созданный в другом процессе, есть в базе, но ещё не в снимке:
+    такой снимок сбрасывается.
+    """
+    by_slug = {tag['slug']: tag['id'] for tag in catalogue.tags.get().items}
+    found = {slug: by_slug[slug] for slug in slugs if slug in by_slug}
+    missing = set(slugs) - set(found)
+    if missing:
+        loaded = dict(
+            Tag.objects.filter(slug__in=missing).values_list('slug', 'id')
+        )
+        if loaded:
+            catalogue.tags.invalidate()
+        found.update(loaded)
+    return found
+
+
+class TagSlugsField(forms.MultipleChoiceField):
+    """Слаги тегов; очищенное значение — список id в порядке слагов."""
+
+    def valid_value(self, value):
+        return True
+
+    def clean(self, value):
+        slugs = super().clean(value)
+        ids = tag_ids(slugs)
+        for slug in slugs:
+            if slug not in ids:
+                raise forms.ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice',
+                    params={'value': slug},
+                )
+        return [ids[slug] for slug in slugs]
+
+
+class TagSlugsFilter(django_filters.MultipleChoiceFilter):
+    field_class = TagSlugsField
+
 
 class RecipeFilter(django_filters.FilterSet):
-    tags = django_filters.ModelMultipleChoiceFilter(
-        field_name="tags__slug",
-        to_field_name="slug",
-        queryset=Tag.objects.all()
-    )
+    """Фильтр рецептов.
+
+    ``tags`` — рецепты хотя бы с одним из тегов, ``tags_all`` — со всеми
+    тегами сразу. Теги проверяются по битовой маске ``Recipe.tags_mask``
+    без JOIN с тегами, слаги разрешаются по снимку справочника тегов
+    (``tag_ids``).
+    """
+    tags = TagSlugsFilter(choices=tag_choices, method='filter_tags')
+    tags_all = TagSlugsFilter(choices=tag_choices, method='filter_tags')
     author = django_filters.NumberFilter(field_name="author__id")
-    is_favorited = django_filters.BooleanFilter(method='filter_is_favorited')
-    is_in_shopping_cart = django_filters.BooleanFilter(method='filter_is_in_shopping_cart')
+    is_favorited = django_filters.BooleanFilter(
+        method='filter_is_favorited', widget=BooleanWidget()
+    )
+    is_in_shopping_cart = django_filters.BooleanFilter(
+        method='filter_is_in_shopping_cart', widget=BooleanWidget()
+    )
 
     class Meta:
         model = Recipe
         fields = ['tags', 'author']
 
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        match_all = name == 'tags_all'
+        mask = 0
+        conditions = []
+        for tag_id in value:
+            bit = tag_bit(tag_id)
+            if bit:
+                mask |= bit
+            else:
+                # Теги вне маски проверяются подзапросом.
+                conditions.append(Q(Exists(RecipeTag.objects.filter(
+                    recipe=OuterRef('pk'), tag_id=tag_id
+                ))))
+        if mask:
+            hits = f'{name}_hits'
+            queryset = queryset.alias(**{hits: F('tags_mask').bitand(mask)})
+            conditions.append(
+                Q(**{hits: mask}) if match_all else Q(**{f'{hits}__gt': 0})
+            )
+        condition = conditions[0]
+        for other in conditions[1:]:
+            condition = condition & other if match_all else condition | other
+        return queryset.filter(condition)
+
     def filter_is_favorited(self, queryset, name, value):
-        user = self.request.user
-        if value and user.is_authenticated:
-            return queryset.filter(favorites__user=user)
-        return queryset
+        return self._filter_user_recipes(queryset, Favorite, value)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self._filter_user_recipes(queryset, ShoppingCart, value)
+
+    def _filter_user_recipes(self, queryset, model, value):
+        """Рецепты, которые есть (или нет) в списке пользователя.
+
+        Коррелированный EXISTS не размножает строки и сочетается с
+        остальными фильтрами; ``value=False`` даёт рецепты вне списка.
+        """
         user = self.request.user
-        if value and user.is_authenticated:
-            return queryset.filter(shoppingcart__user=user)
-        return queryset
\ No newline at end of file
+        if not user.is_authenticated:
+            return queryset
+        in_list = Exists(
+            model.objects.filter(user=user, recipe=OuterRef('pk'))
+        )
+        return queryset.filter(in_list if value else ~in_list)
@@ -0,0 +1,209 @@
+"""Заранее собранный JSON рецептов.
+
+Всё, что в ответе о рецепте не зависит от пользователя (автор, теги,
+ингредиенты, текст), хранится в кеше Django готовыми байтами. При ответе
+в них вставляются только флаги ``author.is_subscribed``, ``is_favorited``
+и ``is_in_shopping_cart`` текущего пользователя и абсолютный URL аватара,
+поэтому страница рецептов собирается без сериализаторов и без запросов
+за авторами, тегами и ингредиентами.
+
+Ключ фрагмента содержит ``updated_at`` рецепта. Его сдвигает сохранение
+рецепта (теги и ингредиенты пишутся в той же транзакции), а
+recipes/signals.py — правки записей справочников и профиля автора. Новая
+версия видна читателям вместе с фиксацией транзакции, и фрагмент, собранный
+по старым данным, больше не читается — удалять его не нужно, он истекает
+через ``RECIPE_FRAGMENT_TTL``. Поколение в ключах (``forget_all``)
+сбрасывает все фрагменты разом после массовых правок в обход сигналов.
+
+Фрагменты работают только с общим для процессов кешем: с LocMemCache или
+DummyCache они отключаются, а проверка ``api.W001`` предупреждает об этом.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from foodgram import metrics
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+from . import fastpath
+from .renderers import FastJSONRenderer
+
+# head + is_subscribed + ',"avatar":' + avatar + tail + флаги + '}'.
+Fragment = namedtuple('Fragment', ('head', 'avatar', 'tail'))
+
+GENERATION_KEY = 'recipe-fragment:generation'
+# Колонки строк, по которым собираются ответы (``render``).
+ROW_FIELDS = ('id', 'author_id', 'updated_at')
+# Кеши, не общие для процессов.
+LOCAL_CACHES = (LocMemCache, DummyCache)
+_AUTHOR_MARK = b'"is_subscribed":false,"avatar":null'
+_FLAGS_END = b',"is_favorited":false,"is_in_shopping_cart":false}'
+_BOOL = {True: b'true', False: b'false'}
+
+lookups = metrics.CacheStats()
+metrics.track_cache('recipe_fragments', lookups)
+
+
+def _cache():
+    return caches[settings.RECIPE_FRAGMENT_CACHE]
+
+
+def shared():
+    """Кеш фрагментов общий для всех процессов."""
+    return not isinstance(_cache(), LOCAL_CACHES)
+
+
+def enabled():
+    return settings.RECIPE_FRAGMENTS and shared()
+
+
+@checks.register(checks.Tags.caches)
+def check_cache(**kwargs):
+    if not settings.RECIPE_FRAGMENTS or shared():
+        return []
+    return [checks.Warning(
+        f'Кеш {settings.RECIPE_FRAGMENT_CACHE!r} не общий для процессов, '
+        'фрагменты рецептов отключены.',
+        hint='Укажите в CACHES общий кеш (memcached, redis, файлы, БД) '
+             'или выключите RECIPE_FRAGMENTS.',
+        id='api.W001',
+    )]
+
+
+def _generation():
+    return _cache().get_or_set(GENERATION_KEY, 1, timeout=None)
+
+
+def _key(generation, row):
+    version = int(row['updated_at'].timestamp() * 1_000_000)
+    return f'recipe-fragment:{generation}:{row["id"]}:{version}'
+
+
+def _split(payload, renderer):
+    """Разрезает JSON рецепта по пользовательским флагам."""
+    avatar = payload['author']['avatar']
+    content = renderer.render(
+        {**payload, 'author': {**payload['author'], 'avatar': None}}
+    )
+    start = content.index(_AUTHOR_MARK)
+    if not content.endswith(_FLAGS_END):
+        raise ValueError('Неожиданный порядок полей рецепта')
+    return Fragment(
+        head=content[:start + len(b'"is_subscribed":')],
+        avatar=avatar,
+        tail=content[start + len(_AUTHOR_MARK):-len(_FLAGS_END)],
+    )
+
+
+def _build(recipe_ids):
+    rows = Recipe.objects.filter(pk__in=recipe_ids).values(
+        *fastpath.RECIPE_FIELDS
+    )
+    renderer = FastJSONRenderer()
+    return {
+        payload['id']: _split(payload, renderer)
+        for payload in fastpath.recipe_payloads(rows, None)
+    }
+
+
+def get_many(rows):
+    """Фрагменты рецептов по строкам ``ROW_FIELDS``: id -> фрагмент.
+
+    Недостающие собираются и кешируются под версией из строки.
+    """
+    cache = _cache()
+    generation = _generation()
+    keys = {_key(generation, row): row for row in rows}
+    found = {
+        keys[key]['id']: value
+        for key, value in cache.get_many(keys).items()
+    }
+    missing = [row for row in rows if row['id'] not in found]
+    lookups.record(len(found), len(missing))
+    if missing:
+        built = _build([row['id'] for row in missing])
+        cache.set_many(
+            {_key(generation, row): built[row['id']]
+             for row in missing if row['id'] in built},
+            timeout=settings.RECIPE_FRAGMENT_TTL,
+        )
+        found.update(built)
+    return found
+
+
+def render(rows, request):
+    """JSON рецептов по строкам ``ROW_FIELDS`` в их порядке."""
+    rows = list(rows)
+    items = render_by_id(rows, request)
+    return [items[row['id']] for row in rows if row['id'] in items]
+
+
+def render_by_id(rows, request):
+    """JSON рецептов по строкам ``ROW_FIELDS``: id -> байты."""
+    rows = list(rows)
+    if not rows:
+        return {}
+    recipe_ids = [row['id'] for row in rows]
+    user = request.user
+    fragments = get_many(rows)
+    subscribed = fastpath.subscribed_ids(
+        user, {row['author_id'] for row in rows}
+    )
+    favorited = fastpath.user_recipe_ids(Favorite, user, recipe_ids)
+    in_cart = fastpath.user_recipe_ids(ShoppingCart, user, recipe_ids)
+    renderer = FastJSONRenderer()
+    avatars = {}
+    items = {}
+    for row in rows:
+        recipe_id = row['id']
+        fragment = fragments.get(recipe_id)
+        if fragment is None:
+            # Рецепт удалён между выборкой страницы и сборкой фрагментов.
+            continue
+        if fragment.avatar not in avatars:
+            avatars[fragment.avatar] = (
+                renderer.render(request.build_absolute_uri(fragment.avatar))
+                if fragment.avatar else b'null'
+            )
+        items[recipe_id] = b''.join((
+            fragment.head,
+            _BOOL[row['author_id'] in subscribed],
+            b',"avatar":',
+            avatars[fragment.avatar],
+            fragment.tail,
+            b',"is_favorited":',
+            _BOOL[recipe_id in favorited],
+            b',"is_in_shopping_cart":',
+            _BOOL[recipe_id in in_cart],
+            b'}',
+        ))
+    return items
+
+
+def render_list(items):
+    return b'[' + b','.join(items) + b']'
+
+
+def render_page(paginator, items):
+    """Ответ пагинатора с готовыми ``items`` в ``results``."""
+    envelope = FastJSONRenderer().render(
+        paginator.get_paginated_response([]).data
+    )
+    return envelope[:-len(b'[]}')] + render_list(items) + b'}'
+
+
+def forget_all():
+    """Сбрасывает все фрагменты сменой поколения."""
+    def bump():
+        cache = _cache()
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, 2, timeout=None)
+
+    transaction.on_commit(bump)
@@ -0,0 +1,68 @@
+"""Потокобезопасный LRU-кеш процесса с ограничением размера и TTL."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """LRU-кеш на ``maxsize`` записей; ``ttl`` в секундах или None."""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (
+                entry[1] is None or entry[1] > time.monotonic()
+            ):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop_matching(self, predicate):
+        """Удаляет записи, для значений которых ``predicate`` истинен."""
+        with self._lock:
+            keys = [
+                key for key, (value, _) in self._data.items()
+                if predicate(value)
+            ]
+            for key in keys:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,183 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 1024 * 1024
+EXTENSIONS = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+def _compress(source, target, method):
+    with open(source, 'rb') as raw:
+        if method == 'gzip':
+            with gzip.open(target, 'wb', compresslevel=6) as out:
+                shutil.copyfileobj(raw, out, CHUNK_SIZE)
+        else:
+            with open(target, 'wb') as out:
+                compressor = zstandard.ZstdCompressor(level=10, threads=-1)
+                compressor.copy_stream(raw, out, read_size=CHUNK_SIZE)
+
+
+class Command(BaseCommand):
+    help = (
+        'Снимок базы без остановки сервиса. SQLite копируется online '
+        'backup API небольшими порциями страниц с паузами, чтобы не '
+        'задерживать запись; PostgreSQL — через pg_dump (BACKUP_PG_DUMP).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--dir', default=str(settings.BACKUP_DIR),
+            help='Каталог для снимков.',
+        )
+        parser.add_argument(
+            '--compress', choices=tuple(EXTENSIONS), default='gzip',
+            help='Сжатие снимка SQLite.',
+        )
+        parser.add_argument(
+            '--keep', type=int, default=settings.BACKUP_KEEP,
+            help='Сколько последних снимков хранить (0 — все).',
+        )
+        parser.add_argument(
+            '--pages', type=int, default=settings.BACKUP_PAGES,
+            help='Страниц SQLite за один шаг копирования.',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=settings.BACKUP_SLEEP,
+            help='Пауза между шагами, секунды.',
+        )
+        parser.add_argument(
+            '--no-verify', action='store_true',
+            help='Не проверять целостность снимка.',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        directory = options['dir']
+        os.makedirs(directory, exist_ok=True)
+        prefix = f'{options["database"]}-'
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.gmtime())
+        started = time.monotonic()
+        if connection.vendor == 'sqlite':
+            path = self._sqlite(connection, directory, prefix + stamp, options)
+        elif connection.vendor == 'postgresql':
+            path = self._postgresql(
+                connection, directory, prefix + stamp, options
+            )
+        else:
+            raise CommandError(
+                f'Резервное копирование {connection.vendor} не поддерживается'
+            )
+        self.stdout.write(
+            f'Снимок {path}: {os.path.getsize(path) / 1024 / 1024:.1f} МБ '
+            f'за {time.monotonic() - started:.1f} с'
+        )
+        if options['keep']:
+            self._rotate(directory, prefix, options['keep'])
+
+    def _sqlite(self, connection, directory, name, options):
+        method = options['compress']
+        if method == 'zstd' and zstandard is None:
+            raise CommandError('Для сжатия zstd нужен пакет zstandard')
+        snapshot = os.path.join(directory, f'.{name}.sqlite3.partial')
+        target = os.path.join(
+            directory, f'{name}.sqlite3{EXTENSIONS[method]}'
+        )
+        database = os.path.abspath(connection.settings_dict['NAME'])
+        source = sqlite3.connect(f'file:{database}?mode=ro', uri=True)
+        destination = sqlite3.connect(snapshot)
+        steps = 0
+
+        def progress(status, remaining, total):
+            # Между шагами блокировка чтения с базы снята, и писатели
+            # успевают выполнить свои транзакции.
+            nonlocal steps
+            steps += 1
+            if remaining:
+                time.sleep(options['sleep'])
+
+        try:
+            with destination:
+                source.backup(
+                    destination, pages=options['pages'], progress=progress
+                )
+            if not options['no_verify']:
+                result = destination.execute(
+                    'PRAGMA integrity_check'
+                ).fetchone()[0]
+                if result != 'ok':
+                    raise CommandError(f'Снимок повреждён: {result}')
+        except BaseException:
+            destination.close()
+            os.remove(snapshot)
+            raise
+        finally:
+            source.close()
+        destination.close()
+        self.stdout.write(f'Скопировано за {steps} шагов')
+        if method == 'none':
+            os.replace(snapshot, target)
+            return target
+        partial = f'{target}.partial'
+        try:
+            _compress(snapshot, partial, method)
+            os.replace(partial, target)
+        finally:
+            for leftover in (snapshot, partial):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        return target
+
+    def _postgresql(self, connection, directory, name, options):
+        pg_dump = settings.BACKUP_PG_DUMP
+        if not pg_dump:
+            raise CommandError('Не задан путь к pg_dump (BACKUP_PG_DUMP)')
+        database = connection.settings_dict
+        target = os.path.join(directory, f'{name}.dump')
+        partial = os.path.join(directory, f'.{name}.dump.partial')
+        command = [pg_dump, '--format=custom', '--no-owner', '-f', partial]
+        for flag, key in (('-h', 'HOST'), ('-p', 'PORT'), ('-U', 'USER')):
+            if database.get(key):
+                command += [flag, str(database[key])]
+        command.append(database['NAME'])
+        environment = dict(os.environ)
+        if database.get('PASSWORD'):
+            environment['PGPASSWORD'] = database['PASSWORD']
+        try:
+            subprocess.run(command, env=environment, check=True)
+            if not options['no_verify']:
+                # Оглавление читается, только если архив не обрезан.
+                pg_restore = os.path.join(
+                    os.path.dirname(pg_dump), 'pg_restore'
+                )
+                subprocess.run(
+                    [pg_restore, '--list', partial],
+                    check=True, stdout=subprocess.DEVNULL,
+                )
+        except (OSError, subprocess.CalledProcessError) as error:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise CommandError(f'pg_dump не удался: {error}')
+        os.replace(partial, target)
+        return target
+
+    def _rotate(self, directory, prefix, keep):
+        snapshots = sorted(
+            name for name in os.listdir(directory)
+            if name.startswith(prefix) and not name.endswith('.partial')
+        )
+        for name in snapshots[:-keep]:
+            os.remove(os.path.join(directory, name))
+            self.stdout.write(f'Удалён старый снимок {name}')
@@ -0,0 +1,72 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+DEFAULT_PATHS = (
+    '/api/tags/',
+    '/api/ingredients/?name=са',
+    '/api/recipes/',
+    '/api/recipes/?limit=100',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность и задержки чтения '
+        'у запущенных WSGI- и ASGI-серверов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True,
+            metavar='NAME=URL',
+            help='Сервер для замера, например wsgi=http://127.0.0.1:8000',
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Путь для замера (можно указать несколько раз).',
+        )
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument(
+            '--token', help='Токен для авторизованных запросов.'
+        )
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        paths = options['paths'] or DEFAULT_PATHS
+        for target in options['target']:
+            name, _, base_url = target.partition('=')
+            for path in paths:
+                self._bench(
+                    name, base_url.rstrip('/') + path, headers,
+                    options['concurrency'], options['requests'],
+                )
+
+    def _bench(self, name, url, headers, concurrency, total):
+        session = requests.Session()
+
+        def fetch(_):
+            started = time.perf_counter()
+            response = session.get(url, headers=headers)
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, code in results if code >= 400)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'{name:6} {url}\n'
+            f'       {total / elapsed:8.1f} rps  '
+            f'p50 {statistics.median(latencies) * 1000:7.1f} ms  '
+            f'p99 {p99 * 1000:7.1f} ms  '
+            f'ошибок {errors}'
+        )
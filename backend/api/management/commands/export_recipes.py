@@ -0,0 +1,37 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.bulk import export_lines
+
+
+class Command(BaseCommand):
+    help = 'Выгружает рецепты в JSON Lines (по рецепту на строку).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='Файл для выгрузки; по умолчанию stdout.',
+        )
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = 0
+        output = (
+            sys.stdout.buffer if options['output'] == '-'
+            else open(options['output'], 'wb')
+        )
+        try:
+            for line in export_lines(chunk_size=options['chunk_size']):
+                output.write(line)
+                count += 1
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            f'Выгружено рецептов: {count} за {elapsed:.1f} с '
+            f'({count / elapsed if elapsed else 0:.0f} в секунду)'
+        )
@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api.bulk import Importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает рецепты из JSON Lines пачками. С --checkpoint повторный '
+        'запуск продолжает с первой необработанной строки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='Файл JSONL; по умолчанию stdin.',
+        )
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с номером последней загруженной строки.',
+        )
+
+    def handle(self, *args, **options):
+        source = (
+            sys.stdin.buffer if options['input'] == '-'
+            else open(options['input'], 'rb')
+        )
+
+        def progress(importer):
+            self.stderr.write(
+                f'строка {importer.line}: создано {importer.created}, '
+                f'пропущено {importer.skipped}, ошибок {len(importer.errors)}'
+            )
+
+        importer = Importer(
+            chunk_size=options['chunk_size'],
+            checkpoint=options['checkpoint'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        try:
+            report = importer.run(source)
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+        for error in report['errors']:
+            self.stderr.write(f'Строка {error["line"]}: {error["errors"]}')
+        self.stdout.write(
+            f'Создано рецептов: {report["created"]}, пропущено: '
+            f'{report["skipped"]}, ошибок: {len(report["errors"])}, '
+            f'{report["seconds"]} с ({report["per_second"]} в секунду)'
+        )
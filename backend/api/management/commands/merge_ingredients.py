@@ -0,0 +1,191 @@
+import os
+import re
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api import catalogue, fragments
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+# Написания единиц измерения после удаления пробелов и точек.
+UNIT_ALIASES = {
+    'гр': 'г',
+    'грамм': 'г',
+    'граммов': 'г',
+    'килограмм': 'кг',
+    'миллилитр': 'мл',
+    'литр': 'л',
+    'штук': 'шт',
+    'штука': 'шт',
+    'чайнаяложка': 'чл',
+    'столоваяложка': 'стл',
+}
+
+BATCH_SIZE = 1000
+
+
+def name_key(name):
+    return ' '.join(name.casefold().replace('ё', 'е').split())
+
+
+def unit_key(unit):
+    unit = re.sub(r'[\s.]', '', unit.casefold())
+    return UNIT_ALIASES.get(unit, unit)
+
+
+def clusters():
+    """Группы дублей: {id оставляемого: [id удаляемых]}."""
+    groups = defaultdict(list)
+    rows = Ingredient.objects.order_by('id').values_list(
+        'id', 'name', 'measurement_unit'
+    )
+    for pk, name, unit in rows.iterator():
+        groups[(name_key(name), unit_key(unit))].append(pk)
+    return {
+        ids[0]: ids[1:] for ids in groups.values() if len(ids) > 1
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Объединяет ингредиенты, совпадающие без учёта регистра, пробелов '
+        'и написания единиц измерения. Количества в рецептах, где '
+        'встречаются несколько дублей, складываются. Запущенные '
+        'веб-процессы видят прежний справочник ингредиентов до '
+        'CATALOGUE_TTL секунд.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Выполнить объединение и откатить, показав отчёт.',
+        )
+        parser.add_argument(
+            '--show', type=int, default=50,
+            help='Сколько групп дублей показать в отчёте.',
+        )
+
+    def handle(self, *args, **options):
+        groups = clusters()
+        if not groups:
+            self.stdout.write('Дублей нет')
+            return
+        self._report(groups, options['show'])
+        with transaction.atomic():
+            result = self._merge(groups)
+            if options['dry_run']:
+                transaction.set_rollback(True)
+        prefix = 'Пробный запуск, изменения отменены. ' if (
+            options['dry_run']
+        ) else ''
+        self.stdout.write(
+            f'{prefix}Ингредиентов удалено: {result["ingredients"]}, '
+            f'строк рецептов перенесено: {result["moved"]}, '
+            f'слито с уже имеющимися: {result["merged"]}, '
+            f'рецептов затронуто: {result["recipes"]}'
+        )
+
+    def _report(self, groups, show):
+        ids = set(groups)
+        for losers in groups.values():
+            ids.update(losers)
+        names = {
+            ingredient.pk: str(ingredient)
+            for ingredient in Ingredient.objects.filter(pk__in=ids)
+        }
+        self.stdout.write(f'Групп дублей: {len(groups)}')
+        for winner, losers in list(groups.items())[:show]:
+            merged = ', '.join(names[pk] for pk in losers)
+            self.stdout.write(f'  {names[winner]} <- {merged}')
+
+    def _merge(self, groups):
+        ri = RecipeIngredient._meta.db_table
+        recipe = Recipe._meta.db_table
+        ingredient = Ingredient._meta.db_table
+        mapping = [
+            (pk, winner)
+            for winner, losers in groups.items()
+            for pk in (winner, *losers)
+        ]
+        # Имена только для этого запуска. Таблицы временные и создаются в
+        # транзакции: при ошибке или --dry-run их убирает откат, иначе —
+        # DROP в конце.
+        merge = f'tmp_ingredient_merge_{os.getpid()}'
+        rows = f'{merge}_rows'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {merge} ('
+                f'ingredient_id BIGINT PRIMARY KEY, winner_id BIGINT NOT NULL)'
+            )
+            for start in range(0, len(mapping), BATCH_SIZE):
+                cursor.executemany(
+                    f'INSERT INTO {merge} VALUES (%s, %s)',
+                    mapping[start:start + BATCH_SIZE],
+                )
+            # Рецепты, где после объединения окажется несколько строк
+            # одного ингредиента: остаётся строка с меньшим id и суммой.
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {rows} ('
+                f'keeper_id BIGINT PRIMARY KEY, recipe_id BIGINT NOT NULL, '
+                f'winner_id BIGINT NOT NULL, total BIGINT NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX {rows}_group ON {rows} (recipe_id, winner_id)'
+            )
+            cursor.execute(
+                f'INSERT INTO {rows} SELECT '
+                f'MIN(ri.id), ri.recipe_id, m.winner_id, SUM(ri.amount) '
+                f'FROM {ri} ri JOIN {merge} m '
+                f'ON ri.ingredient_id = m.ingredient_id '
+                f'GROUP BY ri.recipe_id, m.winner_id HAVING COUNT(*) > 1'
+            )
+            cursor.execute(
+                f'UPDATE {recipe} SET updated_at = %s WHERE id IN ('
+                f'SELECT ri.recipe_id FROM {ri} ri JOIN {merge} m '
+                f'ON ri.ingredient_id = m.ingredient_id '
+                f'WHERE m.ingredient_id <> m.winner_id)',
+                (timezone.now(),),
+            )
+            recipes = cursor.rowcount
+            cursor.execute(
+                f'UPDATE {ri} SET amount = (SELECT r.total '
+                f'FROM {rows} r WHERE r.keeper_id = {ri}.id) '
+                f'WHERE id IN (SELECT keeper_id FROM {rows})'
+            )
+            cursor.execute(
+                f'DELETE FROM {ri} WHERE id NOT IN ('
+                f'SELECT keeper_id FROM {rows}) '
+                f'AND EXISTS (SELECT 1 FROM {merge} m '
+                f'JOIN {rows} r ON r.winner_id = m.winner_id '
+                f'WHERE m.ingredient_id = {ri}.ingredient_id '
+                f'AND r.recipe_id = {ri}.recipe_id)'
+            )
+            merged = cursor.rowcount
+            cursor.execute(
+                f'UPDATE {ri} SET ingredient_id = (SELECT m.winner_id '
+                f'FROM {merge} m '
+                f'WHERE m.ingredient_id = {ri}.ingredient_id) '
+                f'WHERE ingredient_id IN (SELECT ingredient_id '
+                f'FROM {merge} WHERE ingredient_id <> winner_id)'
+            )
+            moved = cursor.rowcount
+            cursor.execute(
+                f'DELETE FROM {ingredient} WHERE id IN (SELECT ingredient_id '
+                f'FROM {merge} WHERE ingredient_id <> winner_id)'
+            )
+            ingredients = cursor.rowcount
+            cursor.execute(f'DROP TABLE {rows}')
+            cursor.execute(f'DROP TABLE {merge}')
+        # Сигналы при массовых запросах не срабатывают. Снимок справочника
+        # сбрасывается только в этом процессе: веб-воркеры подхватят
+        # объединение через CATALOGUE_TTL секунд.
+        fragments.forget_all()
+        transaction.on_commit(catalogue.ingredients.invalidate)
+        return {
+            'ingredients': ingredients,
+            'moved': moved,
+            'merged': merged,
+            'recipes': recipes,
+        }
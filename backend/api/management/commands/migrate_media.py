@@ -0,0 +1,57 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from foodgram.storage import BLOBS_DIR, tracked_fields
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит файлы, загруженные до ContentAddressedStorage, '
+        'в хранилище по хешу содержимого и обновляет ссылки на них.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', default=str(settings.BASE_DIR),
+            help='Каталог, относительно которого лежат старые файлы.',
+        )
+        parser.add_argument(
+            '--delete-source', action='store_true',
+            help='Удалить старые файлы после переноса.',
+        )
+
+    def handle(self, *args, **options):
+        moved = missing = 0
+        names = {}
+        for model, field in tracked_fields():
+            rows = (
+                model._base_manager
+                .exclude(**{f'{field.name}__startswith': f'{BLOBS_DIR}/'})
+                .exclude(**{field.name: ''})
+                .exclude(**{f'{field.name}__isnull': True})
+                .values_list('pk', field.name)
+            )
+            for pk, name in rows.iterator():
+                if name not in names:
+                    path = os.path.join(options['source'], name)
+                    if not os.path.exists(path):
+                        missing += 1
+                        self.stderr.write(f'Нет файла {path}')
+                        continue
+                    with open(path, 'rb') as source:
+                        names[name] = field.storage.save(name, File(source))
+                model._base_manager.filter(pk=pk).update(
+                    **{field.name: names[name]}
+                )
+                moved += 1
+        if options['delete_source']:
+            for name in names:
+                os.remove(os.path.join(options['source'], name))
+        blobs = len(set(names.values()))
+        self.stdout.write(
+            f'Ссылок обновлено: {moved}, файлов: {len(names)}, '
+            f'уникальных: {blobs}, не найдено: {missing}'
+        )
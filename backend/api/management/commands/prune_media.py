@@ -0,0 +1,42 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from foodgram.storage import BLOBS_DIR, is_recent, tracked_fields
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы хранилища, на которые не ссылается ни один объект.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+
+    def handle(self, *args, **options):
+        referenced = set()
+        for model, field in tracked_fields():
+            referenced.update(
+                model._base_manager.values_list(field.name, flat=True)
+            )
+        root = default_storage.path(BLOBS_DIR)
+        removed = size = 0
+        for directory, _, files in os.walk(root):
+            if os.path.basename(directory) == 'tmp':
+                continue
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, default_storage.location)
+                name = name.replace(os.sep, '/')
+                if name in referenced or is_recent(default_storage, name):
+                    continue
+                removed += 1
+                size += os.path.getsize(path)
+                if options['dry_run']:
+                    self.stdout.write(name)
+                else:
+                    os.remove(path)
+        action = 'К удалению' if options['dry_run'] else 'Удалено'
+        self.stdout.write(f'{action}: {removed} файлов, {size} байт')
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = 'Удаляет записи об удалениях для /api/sync/ старше срока хранения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.SYNC_TOMBSTONE_DAYS,
+            help='Срок хранения в днях (по умолчанию SYNC_TOMBSTONE_DAYS).',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        removed, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(f'Удалено: {removed} записей')
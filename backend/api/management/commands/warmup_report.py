@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from api import warmup
+
+STARTUP_CODE = (
+    'import django; django.setup(); '
+    'from django.urls import get_resolver; get_resolver().reverse_dict'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает, сколько времени уходит на импорт пакетов при старте '
+        'воркера, и длительность шагов прогрева api.warmup.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=15,
+            help='Сколько самых медленных пакетов показать.',
+        )
+
+    def handle(self, *args, **options):
+        packages = self._import_times()
+        total = sum(packages.values())
+        self.stdout.write(f'Импорт при старте: {total / 1000:.1f} мс')
+        slowest = sorted(packages.items(), key=lambda item: -item[1])
+        for package, took in slowest[:options['top']]:
+            self.stdout.write(
+                f'  {package:30} {took / 1000:8.1f} мс '
+                f'{took * 100 / total:5.1f}%'
+            )
+        self.stdout.write('Прогрев:')
+        for name, took in warmup.run().items():
+            self.stdout.write(f'  {name:30} {took * 1000:8.1f} мс')
+
+    def _import_times(self):
+        """Собственное время импорта пакетов верхнего уровня, мкс."""
+        env = dict(os.environ, API_WARMUP='0')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        packages = defaultdict(int)
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or '[us]' in line:
+                continue
+            own, _, name = line[len('import time:'):].split('|')
+            packages[name.strip().split('.')[0]] += int(own)
+        return packages
@@ -0,0 +1,37 @@
+# Generated by Django 3.2 on 2026-10-19 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Время')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=500, verbose_name='Путь')),
+                ('route', models.CharField(blank=True, default='', max_length=100, verbose_name='Маршрут')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('user_id', models.BigIntegerField(blank=True, null=True, verbose_name='id пользователя')),
+                ('duration', models.FloatField(db_index=True, verbose_name='Время, с')),
+                ('query_count', models.PositiveIntegerField(default=0, verbose_name='Запросов к базе')),
+                ('query_time', models.FloatField(default=0, verbose_name='Время в базе, с')),
+                ('queries', models.JSONField(blank=True, default=list, verbose_name='Запросы к базе')),
+                ('profiler', models.CharField(blank=True, choices=[('sample', 'Сэмплирование (collapsed stacks)'), ('cprofile', 'cProfile')], default='', max_length=10, verbose_name='Профилировщик')),
+                ('profile', models.TextField(blank=True, default='', verbose_name='Профиль')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ('-duration',),
+            },
+        ),
+    ]
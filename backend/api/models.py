@@ -1,3 +1,50 @@
 from django.db import models
 
-# Create your models here.
+
+class SlowRequest(models.Model):
+    """Медленный или профилированный запрос (см. api/profiling.py)."""
+
+    SAMPLE = 'sample'
+    CPROFILE = 'cprofile'
+    PROFILERS = (
+        (SAMPLE, 'Сэмплирование (collapsed stacks)'),
+        (CPROFILE, 'cProfile'),
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True, db_index=True, verbose_name='Время'
+    )
+    method = models.CharField(max_length=10, verbose_name='Метод')
+    path = models.CharField(max_length=500, verbose_name='Путь')
+    route = models.CharField(
+        max_length=100, blank=True, default='', verbose_name='Маршрут'
+    )
+    status = models.PositiveSmallIntegerField(verbose_name='Код ответа')
+    # Без внешнего ключа: запись не должна мешать удалению пользователя.
+    user_id = models.BigIntegerField(
+        null=True, blank=True, verbose_name='id пользователя'
+    )
+    duration = models.FloatField(db_index=True, verbose_name='Время, с')
+    query_count = models.PositiveIntegerField(
+        default=0, verbose_name='Запросов к базе'
+    )
+    query_time = models.FloatField(default=0, verbose_name='Время в базе, с')
+    queries = models.JSONField(
+        default=list, blank=True, verbose_name='Запросы к базе'
+    )
+    profiler = models.CharField(
+        max_length=10,
+        choices=PROFILERS,
+        blank=True,
+        default='',
+        verbose_name='Профилировщик',
+    )
+    profile = models.TextField(blank=True, default='', verbose_name='Профиль')
+
+    class Meta:
+        ordering = ('-duration',)
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration:.3f} с)'
@@ -0,0 +1,224 @@
+"""Профилирование отдельных запросов и журнал медленных запросов.
+
+Сотрудник (``is_staff``) может профилировать один запрос заголовком
+``X-Profile: sample|cprofile`` или параметром ``?profile=sample|cprofile``
+(``1`` — то же, что ``sample``):
+
+* ``sample`` — поток-сэмплер раз в ``PROFILER_SAMPLE_INTERVAL`` секунд
+  снимает стек потока запроса; результат в формате collapsed stacks
+  (``модуль:функция;...;модуль:функция N``) подходит для flamegraph.pl
+  и speedscope;
+* ``cprofile`` — отчёт ``pstats`` по совокупному времени.
+
+Профиль сохраняется в ``SlowRequest``, его id возвращается в заголовке
+``X-Profile-Id``, а сам профиль можно скачать в админке. Туда же
+попадают все запросы дольше ``PROFILER_SLOW_THRESHOLD`` секунд вместе с
+их SQL (до ``PROFILER_MAX_QUERIES`` запросов); хранятся последние
+``PROFILER_KEEP`` записей. Под ASGI профилировщики не запускаются:
+запрос выполняется в цикле событий вперемешку с другими.
+"""
+import asyncio
+import contextvars
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .authentication import request_user
+from .models import SlowRequest
+
+HEADER = 'HTTP_X_PROFILE'
+PARAM = 'profile'
+
+_queries = contextvars.ContextVar('profiled_queries', default=None)
+
+
+class Queries:
+    """SQL запроса: все считаются, сохраняются первые PROFILER_MAX_QUERIES."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.items = []
+
+    def add(self, elapsed, sql):
+        self.count += 1
+        self.time += elapsed
+        if len(self.items) < settings.PROFILER_MAX_QUERIES:
+            self.items.append({'time': round(elapsed, 6), 'sql': sql})
+
+
+class Sampler(threading.Thread):
+    """Сэмплирующий профилировщик одного потока."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                module = frame.f_globals.get('__name__', '?')
+                stack.append(f'{module}:{frame.f_code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return '\n'.join(
+            f'{stack} {count}' for stack, count in self.stacks.most_common()
+        )
+
+
+def _sample(call):
+    sampler = Sampler(threading.get_ident(), settings.PROFILER_SAMPLE_INTERVAL)
+    sampler.start()
+    try:
+        response = call()
+    finally:
+        sampler.stop()
+    return response, sampler.collapsed()
+
+
+def _cprofile(call):
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        response = call()
+    finally:
+        profile.disable()
+    output = io.StringIO()
+    pstats.Stats(profile, stream=output).sort_stats('cumulative').print_stats(
+        100
+    )
+    return response, output.getvalue()
+
+
+PROFILERS = {'sample': _sample, 'cprofile': _cprofile}
+
+
+def requested_profiler(request):
+    """Имя профилировщика из запроса, если его просит сотрудник."""
+    name = request.META.get(HEADER) or request.GET.get(PARAM)
+    if not name:
+        return None
+    name = 'sample' if name == '1' else name.lower()
+    if name not in PROFILERS:
+        return None
+    user = request_user(request)
+    if user is None or not user.is_staff:
+        return None
+    return name
+
+
+def _record_query(execute, sql, params, many, context):
+    captured = _queries.get()
+    if captured is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        captured.add(time.perf_counter() - start, sql)
+
+
+@receiver(connection_created)
+def capture_queries(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+# Соединения, открытые до импорта модуля.
+for _connection in connections.all():
+    capture_queries(None, _connection)
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.url_name or '') if match else ''
+
+
+def save(request, response, duration, queries, profiler='', profile=''):
+    user = getattr(request, 'user', None)
+    if user is not None and not user.is_authenticated:
+        user = None
+    entry = SlowRequest.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:500],
+        route=_route(request),
+        status=response.status_code,
+        user_id=user.pk if user is not None else None,
+        duration=duration,
+        query_count=queries.count,
+        query_time=queries.time,
+        queries=queries.items,
+        profiler=profiler,
+        profile=profile,
+    )
+    cutoff = SlowRequest.objects.order_by('-id').values_list(
+        'id', flat=True
+    )[settings.PROFILER_KEEP:settings.PROFILER_KEEP + 1]
+    if cutoff:
+        SlowRequest.objects.filter(id__lte=cutoff[0]).delete()
+    return entry
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if getattr(self, '_is_coroutine', None):
+            return self.__acall__(request)
+        profiler = requested_profiler(request)
+        queries = Queries()
+        token = _queries.set(queries)
+        start = time.perf_counter()
+        try:
+            if profiler:
+                response, profile = PROFILERS[profiler](
+                    lambda: self.get_response(request)
+                )
+            else:
+                response, profile = self.get_response(request), ''
+        finally:
+            _queries.reset(token)
+        duration = time.perf_counter() - start
+        if profiler or duration >= settings.PROFILER_SLOW_THRESHOLD:
+            entry = save(
+                request, response, duration, queries, profiler or '', profile
+            )
+            if profiler:
+                response['X-Profile-Id'] = str(entry.pk)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        duration = time.perf_counter() - start
+        if duration >= settings.PROFILER_SLOW_THRESHOLD:
+            await sync_to_async(save)(request, response, duration, Queries())
+        return response
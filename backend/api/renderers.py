@@ -0,0 +1,32 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer, который кодирует ответ через orjson, если он установлен.
+
+    Вывод совпадает с компактным выводом ``JSONRenderer``: без пробелов,
+    без экранирования не-ASCII, с экранированными U+2028/U+2029. Типы,
+    которые orjson не знает (Decimal, даты, lazy-строки), кодируются
+    ``JSONEncoder`` из DRF; при отступах работает обычный рендерер.
+    """
+
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(
+            data, default=JSONEncoder().default, option=self.options
+        )
+        return ret.replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(b'\xe2\x80\xa9', b'\\u2029')
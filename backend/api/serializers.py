@@ -4,16 +4,19 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 
+from foodgram import metrics
 from recipes.models import Recipe, Tag, Ingredient, RecipeIngredient, Favorite, ShoppingCart
 from users.models import User
+from .fieldsets import SparseFieldsMixin
 from .pagination import CustomPaginator
 
 User = get_user_model()
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.ImageField(read_only=True)
 
@@ -58,6 +61,8 @@ class FollowSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
 
+    expandable_fields = ('recipes',)
+
     class Meta(CustomUserSerializer.Meta):
         fields = CustomUserSerializer.Meta.fields + (
             'recipes',
@@ -121,8 +126,16 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
+class TimedBase64ImageField(Base64ImageField):
+    """Base64ImageField с учётом времени разбора картинки в метриках."""
+
+    def to_internal_value(self, data):
+        with metrics.IMAGE_PROCESSING.time(field=self.field_name):
+            return super().to_internal_value(data)
+
+
 class RecipeWriteSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = TimedBase64ImageField()
     ingredients = RecipeIngredientWriteSerializer(
         many=True, source='recipe_ingredients'
     )
@@ -188,20 +201,30 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
         return data
 
+    @staticmethod
+    def _add_ingredients(recipe, ingredients_data):
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredient['id'],
+                amount=ingredient['amount'],
+            )
+            for ingredient in ingredients_data
+        )
+
+    # Рецепт, его теги и ингредиенты пишутся одной транзакцией, поэтому
+    # updated_at (auto_now) сдвигается один раз — сохранением рецепта.
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients_data = validated_data.pop('recipe_ingredients')
         recipe = Recipe.objects.create(**validated_data)
+        # tags_mask пересчитывается сигналом (recipes/signals.py).
         recipe.tags.set(tags)
-
-        for ingredient in ingredients_data:
-            RecipeIngredient.objects.update_or_create(
-                recipe=recipe,
-                ingredient=ingredient['id'],
-                defaults={'amount': ingredient['amount']}
-            )
+        self._add_ingredients(recipe, ingredients_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients_data = validated_data.pop('recipe_ingredients', None)
@@ -215,16 +238,11 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
         if ingredients_data is not None:
             instance.recipe_ingredients.all().delete()
-            for ingredient in ingredients_data:
-                RecipeIngredient.objects.update_or_create(
-                    recipe=instance,
-                    ingredient=ingredient['id'],
-                    defaults={'amount': ingredient['amount']}
-                )
+            self._add_ingredients(instance, ingredients_data)
         return instance
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
     author = CustomUserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
@@ -234,6 +252,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
+    expandable_fields = ('author', 'tags', 'ingredients')
+
     class Meta:
         model = Recipe
         fields = (
@@ -0,0 +1,242 @@
+"""Защита от «стада» одинаковых запросов (single-flight).
+
+``single_flight`` кеширует готовый ответ действия вьюсета по ключу из
+``key(view, request, *args, **kwargs)`` (None — не кешировать):
+
+* в процессе одновременно вычисляется только один ответ на ключ,
+  остальные запросы ждут его и получают тот же результат;
+* с ``SINGLE_FLIGHT_LOCK = True`` процессы договариваются через
+  ``cache.add`` в кеше Django: пока один процесс считает ответ, другие
+  ждут его появления в кеше до ``SINGLE_FLIGHT_LOCK_TIMEOUT`` секунд;
+* ответ свежий ``ttl`` секунд, ещё ``stale`` секунд он отдаётся сразу,
+  а пересчитывается в фоновом потоке (stale-while-revalidate). Поток
+  не трогает объекты исходного запроса: он повторяет запрос с теми же
+  путём, параметрами и заголовками через URLconf.
+
+Кешируются только успешные (2xx) ответы. Абсолютные ссылки в ответе
+(``next``/``previous``, аватары) строятся от хоста запроса, поэтому хост
+входит в ключ. ``fetch`` — то же для обработчиков вне вьюсетов.
+"""
+import asyncio
+import functools
+import hashlib
+import io
+import logging
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections, connections
+from django.http import HttpResponse
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+# Атрибут запроса, повторённого для фонового пересчёта: он вычисляется
+# заново, минуя кеш.
+REFRESH = 'single_flight_refresh'
+
+_flights = {}
+_refreshing = set()
+_flights_lock = threading.Lock()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def run_once(key, compute):
+    """Выполняет ``compute`` один раз на ключ среди одновременных вызовов."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+    try:
+        flight.value = compute()
+    except Exception as error:
+        flight.error = error
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+    return flight.value
+
+
+def _cache():
+    return caches[settings.SINGLE_FLIGHT_CACHE]
+
+
+def _entry(response, ttl):
+    if hasattr(response, 'render'):
+        response.render()
+    return {
+        'status': response.status_code,
+        'content': response.content,
+        'headers': list(response.items()),
+        'fresh_until': time.time() + ttl,
+    }
+
+
+def _to_response(entry):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for name, value in entry['headers']:
+        response[name] = value
+    return response
+
+
+def _wait_for_entry(cache, key, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        time.sleep(0.05)
+    return None
+
+
+def cache_key(prefix, request, raw_key):
+    """Ключ кеша; ответ содержит абсолютные ссылки, поэтому в нём и хост."""
+    origin = f'{request.scheme}://{request.get_host()}'
+    digest = hashlib.md5(str((origin, raw_key)).encode()).hexdigest()
+    return f'single-flight:{prefix}:{digest}'
+
+
+def _environ(request):
+    """Окружение WSGI для повтора запроса: только строки из META."""
+    environ = {
+        name: value for name, value in request.META.items()
+        if isinstance(value, str)
+    }
+    environ.update({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': request.path_info,
+        'SCRIPT_NAME': request.META.get('SCRIPT_NAME', ''),
+        'CONTENT_LENGTH': '0',
+        'wsgi.url_scheme': request.scheme,
+    })
+    return environ
+
+
+def _replay(environ):
+    """Выполняет запрос заново с флагом ``REFRESH`` через URLconf."""
+    request = WSGIRequest({**environ, 'wsgi.input': io.BytesIO()})
+    setattr(request, REFRESH, True)
+    match = resolve(request.path_info)
+    request.resolver_match = match
+    view = match.func
+    if asyncio.iscoroutinefunction(view):
+        view = async_to_sync(view)
+    return view(request, *match.args, **match.kwargs)
+
+
+def _refresh(key, environ):
+    cache = _cache()
+    lock_key = f'{key}:lock'
+    close_old_connections()
+    try:
+        if settings.SINGLE_FLIGHT_LOCK and not cache.add(
+            lock_key, 1, timeout=settings.SINGLE_FLIGHT_LOCK_TIMEOUT,
+        ):
+            return
+        try:
+            _replay(environ)
+        finally:
+            if settings.SINGLE_FLIGHT_LOCK:
+                cache.delete(lock_key)
+    except Exception:
+        logger.exception('Фоновый пересчёт %s не удался', key)
+    finally:
+        with _flights_lock:
+            _refreshing.discard(key)
+        connections.close_all()
+
+
+def _start_refresh(key, request):
+    with _flights_lock:
+        if key in _refreshing or key in _flights:
+            return
+        _refreshing.add(key)
+    threading.Thread(
+        target=_refresh, args=(key, _environ(request)), daemon=True
+    ).start()
+
+
+def fetch(key, request, compute, ttl, stale=0):
+    """Ответ по ключу ``cache_key``: из кеша или одним вычислением.
+
+    ``compute()`` возвращает ответ для ``request``; устаревший ответ
+    пересчитывается в фоне повтором запроса (см. ``_replay``).
+    """
+    cache = _cache()
+    lock_key = f'{key}:lock'
+
+    def compute_entry():
+        entry = _entry(compute(), ttl)
+        if 200 <= entry['status'] < 300:
+            cache.set(key, entry, timeout=ttl + stale)
+        return entry
+
+    def compute_locked():
+        if not settings.SINGLE_FLIGHT_LOCK:
+            return compute_entry()
+        timeout = settings.SINGLE_FLIGHT_LOCK_TIMEOUT
+        locked = cache.add(lock_key, 1, timeout=timeout)
+        if not locked:
+            entry = _wait_for_entry(cache, key, timeout)
+            if entry is not None:
+                return entry
+        try:
+            return compute_entry()
+        finally:
+            if locked:
+                cache.delete(lock_key)
+
+    if getattr(request, REFRESH, False):
+        return _to_response(run_once(key, compute_entry))
+    entry = cache.get(key)
+    if entry is not None:
+        if entry['fresh_until'] <= time.time():
+            _start_refresh(key, request)
+        return _to_response(entry)
+    return _to_response(run_once(key, compute_locked))
+
+
+def single_flight(key, ttl, stale=0):
+    """Декоратор действия вьюсета; ``ttl`` и ``stale`` в секундах."""
+
+    def decorator(func):
+        prefix = f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            raw_key = key(self, request, *args, **kwargs)
+            if raw_key is None:
+                return func(self, request, *args, **kwargs)
+
+            def compute():
+                response = func(self, request, *args, **kwargs)
+                return self.finalize_response(
+                    request, response, *args, **kwargs
+                )
+
+            return fetch(
+                cache_key(prefix, request, raw_key), request, compute,
+                ttl, stale,
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,171 @@
+"""Дельта-синхронизация для офлайн-клиентов: ``GET /api/sync/?since=``.
+
+Ответ содержит рецепты, изменённые после токена ``since`` (по
+``Recipe.updated_at``), удалённые рецепты и — для авторизованного
+пользователя — его добавления и удаления в избранном и корзине. Каждый
+поток ограничен ``SYNC_BATCH_SIZE`` записями; при ``has_more`` клиент
+повторяет запрос с ``next_token``. Без ``since`` отдаётся всё с начала.
+
+Добавления берутся из существующих строк ``Favorite``/``ShoppingCart``
+с id больше курсора, удаления — из ``Tombstone``. Удаление пары, которая
+после него была добавлена снова, не отдаётся, поэтому результат не
+зависит от порядка, в котором клиент применит потоки.
+
+Курсоры основаны на ``updated_at`` и автоинкрементных id: строка,
+записанная транзакцией, которая зафиксировалась позже соседней с
+большим id, может быть пропущена.
+
+Записи ``Tombstone`` старше ``SYNC_TOMBSTONE_DAYS`` дней удаляет
+``manage.py prune_tombstones``. Если удаления после токена уже вычищены,
+ответ строится как без ``since`` и содержит ``reset: true``: клиент
+заменяет свои данные целиком.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from recipes.models import Favorite, Recipe, ShoppingCart, Tombstone
+
+from . import fastpath
+
+PARAM = 'since'
+# r — (updated_at, id) последнего рецепта, t — id последней записи
+# Tombstone, f и c — id последних строк избранного и корзины.
+START = {'r': None, 't': 0, 'f': 0, 'c': 0}
+
+
+def encode(cursor):
+    data = json.dumps(cursor, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode(token):
+    if not token:
+        return dict(START)
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if set(cursor) != set(START):
+            raise ValueError
+        if cursor['r'] is not None:
+            updated_at, pk = cursor['r']
+            cursor['r'] = (parse_datetime(updated_at), int(pk))
+            if cursor['r'][0] is None:
+                raise ValueError
+        for key in ('t', 'f', 'c'):
+            cursor[key] = int(cursor[key])
+    except (ValueError, TypeError):
+        raise ValidationError({PARAM: 'Неверный токен синхронизации.'})
+    return cursor
+
+
+def _limited(queryset, limit):
+    rows = list(queryset[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def _recipes(request, cursor, limit):
+    queryset = Recipe.objects.order_by('updated_at', 'pk')
+    if cursor['r'] is not None:
+        updated_at, pk = cursor['r']
+        queryset = queryset.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk)
+        )
+    rows, more = _limited(
+        queryset.values(*fastpath.RECIPE_FIELDS, 'updated_at'), limit
+    )
+    if rows:
+        cursor['r'] = (rows[-1]['updated_at'], rows[-1]['id'])
+    return fastpath.recipe_payloads(rows, request), more
+
+
+def _added(model, key, user, cursor, limit):
+    if not user.is_authenticated:
+        return [], False
+    rows, more = _limited(
+        model.objects
+        .filter(user_id=user.pk, pk__gt=cursor[key])
+        .order_by('pk')
+        .values_list('pk', 'recipe_id'),
+        limit,
+    )
+    if rows:
+        cursor[key] = rows[-1][0]
+    return [recipe_id for _, recipe_id in rows], more
+
+
+def _pruned(cursor):
+    """Удаления после курсора могли быть вычищены ``prune_tombstones``."""
+    if not cursor['t']:
+        return False
+    oldest = Tombstone.objects.order_by('id').values_list(
+        'id', flat=True
+    ).first()
+    # Id выдаются по возрастанию: пропуск сразу после курсора значит, что
+    # старые записи удалены.
+    return oldest is None or oldest > cursor['t'] + 1
+
+
+def _removed(user, cursor, limit):
+    kinds = Q(kind=Tombstone.RECIPE)
+    if user.is_authenticated:
+        kinds |= Q(user_id=user.pk)
+    rows, more = _limited(
+        Tombstone.objects
+        .filter(kinds, id__gt=cursor['t'])
+        .order_by('id')
+        .values_list('id', 'kind', 'recipe_id'),
+        limit,
+    )
+    if rows:
+        cursor['t'] = rows[-1][0]
+    removed = {kind: [] for kind, _ in Tombstone.KINDS}
+    for _, kind, recipe_id in rows:
+        removed[kind].append(recipe_id)
+    for kind, model in (
+        (Tombstone.FAVORITE, Favorite),
+        (Tombstone.SHOPPING_CART, ShoppingCart),
+    ):
+        present = fastpath.user_recipe_ids(model, user, removed[kind])
+        removed[kind] = [
+            recipe_id for recipe_id in dict.fromkeys(removed[kind])
+            if recipe_id not in present
+        ]
+    return removed, more
+
+
+def changes(request):
+    """Изменения после токена из ``?since=`` и токен для следующего запроса."""
+    cursor = decode(request.query_params.get(PARAM))
+    reset = _pruned(cursor)
+    if reset:
+        cursor = dict(START)
+    limit = settings.SYNC_BATCH_SIZE
+    user = request.user
+    recipes, more_recipes = _recipes(request, cursor, limit)
+    favorites, more_favorites = _added(Favorite, 'f', user, cursor, limit)
+    cart, more_cart = _added(ShoppingCart, 'c', user, cursor, limit)
+    removed, more_removed = _removed(user, cursor, limit)
+    if cursor['r'] is not None:
+        updated_at, pk = cursor['r']
+        cursor['r'] = (updated_at.isoformat(), pk)
+    return {
+        'recipes': recipes,
+        'deleted_recipes': removed[Tombstone.RECIPE],
+        'favorites': {
+            'added': favorites,
+            'removed': removed[Tombstone.FAVORITE],
+        },
+        'shopping_cart': {
+            'added': cart,
+            'removed': removed[Tombstone.SHOPPING_CART],
+        },
+        'next_token': encode(cursor),
+        'reset': reset,
+        'has_more': (
+            more_recipes or more_favorites or more_cart or more_removed
+        ),
+    }
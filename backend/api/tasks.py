@@ -0,0 +1,10 @@
+from jobs.queue import handler
+from users.models import User
+
+from . import archive
+
+
+@handler(archive.JOB)
+def export_user_data(user_id):
+    """Архив данных пользователя, слишком большой для потоковой отдачи."""
+    return {'name': archive.save(User.objects.get(pk=user_id))}
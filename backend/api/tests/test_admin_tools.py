@@ -0,0 +1,42 @@
+"""Пагинатор админки для больших таблиц."""
+from django.core.paginator import EmptyPage
+from django.test import TestCase, override_settings
+
+from foodgram.admin_tools import EstimatedCountPaginator
+from recipes.models import Ingredient
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=5)
+class EstimatedCountPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(11)
+        )
+
+    def paginator(self):
+        return EstimatedCountPaginator(Ingredient.objects.order_by('pk'), 3)
+
+    def test_exact_below_limit(self):
+        with override_settings(ADMIN_EXACT_COUNT_LIMIT=100):
+            paginator = self.paginator()
+            self.assertEqual(str(paginator.count), '11')
+            self.assertEqual(paginator.num_pages, 4)
+
+    def test_capped_count(self):
+        paginator = self.paginator()
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(str(paginator.count), '5+')
+
+    def test_pages_past_limit(self):
+        page = self.paginator().page(3)
+        self.assertEqual(len(page.object_list), 3)
+        self.assertTrue(page.has_next())
+        last = self.paginator().page(4)
+        self.assertEqual(len(last.object_list), 2)
+        self.assertFalse(last.has_next())
+        self.assertEqual(last.paginator.num_pages, 4)
+        with self.assertRaises(EmptyPage):
+            self.paginator().page(5)
@@ -0,0 +1,53 @@
+"""Асинхронные обработчики чтения (api/async_views.py)."""
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from rest_framework.settings import api_settings
+
+from api import async_views, catalogue, throttling
+from recipes.models import Ingredient
+
+ingredient_list = next(
+    pattern.callback for pattern in async_views.urlpatterns
+    if str(pattern.pattern) == 'ingredients/'
+)
+
+THROTTLED = override_settings(REST_FRAMEWORK={
+    **api_settings.user_settings,
+    'DEFAULT_THROTTLE_RATES': {'ingredient_search': '2/min'},
+})
+
+
+@THROTTLED
+class IngredientListTests(TransactionTestCase):
+
+    def setUp(self):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        Ingredient.objects.create(name='сахар', measurement_unit='г')
+        catalogue.ingredients.invalidate()
+        self.addCleanup(catalogue.ingredients.invalidate)
+        throttling._stores.clear()
+        self.addCleanup(throttling._stores.clear)
+
+    def get(self, **params):
+        request = RequestFactory().get('/api/ingredients/', params)
+        return async_to_sync(ingredient_list)(request)
+
+    def test_search_is_throttled(self):
+        for _ in range(2):
+            response = self.get(name='со')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [item['name'] for item in json.loads(response.content)],
+                ['соль'],
+            )
+        response = self.get(name='са')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_full_list_is_not_throttled(self):
+        for _ in range(3):
+            response = self.get()
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(json.loads(response.content)), 2)
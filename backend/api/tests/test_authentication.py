@@ -0,0 +1,68 @@
+"""Кеш токенов и их отзыв между процессами (api/authentication.py)."""
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from api import authentication
+from api.authentication import CachedTokenAuthentication
+from users.models import User
+
+
+class CachedTokenTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user', password='x',
+            first_name='Анна', last_name='Повар',
+        )
+        cls.key = Token.objects.create(user=cls.user).key
+
+    def setUp(self):
+        authentication.token_cache.clear()
+        caches['default'].clear()
+
+    def authenticate(self):
+        user, _ = CachedTokenAuthentication().authenticate_credentials(
+            self.key
+        )
+        return user
+
+    def test_hit_checks_version_without_query(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().pk, self.user.pk)
+
+    def test_revoked_in_other_process(self):
+        self.authenticate()
+        # Другой процесс удалил токен: сигналы этого процесса не сработали.
+        Token.objects.filter(key=self.key)._raw_delete('default')
+        authentication.bump_versions([self.key])
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_evicted_version_forces_reload(self):
+        self.authenticate()
+        caches['default'].clear()
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    def test_user_change_bumps_version_after_commit(self):
+        self.authenticate()
+        version_key = authentication._version_key(self.key)
+        version = caches['default'].get(version_key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertNotEqual(caches['default'].get(version_key), version)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_token_delete_bumps_version_after_commit(self):
+        self.authenticate()
+        version_key = authentication._version_key(self.key)
+        version = caches['default'].get(version_key)
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.get(key=self.key).delete()
+        self.assertNotEqual(caches['default'].get(version_key), version)
@@ -0,0 +1,132 @@
+"""Выгрузка и загрузка рецептов в JSON Lines."""
+import json
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase
+
+from api import bulk
+from recipes.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from users.models import User
+
+from .test_storage import MediaRootMixin
+
+
+class BulkTests(MediaRootMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author', password='x',
+            first_name='Анна', last_name='Повар',
+        )
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+
+    def setUp(self):
+        super().setUp()
+        self.image = default_storage.save('recipe.png', ContentFile(b'png'))
+
+    def line(self, **changes):
+        data = {
+            'short_code': 'abc123',
+            'name': 'Каша',
+            'text': 'Варить',
+            'cooking_time': 10,
+            'author': 'author',
+            'image': self.image,
+            'tags': ['breakfast'],
+            'ingredients': [
+                {'name': 'соль', 'measurement_unit': 'г', 'amount': 5},
+            ],
+        }
+        data.update(changes)
+        return json.dumps(data)
+
+    def load(self, *lines):
+        return bulk.Importer().run(lines)
+
+    def test_invalid_values_are_line_errors(self):
+        salt = {'name': 'соль', 'measurement_unit': 'г'}
+        lines = [
+            self.line(short_code={'code': 1}),
+            self.line(short_code=''),
+            self.line(short_code=None),
+            self.line(cooking_time=True),
+            self.line(cooking_time=bulk.COOKING_TIME_MAX + 1),
+            self.line(ingredients=[{**salt, 'amount': True}]),
+            self.line(
+                ingredients=[{**salt, 'amount': bulk.AMOUNT_MAX + 1}]
+            ),
+            self.line(author={'name': 'author'}),
+            self.line(tags=[{'slug': 'breakfast'}]),
+            self.line(created=1),
+            self.line(image='blobs/00/00/missing.png'),
+            self.line(image='../../etc/passwd'),
+            self.line(short_code='ok', cooking_time=bulk.COOKING_TIME_MAX),
+        ]
+        report = self.load(*lines)
+        self.assertEqual(
+            [error['line'] for error in report['errors']],
+            list(range(1, len(lines))),
+        )
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(
+            Recipe.objects.get().cooking_time, bulk.COOKING_TIME_MAX
+        )
+
+    def test_new_recipes_get_unique_codes(self):
+        recipes = [
+            Recipe.objects.create(
+                author=self.author, name='Каша', text='Варить',
+                cooking_time=10, image=self.image,
+            )
+            for _ in range(2)
+        ]
+        codes = {recipe.short_code for recipe in recipes}
+        self.assertEqual(len(codes), 2)
+        self.assertNotIn('', codes)
+
+    def test_export_is_read_only_and_reimport_skips(self):
+        recipe = Recipe.objects.create(
+            author=self.author, name='Каша', text='Варить', cooking_time=10,
+            image=self.image,
+        )
+        RecipeTag.objects.create(recipe=recipe, tag=Tag.objects.get())
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=Ingredient.objects.get(), amount=5
+        )
+        # Пачка рецептов, теги, ингредиенты и признак конца — без записи.
+        with self.assertNumQueries(4):
+            lines = list(bulk.export_lines())
+        self.assertEqual(
+            json.loads(lines[0])['short_code'], recipe.short_code
+        )
+        report = self.load(*lines)
+        self.assertEqual((report['created'], report['skipped']), (0, 1))
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_code_taken_concurrently_is_skipped(self):
+        author = self.author
+        image = self.image
+
+        class Racing(bulk.Importer):
+            # Другой процесс вставляет тот же код между проверкой и вставкой.
+            def _insert(self, valid):
+                if not Recipe.objects.filter(short_code='abc123').exists():
+                    Recipe.objects.create(
+                        author=author, name='Чужой', text='Текст',
+                        cooking_time=1, image=image, short_code='abc123',
+                    )
+                super()._insert(valid)
+
+        report = Racing().run([
+            self.line(), self.line(short_code='other', name='Суп'),
+        ])
+        self.assertEqual((report['created'], report['skipped']), (1, 1))
+        self.assertEqual(
+            Recipe.objects.get(short_code='abc123').name, 'Чужой'
+        )
+        recipe = Recipe.objects.get(short_code='other')
+        self.assertEqual(recipe.name, 'Суп')
+        self.assertEqual(recipe.recipe_ingredients.count(), 1)
@@ -0,0 +1,38 @@
+"""Сжатие ответов (foodgram/compression.py)."""
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from foodgram.compression import CompressionMiddleware
+
+BODY = b'<p>' + b'recipe ' * 500 + b'</p>'
+
+
+class CompressionTests(SimpleTestCase):
+
+    def respond(self, content_type, **headers):
+        request = RequestFactory().get(
+            '/', HTTP_ACCEPT_ENCODING='gzip', **headers
+        )
+        middleware = CompressionMiddleware(
+            lambda request: HttpResponse(BODY, content_type=content_type)
+        )
+        return middleware(request)
+
+    def test_public_html_is_compressed(self):
+        response = self.respond('text/html; charset=utf-8')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_private_html_is_not_compressed(self):
+        response = self.respond(
+            'text/html; charset=utf-8', HTTP_AUTHORIZATION='Token abc'
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, BODY)
+
+    def test_private_json_is_compressed_without_etag(self):
+        response = self.respond(
+            'application/json', HTTP_AUTHORIZATION='Token abc'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('ETag'))
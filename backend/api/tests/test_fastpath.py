@@ -0,0 +1,223 @@
+"""Быстрый путь чтения рецептов отдаёт те же байты, что сериализаторы."""
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from api import catalogue, fragments
+from api.views import RecipeViewSet
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    ShoppingCart,
+    Tag,
+    tags_mask,
+)
+from users.models import User
+
+
+class SharedCacheMixin:
+    """Общий кеш для фрагментов: файловый, во временном каталоге."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.shared_cache = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': cls.cache_dir,
+        }})
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+        super().tearDownClass()
+
+
+class FastPathParityTests(SharedCacheMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author', password='x',
+            first_name='Анна', last_name='Повар',
+            avatar='blobs/aa/bb/avatar.png',
+        )
+        cls.reader = User.objects.create_user(
+            email='reader@example.com', username='reader', password='x',
+            first_name='Иван', last_name='Читатель',
+        )
+        cls.reader.subscriptions.add(cls.author)
+        tags = [
+            Tag.objects.create(name=name, slug=slug, color='#00FF00')
+            for name, slug in (('Завтрак', 'breakfast'), ('Обед', 'lunch'))
+        ]
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        milk = Ingredient.objects.create(name='молоко', measurement_unit='мл')
+        cls.recipes = []
+        for number in range(8):
+            author = cls.author if number % 2 else cls.reader
+            recipe_tags = tags[:1 + number % 2]
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {number} «тест»',
+                # U+2028 экранируется обоими рендерерами одинаково.
+                text=f'Шаг 1\u2028Шаг 2 — {number}',
+                cooking_time=5 + number,
+                image=f'blobs/cc/dd/recipe{number}.png',
+                tags_mask=tags_mask(tag.pk for tag in recipe_tags),
+            )
+            for tag in recipe_tags:
+                RecipeTag.objects.create(recipe=recipe, tag=tag)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=milk, amount=100 + number
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=salt, amount=number + 1
+            )
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[:3]:
+            Favorite.objects.create(user=cls.reader, recipe=recipe)
+        for recipe in cls.recipes[2:5]:
+            ShoppingCart.objects.create(user=cls.reader, recipe=recipe)
+
+    def setUp(self):
+        catalogue.tags.invalidate()
+
+    def _get(self, url, user):
+        for cache in caches.all():
+            cache.clear()
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        response = client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.content
+
+    def serializer_body(self, url, user):
+        with override_settings(FAST_READ_PATH=False), mock.patch.object(
+            RecipeViewSet, 'renderer_classes', [JSONRenderer]
+        ):
+            return self._get(url, user)
+
+    def fast_body(self, url, user, use_fragments):
+        with override_settings(
+            FAST_READ_PATH=True, RECIPE_FRAGMENTS=use_fragments
+        ), self.shared_cache:
+            self.assertEqual(fragments.enabled(), use_fragments)
+            return self._get(url, user)
+
+    def assert_parity(self, url):
+        for user in (None, self.reader, self.author):
+            expected = self.serializer_body(url, user)
+            for use_fragments in (False, True):
+                with self.subTest(url=url, user=user, fragments=use_fragments):
+                    self.assertEqual(
+                        self.fast_body(url, user, use_fragments), expected
+                    )
+
+    def test_list(self):
+        self.assert_parity('/api/recipes/')
+
+    def test_paginated(self):
+        self.assert_parity('/api/recipes/?page=2&limit=3')
+
+    def test_detail(self):
+        self.assert_parity(f'/api/recipes/{self.recipes[3].pk}/')
+
+    def test_filters(self):
+        for query in (
+            'tags=breakfast',
+            'tags=lunch&tags=breakfast',
+            f'author={self.author.pk}',
+            'is_favorited=1',
+            'is_in_shopping_cart=1',
+            'is_favorited=0&is_in_shopping_cart=1',
+            'is_favorited=1&tags=lunch&limit=2',
+        ):
+            self.assert_parity(f'/api/recipes/?{query}')
+
+
+@override_settings(RECIPE_FRAGMENTS=True)
+class FragmentVersionTests(SharedCacheMixin, APITestCase):
+    """Фрагмент читается по версии рецепта, а не сбрасывается после коммита.
+
+    В ``TestCase`` колбэки ``on_commit`` не выполняются, так что свежий
+    ответ здесь возможен только благодаря новой версии в ключе.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author', password='x',
+            first_name='Анна', last_name='Повар',
+        )
+        tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Каша', text='Варить',
+            cooking_time=10, image='blobs/cc/dd/recipe.png',
+        )
+        RecipeTag.objects.create(recipe=cls.recipe, tag=tag)
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=salt, amount=1
+        )
+
+    def setUp(self):
+        self.shared_cache.enable()
+        self.addCleanup(self.shared_cache.disable)
+        caches['default'].clear()
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def get(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_enabled_only_with_shared_cache(self):
+        self.assertTrue(fragments.enabled())
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}):
+            self.assertFalse(fragments.enabled())
+            self.assertEqual(
+                [error.id for error in fragments.check_cache()], ['api.W001']
+            )
+            with override_settings(RECIPE_FRAGMENTS=False):
+                self.assertEqual(fragments.check_cache(), [])
+
+    def test_recipe_change(self):
+        self.assertEqual(self.get()['name'], 'Каша')
+        self.recipe.name = 'Овсянка'
+        self.recipe.save()
+        self.assertEqual(self.get()['name'], 'Овсянка')
+
+    def test_ingredient_rename(self):
+        self.get()
+        salt = Ingredient.objects.get(name='соль')
+        salt.name = 'соль морская'
+        salt.save()
+        self.assertEqual(
+            self.get()['ingredients'][0]['name'], 'соль морская'
+        )
+
+    def test_author_change(self):
+        self.get()
+        self.author.first_name = 'Мария'
+        self.author.save()
+        self.assertEqual(self.get()['author']['first_name'], 'Мария')
+
+    def test_login_keeps_version(self):
+        self.get()
+        before = Recipe.objects.get(pk=self.recipe.pk).updated_at
+        self.author.save(update_fields=['last_login'])
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).updated_at, before
+        )
@@ -0,0 +1,75 @@
+"""Фильтр по тегам и битовая маска ``Recipe.tags_mask``."""
+from rest_framework.test import APITestCase
+
+from api import catalogue
+from recipes.models import Recipe, RecipeTag, Tag, tags_mask
+from users.models import User
+
+
+class TagFilterTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author', password='x',
+            first_name='А', last_name='Б',
+        )
+        cls.breakfast = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.lunch = Tag.objects.create(name='Обед', slug='lunch')
+
+    def setUp(self):
+        catalogue.tags.invalidate()
+
+    def create_recipe(self, name='Каша'):
+        return Recipe.objects.create(
+            author=self.author, name=name, text='Текст', cooking_time=5,
+            image='blobs/aa/bb/image.png',
+        )
+
+    def mask(self, recipe):
+        return Recipe.objects.values_list(
+            'tags_mask', flat=True
+        ).get(pk=recipe.pk)
+
+    def test_mask_follows_m2m_changes(self):
+        recipe = self.create_recipe()
+        recipe.tags.set([self.breakfast, self.lunch])
+        self.assertEqual(
+            self.mask(recipe), tags_mask([self.breakfast.pk, self.lunch.pk])
+        )
+        self.assertEqual(recipe.tags_mask, self.mask(recipe))
+        recipe.tags.remove(self.lunch)
+        self.assertEqual(self.mask(recipe), tags_mask([self.breakfast.pk]))
+        self.lunch.recipes.add(recipe)
+        self.assertEqual(
+            self.mask(recipe), tags_mask([self.breakfast.pk, self.lunch.pk])
+        )
+        self.breakfast.recipes.clear()
+        self.assertEqual(self.mask(recipe), tags_mask([self.lunch.pk]))
+        recipe.tags.clear()
+        self.assertEqual(self.mask(recipe), 0)
+
+    def test_mask_follows_recipe_tag_rows(self):
+        recipe = self.create_recipe()
+        link = RecipeTag.objects.create(recipe=recipe, tag=self.lunch)
+        self.assertEqual(self.mask(recipe), tags_mask([self.lunch.pk]))
+        link.delete()
+        self.assertEqual(self.mask(recipe), 0)
+
+    def test_tag_missing_from_snapshot_is_loaded_from_db(self):
+        catalogue.tags.load()
+        # Тег из другого процесса: сигналы этого процесса о нём не знают.
+        Tag.objects.bulk_create([Tag(name='Ужин', slug='dinner')])
+        dinner = Tag.objects.get(slug='dinner')
+        recipe = self.create_recipe()
+        recipe.tags.add(dinner)
+        response = self.client.get('/api/recipes/?tags=dinner&tags=lunch')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['id'] for item in response.json()['results']], [recipe.pk]
+        )
+        self.assertIn(dinner.pk, catalogue.tags.get().by_id)
+
+    def test_unknown_tag_is_rejected(self):
+        response = self.client.get('/api/recipes/?tags=nope')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,75 @@
+"""Объединение дублей ингредиентов (manage.py merge_ingredients)."""
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import User
+
+
+class MergeIngredientsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author', password='x',
+            first_name='Анна', last_name='Повар',
+        )
+        cls.salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        cls.duplicate = Ingredient.objects.create(
+            name=' соль ', measurement_unit='гр.'
+        )
+        cls.recipe = cls.create_recipe(
+            'Каша', (cls.salt, 5), (cls.duplicate, 3)
+        )
+        cls.other = cls.create_recipe('Суп', (cls.duplicate, 2))
+
+    @classmethod
+    def create_recipe(cls, name, *amounts):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text='Варить', cooking_time=10,
+            image='blobs/aa/bb/recipe.png',
+        )
+        for ingredient, amount in amounts:
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+        return recipe
+
+    def merge(self, *args):
+        out = StringIO()
+        call_command('merge_ingredients', *args, stdout=out)
+        return out.getvalue()
+
+    def amounts(self, recipe):
+        return list(recipe.recipe_ingredients.values_list(
+            'ingredient_id', 'amount'
+        ))
+
+    def test_amounts_summed_with_existing_winner(self):
+        output = self.merge()
+        self.assertIn('Ингредиентов удалено: 1', output)
+        self.assertIn('слито с уже имеющимися: 1', output)
+        self.assertEqual(self.amounts(self.recipe), [(self.salt.pk, 8)])
+        self.assertEqual(self.amounts(self.other), [(self.salt.pk, 2)])
+        self.assertFalse(
+            Ingredient.objects.filter(pk=self.duplicate.pk).exists()
+        )
+
+    def test_dry_run_changes_nothing(self):
+        self.assertIn('изменения отменены', self.merge('--dry-run'))
+        self.assertEqual(
+            self.amounts(self.recipe),
+            [(self.salt.pk, 5), (self.duplicate.pk, 3)],
+        )
+
+    def test_keeps_tables_it_did_not_create(self):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE ingredient_merge (id INTEGER)')
+            cursor.execute('INSERT INTO ingredient_merge VALUES (1)')
+        self.merge()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT id FROM ingredient_merge')
+            self.assertEqual(cursor.fetchall(), [(1,)])
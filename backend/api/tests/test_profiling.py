@@ -0,0 +1,62 @@
+"""Журнал медленных запросов и профилирование (api/profiling.py)."""
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.models import SlowRequest
+from users.models import User
+
+
+@override_settings(PROFILER_SLOW_THRESHOLD=0)
+class SlowRequestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email='staff@example.com', username='staff', password='x',
+            first_name='Анна', last_name='Повар', is_staff=True,
+        )
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user', password='x',
+            first_name='Иван', last_name='Гость',
+        )
+
+    def get(self, user=None, **extra):
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            extra['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        return self.client.get('/api/recipes/', **extra)
+
+    def test_slow_request_is_recorded_with_sql(self):
+        response = self.get(self.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        entry = SlowRequest.objects.get()
+        self.assertEqual(
+            (entry.method, entry.path, entry.route, entry.status),
+            ('GET', '/api/recipes/', 'recipes-list', 200),
+        )
+        self.assertEqual(entry.user_id, self.user.pk)
+        self.assertEqual(entry.profiler, '')
+        self.assertGreater(entry.query_count, 0)
+        self.assertEqual(len(entry.queries), entry.query_count)
+        self.assertTrue(
+            any('recipes_recipe' in query['sql'] for query in entry.queries)
+        )
+
+    def test_staff_profile(self):
+        for profiler in ('sample', 'cprofile'):
+            response = self.get(self.staff, HTTP_X_PROFILE=profiler)
+            entry = SlowRequest.objects.get(pk=response['X-Profile-Id'])
+            self.assertEqual(entry.profiler, profiler)
+            self.assertIsInstance(entry.profile, str)
+        self.assertIn('cumulative', entry.profile)
+
+    def test_profile_requires_staff(self):
+        response = self.get(self.user, HTTP_X_PROFILE='cprofile')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(SlowRequest.objects.get().profiler, '')
+
+    @override_settings(PROFILER_SLOW_THRESHOLD=60)
+    def test_fast_request_is_not_recorded(self):
+        self.get(self.user)
+        self.assertFalse(SlowRequest.objects.exists())
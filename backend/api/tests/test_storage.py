@@ -0,0 +1,118 @@
+"""Хранилище по содержимому и очистка медиафайлов (prune_media)."""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from foodgram.storage import GRACE_PERIOD
+from recipes.models import Recipe
+from users.models import User
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'image' * 100
+
+
+class MediaRootMixin:
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def files(self):
+        root = default_storage.path('')
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), root)
+            for directory, _, names in os.walk(root)
+            for name in names
+        )
+
+    def age(self, name):
+        """Делает файл старше ``GRACE_PERIOD``."""
+        past = time.time() - GRACE_PERIOD - 60
+        os.utime(default_storage.path(name), (past, past))
+
+
+class ContentAddressedStorageTests(MediaRootMixin, TestCase):
+
+    def test_name_from_content(self):
+        digest = hashlib.sha256(PNG).hexdigest()
+        name = default_storage.save('recipes/photo.PNG', ContentFile(PNG))
+        self.assertEqual(
+            name, f'blobs/{digest[:2]}/{digest[2:4]}/{digest}.png'
+        )
+        with default_storage.open(name) as file:
+            self.assertEqual(file.read(), PNG)
+
+    def test_same_content_is_stored_once(self):
+        first = default_storage.save('a.png', ContentFile(PNG))
+        second = default_storage.save('other/b.png', ContentFile(PNG))
+        third = default_storage.save('c.png', ContentFile(PNG + b'!'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        # Временные файлы не остаются.
+        self.assertEqual(self.files(), sorted([first, third]))
+
+
+class PruneMediaTests(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create_user(
+            email='author@example.com', username='author', password='x',
+            first_name='Анна', last_name='Повар',
+        )
+        self.used = default_storage.save('used.png', ContentFile(PNG))
+        self.orphan = default_storage.save('orphan.png', ContentFile(b'1'))
+        self.fresh = default_storage.save('fresh.png', ContentFile(b'2'))
+        self.recipe(self.used)
+        self.age(self.used)
+        self.age(self.orphan)
+
+    def recipe(self, image):
+        return Recipe.objects.create(
+            author=self.author, name='Каша', text='Варить',
+            cooking_time=10, image=image,
+        )
+
+    def prune(self, *args):
+        out = StringIO()
+        call_command('prune_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_lists_unreferenced(self):
+        before = self.files()
+        output = self.prune('--dry-run')
+        self.assertIn(self.orphan, output)
+        self.assertNotIn(self.used, output)
+        self.assertNotIn(self.fresh, output)
+        self.assertIn('К удалению: 1 файлов', output)
+        self.assertEqual(self.files(), before)
+
+    def test_removes_only_old_unreferenced(self):
+        self.assertIn('Удалено: 1 файлов', self.prune())
+        self.assertEqual(self.files(), sorted([self.used, self.fresh]))
+
+    def test_avatar_is_referenced(self):
+        self.author.avatar = self.orphan
+        self.author.save()
+        self.prune()
+        self.assertIn(self.orphan, self.files())
+
+    def test_shared_file_released_with_last_reference(self):
+        other = self.recipe(self.used)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertIn(self.used, self.files())
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.get(image=self.used).delete()
+        self.assertNotIn(self.used, self.files())
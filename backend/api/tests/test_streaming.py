@@ -0,0 +1,121 @@
+"""Потоковые ответы через ASGI-обработчик (foodgram/streaming.py)."""
+import csv
+import io
+import json
+import zipfile
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.contrib import admin
+from django.test import RequestFactory, TransactionTestCase
+from rest_framework.authtoken.models import Token
+
+from foodgram.admin_tools import export_csv
+from foodgram.streaming import ASGIHandler
+from recipes.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from users.models import User
+
+
+def asgi_get(path, token=None):
+    """GET через ASGI-обработчик: (статус, заголовки, тело)."""
+    headers = [(b'host', b'testserver')]
+    if token is not None:
+        headers.append((b'authorization', f'Token {token}'.encode()))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': headers,
+        'client': ('127.0.0.1', 1),
+        'server': ('testserver', 80),
+    }
+
+    async def run():
+        communicator = ApplicationCommunicator(ASGIHandler(), scope)
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(timeout=10)
+        body = b''
+        while True:
+            message = await communicator.receive_output(timeout=10)
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        await communicator.wait()
+        return start['status'], dict(start['headers']), body
+
+    return async_to_sync(run)()
+
+
+def asgi_body(response):
+    """Тело готового ответа, отправленного ASGI-обработчиком."""
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def run():
+        await ASGIHandler().send_response(response, send)
+
+    async_to_sync(run)()
+    return b''.join(message.get('body', b'') for message in messages[1:])
+
+
+class StreamingTests(TransactionTestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            email='staff@example.com', username='staff', password='x',
+            first_name='Анна', last_name='Повар', is_staff=True,
+        )
+        self.token = Token.objects.create(user=self.staff).key
+        tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=self.staff, name=f'Каша {number}', text='Варить',
+                cooking_time=10, image='blobs/aa/bb/recipe.png',
+                short_code=f'code{number}',
+            )
+            RecipeTag.objects.create(recipe=recipe, tag=tag)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=salt, amount=5
+            )
+
+    def test_recipes_jsonl(self):
+        status, _, body = asgi_get('/api/recipes/jsonl/', self.token)
+        self.assertEqual(status, 200)
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [line['short_code'] for line in lines],
+            ['code0', 'code1', 'code2'],
+        )
+
+    def test_user_data_archive(self):
+        status, headers, body = asgi_get('/api/users/me/export/', self.token)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'Content-Type'], b'application/zip')
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            profile = json.loads(archive.read('profile.json'))
+            recipes = archive.read('recipes.jsonl').splitlines()
+        self.assertEqual(profile['username'], 'staff')
+        self.assertEqual(len(recipes), 3)
+
+    def test_admin_csv(self):
+        Ingredient.objects.create(
+            name='=HYPERLINK("x")', measurement_unit='@г'
+        )
+        response = export_csv(
+            admin.site._registry[Ingredient],
+            RequestFactory().post('/admin/'),
+            Ingredient.objects.all(),
+        )
+        rows = list(csv.reader(io.StringIO(asgi_body(response).decode())))
+        self.assertEqual(rows[0], ['id', 'name', 'measurement_unit'])
+        self.assertEqual(rows[1][1:], ['соль', 'г'])
+        self.assertEqual(rows[2][1:], ['\'=HYPERLINK("x")', "'@г"])
@@ -0,0 +1,123 @@
+"""Версии рецептов и записи об удалениях для /api/sync/."""
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from api import sync
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag, Tombstone
+from users.models import User
+
+from .test_storage import MediaRootMixin
+
+PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAA'
+    'DElEQVR4nGNgYGAAAAAEAAH2FzhVAAAAAElFTkSuQmCC'
+)
+
+
+class SyncTestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author', password='x',
+            first_name='Анна', last_name='Повар',
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Каша', text='Варить', cooking_time=10,
+            image='blobs/aa/bb/recipe.png',
+        )
+        cls.recipe.tags.set([cls.tag])
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.salt, amount=1
+        )
+
+
+class RecipeWriteTests(MediaRootMixin, SyncTestCase):
+
+    def test_write_touches_recipe_once(self):
+        self.client.force_authenticate(self.author)
+        pepper = Ingredient.objects.create(name='перец', measurement_unit='г')
+        before = Recipe.objects.get(pk=self.recipe.pk).updated_at
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {
+                    'name': 'Овсянка', 'text': 'Варить', 'cooking_time': 5,
+                    'image': PNG, 'tags': [self.tag.pk],
+                    'ingredients': [
+                        {'id': self.salt.pk, 'amount': 2},
+                        {'id': pepper.pk, 'amount': 3},
+                    ],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        touches = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "recipes_recipe"')
+            and '"updated_at"' in query['sql']
+        ]
+        self.assertEqual(len(touches), 1)
+        self.assertGreater(
+            Recipe.objects.get(pk=self.recipe.pk).updated_at, before
+        )
+        self.assertEqual(
+            sorted(self.recipe.recipe_ingredients.values_list(
+                'ingredient__name', 'amount'
+            )),
+            [('перец', 3), ('соль', 2)],
+        )
+
+
+class TombstoneTests(SyncTestCase):
+
+    def bury(self, count):
+        return [
+            Tombstone.objects.create(kind=Tombstone.RECIPE, recipe_id=number)
+            for number in range(1000, 1000 + count)
+        ]
+
+    def changes(self, **cursor):
+        token = sync.encode({**sync.START, **cursor})
+        response = self.client.get('/api/sync/', {'since': token})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_prune_keeps_recent(self):
+        old, recent = self.bury(2)
+        Tombstone.objects.filter(pk=old.pk).update(
+            deleted_at=timezone.now() - timedelta(days=31)
+        )
+        out = StringIO()
+        call_command('prune_tombstones', stdout=out)
+        self.assertIn('Удалено: 1 записей', out.getvalue())
+        self.assertEqual(list(Tombstone.objects.all()), [recent])
+
+    def test_cursor_into_pruned_range_resets(self):
+        first, second, third = self.bury(3)
+        cursor = first.pk
+        Tombstone.objects.filter(pk__in=[first.pk, second.pk]).delete()
+        data = self.changes(t=cursor)
+        self.assertTrue(data['reset'])
+        self.assertEqual(
+            [recipe['id'] for recipe in data['recipes']], [self.recipe.pk]
+        )
+        self.assertEqual(data['deleted_recipes'], [third.recipe_id])
+
+    def test_cursor_before_survivors_is_kept(self):
+        first, second, third = self.bury(3)
+        cursor = first.pk
+        first.delete()
+        data = self.changes(t=cursor)
+        self.assertFalse(data['reset'])
+        self.assertEqual(
+            data['deleted_recipes'], [second.recipe_id, third.recipe_id]
+        )
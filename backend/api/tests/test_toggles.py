@@ -0,0 +1,85 @@
+"""Переключатели избранного, корзины и подписок (api/toggles.py)."""
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from api import toggles
+from recipes.models import Favorite, Recipe, Tombstone
+from users.models import User
+
+
+class ToggleTests(APITestCase):
+    mode = 'direct'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user', password='x',
+            first_name='Анна', last_name='Повар',
+        )
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author', password='x',
+            first_name='Иван', last_name='Автор',
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Каша', text='Варить', cooking_time=10,
+            image='blobs/aa/bb/recipe.png',
+        )
+
+    def setUp(self):
+        mode = override_settings(TOGGLE_WRITE_MODE=self.mode)
+        mode.enable()
+        self.addCleanup(mode.disable)
+        self.client.force_authenticate(self.user)
+
+    def statuses(self, url):
+        return [
+            self.client.post(url).status_code,
+            self.client.post(url).status_code,
+            self.client.delete(url).status_code,
+            self.client.delete(url).status_code,
+        ]
+
+    def test_favorite(self):
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        self.assertEqual(self.statuses(url), [201, 400, 204, 400])
+        self.assertFalse(Favorite.objects.exists())
+        self.assertEqual(
+            list(Tombstone.objects.values_list(
+                'kind', 'recipe_id', 'user_id'
+            )),
+            [(Tombstone.FAVORITE, self.recipe.pk, self.user.pk)],
+        )
+
+    def test_shopping_cart(self):
+        url = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+        self.assertEqual(self.statuses(url), [201, 400, 204, 400])
+        self.assertEqual(
+            Tombstone.objects.get().kind, Tombstone.SHOPPING_CART
+        )
+
+    def test_subscription(self):
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        self.assertEqual(self.statuses(url), [201, 400, 204, 400])
+        self.assertFalse(self.user.subscriptions.exists())
+        self.assertFalse(Tombstone.objects.exists())
+
+
+class BatchedToggleTests(ToggleTests):
+    mode = 'batched'
+
+    def test_batch_applies_operations_in_order(self):
+        queue = toggles.WriteQueue(batch_size=4, flush_interval=0)
+        key = (self.user.pk, self.recipe.pk)
+        batch = [
+            toggles._Operation(toggles.FAVORITE, key, add)
+            for add in (True, True, False, False)
+        ]
+        # Точка сохранения, запрос на каждую операцию и Tombstone при
+        # удалении — без SELECT.
+        with self.assertNumQueries(7):
+            queue._flush(batch)
+        self.assertEqual(
+            [operation.result for operation in batch],
+            [True, False, True, False],
+        )
+        self.assertEqual(Tombstone.objects.count(), 1)
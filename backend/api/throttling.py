@@ -0,0 +1,212 @@
+"""Ограничение частоты и одновременности запросов к тяжёлым эндпоинтам.
+
+``TokenBucketThrottle`` — маркерная корзина на пользователя (или IP для
+анонимов) в пределах области (scope). Скорость задаётся в
+``DEFAULT_THROTTLE_RATES`` в формате DRF (``'30/min'``): корзина вмещает
+30 маркеров и пополняется на 30 маркеров в минуту. Корзины хранятся в
+памяти процесса (``THROTTLE_STORE = 'local'``) или в кеше Django
+(``'cache'``), общем для процессов. При исчерпании — 429 с Retry-After.
+
+``LoadSheddingMixin`` ограничивает число одновременных запросов процесса.
+Запрос области из ``CONCURRENCY_LIMITS`` ждёт свободного места не дольше
+``CONCURRENCY_QUEUE_TIMEOUT`` секунд, иначе получает 503 с Retry-After.
+Кроме того, при общей загрузке процесса запросы сбрасываются по
+приоритету: тяжёлые (``HEAVY``) — уже с половины
+``CONCURRENCY_MAX_IN_FLIGHT``, обычные — с 90%, а критичные
+(``CRITICAL``: теги и ингредиенты) не сбрасываются никогда.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .lru import LRUCache
+
+CRITICAL = 'critical'
+NORMAL = 'normal'
+HEAVY = 'heavy'
+
+# Доля CONCURRENCY_MAX_IN_FLIGHT, начиная с которой запросы сбрасываются.
+SHED_AT = {
+    CRITICAL: None,
+    NORMAL: 0.9,
+    HEAVY: 0.5,
+}
+
+
+class Overloaded(APIException):
+    status_code = 503
+    default_detail = 'Сервер перегружен, повторите запрос позже.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait
+
+
+def parse_rate(rate):
+    """``'30/min'`` -> (30, 60)."""
+    num, period = rate.split('/')
+    return int(num), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+
+class LocalBucketStore:
+    """Корзины в памяти процесса."""
+
+    def __init__(self, maxsize=100000):
+        self._buckets = LRUCache(maxsize)
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            wait, bucket = _take(bucket, capacity, rate)
+            self._buckets.set(key, bucket)
+        return wait
+
+
+class CacheBucketStore:
+    """Корзины в кеше Django, общем для процессов.
+
+    Чтение и запись не атомарны, поэтому при гонке между процессами
+    корзина может пропустить лишний запрос.
+    """
+
+    def consume(self, key, capacity, rate):
+        key = f'throttle:{key}'
+        wait, bucket = _take(cache.get(key), capacity, rate)
+        cache.set(key, bucket, timeout=math.ceil(capacity / rate) + 1)
+        return wait
+
+
+def _take(bucket, capacity, rate):
+    """Берёт маркер; возвращает (секунды ожидания или 0, новая корзина)."""
+    now = time.time()
+    tokens, updated = bucket or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return 0, (tokens - 1, now)
+    return (1 - tokens) / rate, (tokens, now)
+
+
+_stores = {}
+
+
+def get_store():
+    name = settings.THROTTLE_STORE
+    if name not in _stores:
+        _stores[name] = (
+            CacheBucketStore() if name == 'cache' else LocalBucketStore()
+        )
+    return _stores[name]
+
+
+def get_scope(view):
+    scopes = getattr(view, 'throttle_scopes', {})
+    return scopes.get(
+        getattr(view, 'action', None), getattr(view, 'throttle_scope', None)
+    )
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Маркерная корзина на пользователя в области ``throttle_scope(s)``."""
+
+    def allow_request(self, request, view):
+        self.delay = None
+        scope = get_scope(view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        capacity, duration = parse_rate(rate)
+        if request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        self.delay = get_store().consume(
+            f'{scope}:{ident}', capacity, capacity / duration
+        )
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+class ConcurrencyLimiter:
+    """Счётчики одновременных запросов процесса."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def _semaphore(self, scope, limit):
+        with self._lock:
+            if scope not in self._semaphores:
+                self._semaphores[scope] = threading.BoundedSemaphore(limit)
+            return self._semaphores[scope]
+
+    def acquire(self, scope, priority):
+        """Занимает место; возвращает функцию его освобождения."""
+        shed_at = SHED_AT[priority]
+        with self._lock:
+            if shed_at is not None and (
+                self.in_flight >= shed_at * settings.CONCURRENCY_MAX_IN_FLIGHT
+            ):
+                raise Overloaded(wait=1)
+            self.in_flight += 1
+        limit = settings.CONCURRENCY_LIMITS.get(scope)
+        if not limit:
+            return self._release
+        semaphore = self._semaphore(scope, limit)
+        timeout = settings.CONCURRENCY_QUEUE_TIMEOUT
+        if not semaphore.acquire(timeout=timeout):
+            self._release()
+            raise Overloaded(wait=math.ceil(timeout) or 1)
+
+        def release():
+            semaphore.release()
+            self._release()
+
+        return release
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+limiter = ConcurrencyLimiter()
+
+
+class LoadSheddingMixin:
+    """Ограничение одновременности и приоритеты для вьюсетов.
+
+    ``priority`` — приоритет вьюсета, ``action_priorities`` — приоритеты
+    отдельных действий; ``throttle_scope``/``throttle_scopes`` задают
+    область для ``TokenBucketThrottle`` и ``CONCURRENCY_LIMITS``.
+    """
+
+    priority = NORMAL
+    action_priorities = {}
+    throttle_classes = (TokenBucketThrottle,)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._release_slot = limiter.acquire(
+            get_scope(self),
+            self.action_priorities.get(
+                getattr(self, 'action', None), self.priority
+            ),
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        self._release_slot = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._release_slot is not None:
+                self._release_slot()
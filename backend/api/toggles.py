@@ -0,0 +1,175 @@
+"""Идемпотентные переключатели избранного, корзины покупок и подписок.
+
+Каждый переключатель — это пара (владелец, цель) с уникальным ограничением.
+Добавление выполняется одним ``INSERT ... ON CONFLICT DO NOTHING``,
+удаление — одним ``DELETE``; результат операции определяется по числу
+затронутых строк, поэтому отдельная проверка ``exists()`` не нужна.
+Удаление идёт в обход сигналов, и запись ``Tombstone`` для
+синхронизации (api/sync.py) создаётся здесь же, только если пара была.
+
+В режиме ``TOGGLE_WRITE_MODE = 'batched'`` операции из параллельных
+запросов копятся в очереди процесса и применяются одной транзакцией —
+каждая своим запросом в порядке поступления, так что результат тоже
+берётся из числа затронутых строк. Первый пришедший запрос становится
+ведущим: он ждёт ``TOGGLE_FLUSH_INTERVAL`` секунд (или пока очередь не
+наберёт ``TOGGLE_BATCH_SIZE`` операций) и сбрасывает пачку, остальные
+ждут результата своей операции.
+"""
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import AutoField
+from django.db.models.sql import InsertQuery
+
+from recipes.models import Favorite, ShoppingCart, Tombstone
+from users.models import User
+
+Toggle = namedtuple(
+    'Toggle', ('model', 'owner_field', 'target_field', 'tombstone')
+)
+
+FAVORITE = Toggle(Favorite, 'user_id', 'recipe_id', Tombstone.FAVORITE)
+SHOPPING_CART = Toggle(
+    ShoppingCart, 'user_id', 'recipe_id', Tombstone.SHOPPING_CART
+)
+SUBSCRIPTION = Toggle(
+    User.subscriptions.through, 'from_user_id', 'to_user_id', None
+)
+
+
+def _insert_ignore(toggle, owner_id, target_id):
+    """Вставляет пару, если её нет; True, если вставка произошла."""
+    model = toggle.model
+    obj = model(**{
+        toggle.owner_field: owner_id,
+        toggle.target_field: target_id,
+    })
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not isinstance(field, AutoField)
+    ]
+    using = router.db_for_write(model)
+    query = InsertQuery(model, ignore_conflicts=True)
+    query.insert_values(fields, [obj])
+    inserted = 0
+    with connections[using].cursor() as cursor:
+        for statement, params in query.get_compiler(using=using).as_sql():
+            cursor.execute(statement, params)
+            inserted += cursor.rowcount
+    return inserted > 0
+
+
+def _delete(toggle, owner_id, target_id):
+    """Удаляет пару одним ``DELETE``; True, если она была."""
+    queryset = toggle.model.objects.filter(**{
+        toggle.owner_field: owner_id,
+        toggle.target_field: target_id,
+    })
+    with transaction.atomic(using=queryset.db, savepoint=False):
+        # _raw_delete не выбирает строки для сигналов post_delete.
+        deleted = queryset._raw_delete(queryset.db)
+        if deleted and toggle.tombstone:
+            Tombstone.objects.create(
+                kind=toggle.tombstone, recipe_id=target_id, user_id=owner_id
+            )
+    return deleted > 0
+
+
+def _write(toggle, owner_id, target_id, add):
+    if add:
+        return _insert_ignore(toggle, owner_id, target_id)
+    return _delete(toggle, owner_id, target_id)
+
+
+class _Operation:
+    __slots__ = ('toggle', 'key', 'add', 'result', 'error', 'done')
+
+    def __init__(self, toggle, key, add):
+        self.toggle = toggle
+        self.key = key
+        self.add = add
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class WriteQueue:
+    """Очередь переключателей процесса со сбросом пачками."""
+
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._full = threading.Event()
+        self._pending = []
+        self._has_leader = False
+
+    def submit(self, toggle, owner_id, target_id, add):
+        operation = _Operation(toggle, (owner_id, target_id), add)
+        with self._lock:
+            self._pending.append(operation)
+            is_leader = not self._has_leader
+            self._has_leader = True
+            if len(self._pending) >= self.batch_size:
+                self._full.set()
+        if is_leader:
+            self._full.wait(self.flush_interval)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._has_leader = False
+                self._full.clear()
+            with self._flush_lock:
+                self._flush(batch)
+        operation.done.wait()
+        if operation.error is not None:
+            raise operation.error
+        return operation.result
+
+    def _flush(self, batch):
+        try:
+            with transaction.atomic():
+                for operation in batch:
+                    operation.result = _write(
+                        operation.toggle, *operation.key, operation.add
+                    )
+        except Exception as error:
+            for operation in batch:
+                operation.error = error
+        finally:
+            for operation in batch:
+                operation.done.set()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def _get_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = WriteQueue(
+                    settings.TOGGLE_BATCH_SIZE,
+                    settings.TOGGLE_FLUSH_INTERVAL,
+                )
+    return _queue
+
+
+def _toggle(toggle, owner_id, target_id, add):
+    if settings.TOGGLE_WRITE_MODE == 'batched':
+        return _get_queue().submit(toggle, owner_id, target_id, add)
+    return _write(toggle, owner_id, target_id, add)
+
+
+def add(toggle, owner_id, target_id):
+    """Добавляет пару; False, если она уже существовала."""
+    return _toggle(toggle, owner_id, target_id, True)
+
+
+def remove(toggle, owner_id, target_id):
+    """Удаляет пару; False, если её не было."""
+    return _toggle(toggle, owner_id, target_id, False)
@@ -1,6 +1,9 @@
+from django.conf import settings
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from .views import RecipeViewSet, TagViewSet, IngredientViewSet, CustomUserViewset
+from .views import (
+    RecipeViewSet, TagViewSet, IngredientViewSet, CustomUserViewset, SyncView
+)
 
 router = DefaultRouter()
 router.register('tags', TagViewSet, basename='tags')
@@ -9,6 +12,12 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('users', CustomUserViewset, basename='users')
 
 urlpatterns = [
+    path('sync/', SyncView.as_view(), name='sync'),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
-]
\ No newline at end of file
+]
+
+if settings.ASYNC_READ_VIEWS:
+    from .async_views import urlpatterns as async_urlpatterns
+
+    urlpatterns = async_urlpatterns + urlpatterns
@@ -1,17 +1,23 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
 from rest_framework.permissions import(
     AllowAny,
+    IsAdminUser,
     IsAuthenticated, 
     IsAuthenticatedOrReadOnly
 )
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from djoser.views import UserViewSet
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 
-from users import models
+from . import archive, batch, bulk, events, fastpath, fragments, sync, toggles
+from .fieldsets import requested_fields
 from .filters import RecipeFilter
 
 from .serializers import (
@@ -23,23 +29,62 @@ from .serializers import (
     RecipeShortSerializer,
     CustomUserSerializer
 )
+from foodgram.media import signed_url
+from jobs.models import Job
 from users.models import User
 from recipes.models import (
-    Recipe, RecipeIngredient, Tag, Ingredient, Favorite, ShoppingCart
+    Recipe, RecipeIngredient, Tag, Ingredient, ShoppingCart
 )
 from .pagination import CustomPaginator
+from .renderers import FastJSONRenderer
+from .singleflight import single_flight
 from .permissions import IsAuthorOrReadOnly
+from .throttling import CRITICAL, HEAVY, LoadSheddingMixin
 
-class CustomUserViewset(viewsets.ModelViewSet):
+SHORT_FIELDS = ('id', 'name', 'image', 'cooking_time')
+
+
+def feed_key(view, request, *args, **kwargs):
+    """Ключ общей для анонимов страницы рецептов; прочие не кешируются."""
+    if request.user.is_authenticated or (
+        request.accepted_renderer.format != 'json'
+    ):
+        return None
+    return request.path, sorted(request.query_params.lists())
+
+
+def cart_key(view, request, *args, **kwargs):
+    """Ключ меняется при любом изменении корзины или рецептов в ней."""
+    stamp = ShoppingCart.objects.filter(user=request.user).aggregate(
+        count=Count('id'),
+        last=Max('id'),
+        updated=Max('recipe__updated_at'),
+    )
+    return request.user.pk, stamp['count'], stamp['last'], stamp['updated']
+
+class CustomUserViewset(LoadSheddingMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPaginator
+    action_priorities = {'export': HEAVY}
 
     def get_permissions(self):
         if self.action in ('list', 'retrieve', 'create'):
             return [AllowAny()]
         return [IsAuthenticated()]
 
+    def list(self, request, *args, **kwargs):
+        ids = batch.requested_ids(request)
+        if ids is None:
+            return super().list(request, *args, **kwargs)
+        fields = requested_fields(request, CustomUserSerializer.Meta.fields)
+        payloads = fastpath.author_payloads(set(ids), request)
+        found = {
+            pk: {name: payload[name] for name in fields}
+            for pk, payload in payloads.items()
+        }
+        return Response(batch.ordered(ids, found))
+
     @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
     def subscribe(self, request, pk=None):
         """Подписка / отписка на автора"""
@@ -52,22 +97,22 @@ class CustomUserViewset(viewsets.ModelViewSet):
             )
 
         if request.method == 'POST':
-            if request.user.subscriptions.filter(pk=author.pk).exists():
+            if not toggles.add(toggles.SUBSCRIPTION, request.user.pk, author.pk):
                 return Response(
                     {'errors': 'Уже подписаны'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            request.user.subscriptions.add(author)
             serializer = FollowSerializer(author, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         # DELETE
-        if not request.user.subscriptions.filter(pk=author.pk).exists():
+        if not toggles.remove(
+            toggles.SUBSCRIPTION, request.user.pk, author.pk
+        ):
             return Response(
                 {'errors': 'Вы не подписаны'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        request.user.subscriptions.remove(author)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
@@ -78,19 +123,53 @@ class CustomUserViewset(viewsets.ModelViewSet):
         serializer = FollowSerializer(page, many=True, context={'request': request})
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False, methods=['get'], url_path='me/export',
+        permission_classes=[IsAuthenticated],
+    )
+    def export(self, request):
+        """Архив данных пользователя: поток ZIP или ссылка на готовый файл"""
+        user = request.user
+        if archive.estimate(user) <= settings.USER_EXPORT_STREAM_LIMIT:
+            response = StreamingHttpResponse(
+                archive.stream(user), content_type=archive.CONTENT_TYPE
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename="{archive.filename(user)}"'
+            )
+            return response
+        job = archive.background(user)
+        if job.status == Job.DONE:
+            return Response({
+                'status': job.status,
+                'url': signed_url(job.result['name'], request),
+            })
+        return Response(
+            {'status': job.status, 'job': job.pk},
+            status=status.HTTP_202_ACCEPTED,
+        )
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(LoadSheddingMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+    priority = CRITICAL
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(LoadSheddingMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+    priority = CRITICAL
+
+    def get_throttles(self):
+        # Ограничивается только автодополнение, а не загрузка справочника.
+        if self.action == 'list' and self.request.query_params.get('name'):
+            self.throttle_scope = 'ingredient_search'
+        return super().get_throttles()
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -100,15 +179,24 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(LoadSheddingMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     pagination_class = CustomPaginator
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    throttle_scopes = {
+        'create': 'recipe_write',
+        'update': 'recipe_write',
+        'partial_update': 'recipe_write',
+        'download_shopping_cart': 'cart_download',
+    }
+    action_priorities = dict.fromkeys((*throttle_scopes, 'jsonl'), HEAVY)
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve', 'get_link']:
             return [AllowAny()]
+        if self.action == 'jsonl':
+            return [IsAdminUser()]
         return [IsAuthenticated(), IsAuthorOrReadOnly()]
 
     def get_serializer_class(self):
@@ -116,8 +204,129 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve') or settings.FAST_READ_PATH:
+            return queryset
+        fields = self.get_read_fields()
+        if 'author' in fields:
+            queryset = queryset.select_related('author')
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(
+                'recipe_ingredients__ingredient'
+            )
+        return queryset
+
+    def get_read_fields(self):
+        return requested_fields(
+            self.request,
+            fastpath.PAYLOAD_FIELDS,
+            fastpath.EXPANDABLE_FIELDS,
+        )
+
+    def use_fragments(self, fields):
+        """Полный JSON-ответ можно собрать из ``api.fragments``."""
+        return (
+            fragments.enabled()
+            and fields == fastpath.PAYLOAD_FIELDS
+            and self.request.accepted_renderer.format == 'json'
+        )
+
+    @single_flight(
+        feed_key, ttl=settings.FEED_CACHE_TTL, stale=settings.FEED_CACHE_STALE
+    )
+    def list(self, request, *args, **kwargs):
+        ids = batch.requested_ids(request)
+        if ids is not None:
+            return self.batch_list(request, ids)
+        if not settings.FAST_READ_PATH:
+            return super().list(request, *args, **kwargs)
+        fields = self.get_read_fields()
+        if self.use_fragments(fields):
+            queryset = self.filter_queryset(self.get_queryset()).values(
+                *fragments.ROW_FIELDS
+            )
+            page = self.paginate_queryset(queryset)
+            if page is None:
+                content = fragments.render_list(
+                    fragments.render(queryset, request)
+                )
+            else:
+                content = fragments.render_page(
+                    self.paginator, fragments.render(page, request)
+                )
+            return HttpResponse(content, content_type='application/json')
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *fastpath.recipe_columns(fields)
+        )
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(
+                fastpath.recipe_payloads(queryset, request, fields)
+            )
+        return self.get_paginated_response(
+            fastpath.recipe_payloads(page, request, fields)
+        )
+
+    def batch_list(self, request, ids):
+        """Рецепты по ``?ids=`` одним набором запросов."""
+        queryset = self.get_queryset().filter(pk__in=set(ids))
+        if not settings.FAST_READ_PATH:
+            serializer = self.get_serializer(queryset, many=True)
+            found = {item.pk: data for item, data in zip(
+                serializer.instance, serializer.data
+            )}
+            return Response(batch.ordered(ids, found))
+        fields = self.get_read_fields()
+        if self.use_fragments(fields):
+            found = fragments.render_by_id(
+                queryset.values(*fragments.ROW_FIELDS), request
+            )
+            renderer = FastJSONRenderer()
+            return HttpResponse(
+                fragments.render_list([
+                    found[pk] if pk in found
+                    else renderer.render(batch.not_found(pk))
+                    for pk in ids
+                ]),
+                content_type='application/json',
+            )
+        rows = list(queryset.values(*fastpath.recipe_columns(fields)))
+        found = {
+            row['id']: payload for row, payload in zip(
+                rows, fastpath.recipe_payloads(rows, request, fields)
+            )
+        }
+        return Response(batch.ordered(ids, found))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.FAST_READ_PATH:
+            return super().retrieve(request, *args, **kwargs)
+        fields = self.get_read_fields()
+        if self.use_fragments(fields):
+            row = get_object_or_404(
+                self.filter_queryset(self.get_queryset()).values(
+                    *fragments.ROW_FIELDS
+                ),
+                pk=kwargs['pk'],
+            )
+            items = fragments.render([row], request)
+            if not items:
+                raise Http404
+            return HttpResponse(items[0], content_type='application/json')
+        row = get_object_or_404(
+            self.filter_queryset(self.get_queryset()).values(
+                *fastpath.recipe_columns(fields)
+            ),
+            pk=kwargs['pk'],
+        )
+        return Response(fastpath.recipe_payloads([row], request, fields)[0])
+
     def perform_create(self, serializer):
         recipe = serializer.save(author=self.request.user)
+        transaction.on_commit(lambda: events.recipe_created(recipe))
         read_serializer = RecipeReadSerializer(recipe, context={'request': self.request})
         self.response = Response(read_serializer.data, status=status.HTTP_201_CREATED)
 
@@ -149,29 +358,26 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
+        recipe = get_object_or_404(Recipe.objects.only(*SHORT_FIELDS), pk=pk)
 
         if request.method == 'POST':
-            if ShoppingCart.objects.filter(user=request.user, recipe=recipe).exists():
+            if not toggles.add(toggles.SHOPPING_CART, request.user.pk, recipe.pk):
                 return Response({'errors': 'Рецепт уже в корзине'}, status=status.HTTP_400_BAD_REQUEST)
-            ShoppingCart.objects.create(user=request.user, recipe=recipe)
             serializer = RecipeShortSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-
-        cart_item = ShoppingCart.objects.filter(user=request.user, recipe=recipe)
-        if not cart_item.exists():
+        if not toggles.remove(toggles.SHOPPING_CART, request.user.pk, recipe.pk):
             return Response({'errors': 'Этого рецепта нет в корзине'}, status=status.HTTP_400_BAD_REQUEST)
-        cart_item.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    @single_flight(cart_key, ttl=60, stale=600)
     def download_shopping_cart(self, request):
         ingredients = (
             RecipeIngredient.objects
-            .filter(recipe__cart_items__user=request.user)
+            .filter(recipe__in_shopping_cart__user=request.user)
             .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(total_amount=models.Sum('amount'))
+            .annotate(total_amount=Sum('amount'))
         )
 
         lines = [
@@ -182,21 +388,50 @@ class RecipeViewSet(viewsets.ModelViewSet):
         response = HttpResponse('\n'.join(lines), content_type='text/plain')
         response['Content-Disposition'] = 'attachment; filename="shopping_cart.txt"'
         return response
+
+    @action(detail=False, methods=['get', 'post'])
+    def jsonl(self, request):
+        """Выгрузка (GET) и загрузка (POST) рецептов в JSON Lines."""
+        if request.method == 'GET':
+            response = StreamingHttpResponse(
+                bulk.export_lines(), content_type=bulk.CONTENT_TYPE
+            )
+            response['Content-Disposition'] = (
+                'attachment; filename="recipes.jsonl"'
+            )
+            return response
+        # Тело читается построчно из потока, без request.data.
+        report = bulk.Importer().run(request._request)
+        return Response(
+            report,
+            status=(
+                status.HTTP_201_CREATED if report['created']
+                else status.HTTP_200_OK
+            ),
+        )
     
     @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
     def favorite(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
+        recipe = get_object_or_404(Recipe.objects.only(*SHORT_FIELDS), pk=pk)
 
         if request.method == 'POST':
-            if Favorite.objects.filter(user=request.user, recipe=recipe).exists():
+            if not toggles.add(toggles.FAVORITE, request.user.pk, recipe.pk):
                 return Response({'errors': 'Рецепт уже в избранном'}, status=status.HTTP_400_BAD_REQUEST)
-            Favorite.objects.create(user=request.user, recipe=recipe)
+            events.favorite_count_changed(recipe.pk)
             serializer = RecipeShortSerializer(recipe, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         # DELETE
-        favorite_item = Favorite.objects.filter(user=request.user, recipe=recipe)
-        if not favorite_item.exists():
+        if not toggles.remove(toggles.FAVORITE, request.user.pk, recipe.pk):
             return Response({'errors': 'Рецепта нет в избранном'}, status=status.HTTP_400_BAD_REQUEST)
-        favorite_item.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        events.favorite_count_changed(recipe.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SyncView(LoadSheddingMixin, APIView):
+    """Изменения рецептов, избранного и корзины после токена ``since``."""
+
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        return Response(sync.changes(request))
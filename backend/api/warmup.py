@@ -0,0 +1,75 @@
+"""Прогрев процесса перед приёмом запросов.
+
+Вызывается из ``ApiConfig.ready()`` при ``API_WARMUP = True`` (включается
+в ``foodgram/wsgi.py`` и ``foodgram/asgi.py``, но не в ``manage.py``).
+Загружает справочники тегов и ингредиентов, строит кеши полей моделей
+(``_meta``) и заполняет резолвер URL, чтобы первые запросы воркера не
+платили за ленивую инициализацию. При запуске сервера с предварительной
+загрузкой приложения (``gunicorn --preload``) прогрев выполняется один раз
+в мастер-процессе, а ``gc.freeze()`` не даёт сборщику мусора трогать
+прогретые объекты, и воркеры делят эту память copy-on-write.
+
+Соединения с базой, открытые при прогреве, закрываются до ``gc.freeze()``:
+после fork воркеры иначе унаследовали бы один сокет (или дескриптор
+SQLite) на всех.
+"""
+import gc
+import logging
+import time
+
+from django.apps import apps
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def load_catalogues():
+    from . import catalogue
+
+    catalogue.tags.load()
+    catalogue.ingredients.load()
+
+
+def build_model_meta():
+    # Поля сериализаторов DRF кеширует в каждом экземпляре, а общие для
+    # процесса — кеши ``Model._meta``, по которым их строит ModelSerializer.
+    for model in apps.get_models():
+        meta = model._meta
+        meta.get_fields()
+        meta.fields_map
+        meta._forward_fields_map
+        meta.related_objects
+
+
+def populate_urls():
+    get_resolver().reverse_dict
+
+
+STEPS = (
+    ('catalogues', load_catalogues),
+    ('models', build_model_meta),
+    ('urls', populate_urls),
+)
+
+
+def run():
+    """Выполняет шаги прогрева; возвращает их длительность в секундах."""
+    timings = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except DatabaseError as error:
+            logger.warning('Прогрев "%s" пропущен: %s', name, error)
+            continue
+        timings[name] = time.perf_counter() - started
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+    logger.info(
+        'Прогрев завершён: %s',
+        ', '.join(f'{name} {took * 1000:.1f} мс'
+                  for name, took in timings.items()),
+    )
+    return timings
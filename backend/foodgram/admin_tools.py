@@ -0,0 +1,144 @@
+"""Общие средства админки для больших таблиц."""
+import csv
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
+
+
+class Approximate(int):
+    """Неточное число строк."""
+
+
+class AtLeast(Approximate):
+    """Нижняя граница числа строк: выводится как «10000+»."""
+
+    def __str__(self):
+        return f'{int(self)}+'
+
+
+class Estimate(Approximate):
+    """Оценка числа строк по статистике: выводится как «~10000»."""
+
+    def __str__(self):
+        return f'~{int(self)}'
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор без полного ``COUNT(*)`` по большим таблицам.
+
+    Без фильтров число строк берётся из статистики PostgreSQL
+    (``pg_class.reltuples``), если она больше ``ADMIN_EXACT_COUNT_LIMIT``.
+    Иначе строки считаются точно, но не дальше ``ADMIN_EXACT_COUNT_LIMIT``:
+    у списка длиннее число строк — ``AtLeast``. При неточном числе
+    страницы за ним открываются, пока в них есть строки, а ссылка на
+    следующую страницу есть, если за текущей остались строки.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self._estimate(queryset)
+            if estimate is not None and estimate > limit:
+                return Estimate(estimate)
+        count = queryset.values('pk').order_by()[:limit + 1].count()
+        return AtLeast(limit) if count > limit else count
+
+    @property
+    def approximate(self):
+        return isinstance(self.count, Approximate)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Страницы за границей подсчёта проверяет page().
+            if not self.approximate or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        if not self.approximate:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        object_list = self.object_list[bottom:top]
+        if number > 1 and not object_list:
+            raise EmptyPage('На странице нет записей')
+        if number >= self.num_pages:
+            more = len(object_list) == self.per_page and (
+                self.object_list[top:top + 1].exists()
+            )
+            self.num_pages = number + more
+        return self._get_page(object_list, number, self)
+
+    @staticmethod
+    def _estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                (queryset.model._meta.db_table,),
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] > 0 else None
+
+
+# Начала ячеек, которые табличные редакторы читают как формулу.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+@admin.action(description='Выгрузить в CSV')
+def export_csv(modeladmin, request, queryset):
+    """Потоковая выгрузка ``modeladmin.export_fields`` без загрузки в память.
+
+    Элемент ``export_fields`` — имя поля или пути через ``__``, либо пара
+    (заголовок, путь). Строки, похожие на формулу, выводятся с ``'``
+    впереди. Под ASGI строки читаются вне цикла событий
+    (``foodgram.streaming``).
+    """
+    columns = [
+        field if isinstance(field, tuple) else (field, field)
+        for field in modeladmin.export_fields
+    ]
+    rows = queryset.order_by('pk').values_list(
+        *(path for _, path in columns)
+    ).iterator(chunk_size=settings.ADMIN_EXPORT_CHUNK_SIZE)
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow([title for title, _ in columns])
+        for row in rows:
+            yield writer.writerow([_cell(value) for value in row])
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    name = queryset.model._meta.model_name
+    response['Content-Disposition'] = f'attachment; filename="{name}.csv"'
+    return response
+
+
+class ScalableAdminMixin:
+    """Оценка числа строк вместо COUNT(*) и выгрузка в CSV."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = (export_csv,)
@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
-
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('API_WARMUP', '1')
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
+
+# Потоковые ответы перебираются вне цикла событий (foodgram/streaming.py).
+from foodgram.streaming import get_asgi_application  # noqa: E402
+
+django_application = get_asgi_application()
+
+from api.events import with_events  # noqa: E402
 
-application = get_asgi_application()
+# /api/events/ (Server-Sent Events) обслуживается в обход Django.
+application = with_events(django_application)
@@ -0,0 +1,196 @@
+"""Сжатие ответов: zstd, brotli или gzip по ``Accept-Encoding``.
+
+Ответу на GET и HEAD без ``ETag`` назначается ETag по хешу тела —
+хешировать намного дешевле, чем сжимать. Сжатые варианты кешируются в
+памяти процесса по паре (кодировка, ETag), поэтому неизменный справочник
+ингредиентов или популярная страница рецептов сжимаются один раз на
+изменение, а не на каждый запрос. Чтобы редкие ответы не вытесняли
+горячие, вариант попадает в кеш только при повторной встрече того же
+ETag. Совпавший ``If-None-Match`` даёт 304 без тела.
+
+Персональные ответы (``Cache-Control: private`` или ``no-store``,
+``Vary`` по ``Cookie`` или ``Authorization``, запрос пользователя) ETag
+не получают и сжимаются без кеша. Персональный HTML не сжимается вовсе
+(BREACH): страница может отражать ввод рядом с секретами вроде
+CSRF-токена, и по размеру сжатого ответа их можно подобрать.
+
+Тела короче ``COMPRESSION_MIN_SIZE`` байт не сжимаются. brotli и
+zstandard — необязательные зависимости: без них остаётся gzip.
+"""
+import gzip
+import hashlib
+import re
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from api.lru import LRUCache
+
+from . import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE = re.compile(
+    r'^(text/|application/(json|javascript|xml)|[^;]*\+(json|xml))'
+)
+PRIVATE_CACHE_CONTROL = ('private', 'no-store')
+PRIVATE_VARY = {'*', 'cookie', 'authorization'}
+
+
+def _gzip(data, level):
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=level)
+
+
+def _zstd(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# В порядке предпочтения сервера.
+CODERS = {}
+if zstandard is not None:
+    CODERS['zstd'] = _zstd
+if brotli is not None:
+    CODERS['br'] = _brotli
+CODERS['gzip'] = _gzip
+
+variants = LRUCache(maxsize=settings.COMPRESSION_CACHE_SIZE)
+# ETag, встреченные хотя бы раз: только их варианты попадают в кеш.
+_seen = LRUCache(maxsize=settings.COMPRESSION_CACHE_SIZE * 8)
+metrics.track_cache('compressed_variants', variants)
+
+
+def accepted_encoding(header):
+    """Лучшая поддерживаемая кодировка из ``Accept-Encoding`` или None."""
+    weights = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    best, best_weight = None, 0.0
+    for coding in CODERS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def _opaque(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def _matches(header, etag):
+    if header.strip() == '*':
+        return True
+    tag = _opaque(etag)
+    return any(_opaque(item.strip()) == tag for item in header.split(','))
+
+
+def is_private(request, response):
+    """Ответ предназначен одному пользователю."""
+    cache_control = response.get('Cache-Control', '').lower()
+    if any(value in cache_control for value in PRIVATE_CACHE_CONTROL):
+        return True
+    vary = {
+        header.strip().lower()
+        for header in response.get('Vary', '').split(',')
+    }
+    if vary & PRIVATE_VARY:
+        return True
+    if 'HTTP_AUTHORIZATION' in request.META:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_authenticated
+
+
+def compress(coding, etag, content):
+    """Сжатое тело; повторно для того же ETag берётся из кеша.
+
+    Без ``etag`` тело просто сжимается.
+    """
+    if etag is None:
+        return CODERS[coding](content, settings.COMPRESSION_LEVELS[coding])
+    key = (coding, etag)
+    data = variants.get(key)
+    if data is not None:
+        return data
+    data = CODERS[coding](content, settings.COMPRESSION_LEVELS[coding])
+    if _seen.get(key):
+        variants.set(key, data)
+    else:
+        _seen.set(key, True)
+    return data
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or response.status_code != 200
+            or response.has_header('Content-Encoding')
+            or 'no-transform' in response.get('Cache-Control', '')
+            or not COMPRESSIBLE.match(response.get('Content-Type', ''))
+        ):
+            return response
+        private = is_private(request, response)
+        if private and response['Content-Type'].startswith('text/html'):
+            return response
+        content = response.content
+        cacheable = request.method in ('GET', 'HEAD') and not private
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if cacheable and not response.has_header('ETag'):
+            digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+            response['ETag'] = f'"{digest}"'
+        etag = response.get('ETag')
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if (
+            etag
+            and request.method in ('GET', 'HEAD')
+            and if_none_match
+            and _matches(if_none_match, etag)
+        ):
+            not_modified = HttpResponseNotModified()
+            for header in ('ETag', 'Vary', 'Cache-Control'):
+                if response.has_header(header):
+                    not_modified[header] = response[header]
+            return not_modified
+        if len(content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        coding = accepted_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if coding is None:
+            return response
+        compressed = compress(
+            coding, _opaque(etag) if cacheable else None, content
+        )
+        if len(compressed) >= len(content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = coding
+        # Сжатое представление побайтно отличается от исходного.
+        if etag and not etag.startswith('W/'):
+            response['ETag'] = f'W/{etag}'
+        return response
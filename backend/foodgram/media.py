@@ -0,0 +1,194 @@
+"""Отдача медиафайлов с проверкой доступа в Django.
+
+Права проверяет ``serve``, а сами байты передаёт nginx: при
+``MEDIA_ACCEL_REDIRECT`` ответ содержит только заголовок
+``X-Accel-Redirect`` на internal-location ``MEDIA_ACCEL_PREFIX``
+(см. ``infra/nginx.conf``), и nginx отправляет файл через sendfile,
+сам обрабатывая Range и условные запросы. Без nginx (разработка) файл
+отдаётся ``FileResponse`` — целиком через ``wsgi.file_wrapper``
+(sendfile у gunicorn) или одним диапазоном ``Range: bytes=...``.
+
+Права:
+
+* ``blobs/…`` — картинки рецептов и аватары, публичные; имя определяется
+  содержимым, поэтому ответ кешируется навсегда (``immutable``);
+* ``private/<id пользователя>/…`` — доступны владельцу, персоналу или по
+  подписанной ссылке ``signed_url``;
+* остальное — 404.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified
+)
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from api.authentication import request_user
+
+from .storage import BLOBS_DIR
+
+PRIVATE_DIR = 'private'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+PRIVATE = 'private, max-age=0, must-revalidate'
+
+# Личные файлы хранятся под своими именами, без адресации по содержимому.
+private_storage = FileSystemStorage()
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_signer = signing.TimestampSigner(salt='foodgram.media')
+
+
+def private_name(user_id, filename):
+    """Имя личного файла пользователя в хранилище."""
+    return f'{PRIVATE_DIR}/{user_id}/{filename}'
+
+
+def signed_url(name, request=None):
+    """Ссылка на файл, действующая ``MEDIA_SIGNATURE_MAX_AGE`` секунд."""
+    signature = _signer.sign(name)[len(name) + 1:]
+    url = f'{settings.MEDIA_URL}{quote(name)}?signature={signature}'
+    return request.build_absolute_uri(url) if request else url
+
+
+def _has_signature(request, name):
+    signature = request.GET.get('signature')
+    if not signature:
+        return False
+    try:
+        _signer.unsign(
+            f'{name}:{signature}', max_age=settings.MEDIA_SIGNATURE_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _can_read(request, name):
+    """Кеш-заголовок для разрешённого файла или None."""
+    folder, _, rest = name.partition('/')
+    if folder == BLOBS_DIR and not rest.startswith('tmp/'):
+        return IMMUTABLE
+    if folder == PRIVATE_DIR:
+        owner = rest.partition('/')[0]
+        if _has_signature(request, name):
+            return PRIVATE
+        user = request_user(request)
+        if user and (user.is_staff or str(user.pk) == owner):
+            return PRIVATE
+    return None
+
+
+def _etag(name, stat):
+    if name.startswith(f'{BLOBS_DIR}/'):
+        # Имя блоба — хеш содержимого.
+        return '"%s"' % os.path.splitext(posixpath.basename(name))[0]
+    return '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+
+
+def _byte_range(header, size):
+    """(начало, конец) включительно или None — отдать целиком.
+
+    Недопустимый диапазон — ``ValueError`` (ответ 416).
+    """
+    match = _RANGE.match(header)
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError
+    return start, end
+
+
+class _Slice:
+    """Файл, из которого читается не больше ``length`` байт."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _file_response(request, path, stat, etag):
+    size = stat.st_size
+    header = request.META.get('HTTP_RANGE', '')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag:
+        header = ''
+    try:
+        byte_range = _byte_range(header, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(_Slice(file, end - start + 1), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    content_type, encoding = mimetypes.guess_type(path)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+@require_safe
+def serve(request, path):
+    """Медиафайл ``path`` после проверки прав."""
+    name = posixpath.normpath(path).lstrip('/')
+    if name != path or name.startswith('..'):
+        raise Http404
+    cache_control = _can_read(request, name)
+    if cache_control is None:
+        raise Http404
+    try:
+        full_path = default_storage.path(name)
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if settings.MEDIA_ACCEL_REDIRECT:
+        response = HttpResponse()
+        del response['Content-Type']
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(
+            name
+        )
+        response['Cache-Control'] = cache_control
+        return response
+    etag = _etag(name, stat)
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = _file_response(request, full_path, stat, etag)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,415 @@
+"""Метрики процесса в текстовом формате Prometheus (``/metrics``).
+
+Счётчики и гистограммы живут в памяти процесса. Если задан
+``METRICS_DIR``, каждый процесс раз в ``METRICS_FLUSH_INTERVAL`` секунд
+(и при выходе) сбрасывает их в ``METRICS_DIR/<pid>.json``, а ``/metrics``
+складывает файлы всех процессов — так видны все воркеры gunicorn, какой
+бы из них ни обработал запрос. Счётчики умерших процессов продолжают
+суммироваться, их датчики (gauge) — нет. Каталог нужно очищать при
+перезапуске сервера.
+
+Датчики с ``per_process=False`` (глубина очереди задач) считаются
+только при сборе и в файлы не пишутся.
+"""
+import atexit
+import bisect
+import contextlib
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+from django.views.decorators.http import require_safe
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (
+    .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10,
+)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self._flushed_at = 0
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def collect(self, shared=True):
+        """{имя: {метки: значение}} текущего процесса."""
+        return {
+            metric.name: metric.collect()
+            for metric in self.metrics
+            if shared or metric.per_process
+        }
+
+    def flush(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        self._flushed_at = time.monotonic()
+        data = {
+            name: [[list(labels), value] for labels, value in values.items()]
+            for name, values in self.collect(shared=False).items()
+        }
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(data, file)
+        os.replace(f'{path}.tmp', path)
+
+    def maybe_flush(self):
+        elapsed = time.monotonic() - self._flushed_at
+        if elapsed > settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def _other_processes(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            pid = int(os.path.basename(path).split('.')[0])
+            if pid == os.getpid():
+                continue
+            try:
+                with open(path) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                continue
+            yield _alive(pid), data
+
+    def aggregate(self):
+        values = self.collect()
+        by_name = {metric.name: metric for metric in self.metrics}
+        for alive, data in self._other_processes():
+            for name, samples in data.items():
+                metric = by_name.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                merged = values.setdefault(name, {})
+                for labels, value in samples:
+                    labels = tuple(labels)
+                    merged[labels] = metric.merge(merged.get(labels), value)
+        return values
+
+    def render(self):
+        values = self.aggregate()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for labels, value in sorted(values.get(metric.name, {}).items()):
+                lines.extend(metric.lines(labels, value))
+        return '\n'.join(lines) + '\n'
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def _format(name, label_names, labels, value, extra=()):
+    pairs = list(zip(label_names, labels)) + list(extra)
+    if pairs:
+        inner = ','.join(f'{key}="{_escape(item)}"' for key, item in pairs)
+        name = f'{name}{{{inner}}}'
+    return f'{name} {float(value)!r}'
+
+
+registry = Registry()
+
+
+class Metric:
+    kind = None
+
+    def __init__(
+        self, name, documentation, labels=(), callback=None, per_process=True
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.callback = callback
+        self.per_process = per_process
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def collect(self):
+        if self.callback is None:
+            with self._lock:
+                return {
+                    key: _copy(value) for key, value in self._values.items()
+                }
+        values = self.callback()
+        if not isinstance(values, dict):
+            return {(): values}
+        return {
+            key if isinstance(key, tuple) else (key,): value
+            for key, value in values.items()
+        }
+
+    def merge(self, left, right):
+        return right if left is None else left + right
+
+    def lines(self, labels, value):
+        yield _format(self.name, self.label_names, labels, value)
+
+
+def _copy(value):
+    return [list(value[0]), value[1], value[2]] if isinstance(
+        value, list
+    ) else value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self, name, documentation, labels=(), buckets=LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def merge(self, left, right):
+        if left is None:
+            return _copy(right)
+        return [
+            [a + b for a, b in zip(left[0], right[0])],
+            left[1] + right[1],
+            left[2] + right[2],
+        ]
+
+    def lines(self, labels, value):
+        counts, total, count = value
+        cumulative = 0
+        for bound, bucket in zip(self.buckets, counts):
+            cumulative += bucket
+            yield _format(
+                f'{self.name}_bucket', self.label_names, labels, cumulative,
+                (('le', repr(float(bound))),),
+            )
+        yield _format(
+            f'{self.name}_bucket', self.label_names, labels, count,
+            (('le', '+Inf'),),
+        )
+        yield _format(f'{self.name}_sum', self.label_names, labels, total)
+        yield _format(f'{self.name}_count', self.label_names, labels, count)
+
+
+class CacheStats:
+    """Счётчики попаданий для кешей без собственной статистики."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits, misses):
+        self.hits += hits
+        self.misses += misses
+
+
+_caches = {}
+
+
+def track_cache(name, cache):
+    """Учитывает попадания ``cache`` (с атрибутами hits/misses)."""
+    _caches[name] = cache
+
+
+def _cache_requests():
+    values = {}
+    for name, cache in _caches.items():
+        values[(name, 'hit')] = cache.hits
+        values[(name, 'miss')] = cache.misses
+    return values
+
+
+def _in_flight():
+    from api.throttling import limiter
+
+    return limiter.in_flight
+
+
+def _event_subscribers():
+    from api.events import hub
+
+    return hub.stats()['subscribers']
+
+
+def _job_stats(field):
+    def callback():
+        from jobs import queue
+
+        return {
+            name: row[field] for name, row in queue.stats().items()
+        }
+    return callback
+
+
+REQUESTS = Counter(
+    'http_requests_total', 'Запросы по маршрутам и действиям.',
+    ('route', 'action', 'method', 'status'),
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'Время обработки запроса.',
+    ('route', 'action'),
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Число запросов к базе на HTTP-запрос.',
+    ('route', 'action'), buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+DB_QUERIES = Counter(
+    'db_queries_total', 'Запросы к базе данных.', ('alias',),
+)
+DB_LATENCY = Histogram(
+    'db_query_duration_seconds', 'Время запросов к базе данных.', ('alias',),
+)
+IMAGE_PROCESSING = Histogram(
+    'image_processing_seconds', 'Разбор и сохранение загруженных картинок.',
+    ('field',),
+)
+Counter(
+    'cache_requests_total', 'Обращения к кешам процесса.',
+    ('cache', 'result'), callback=_cache_requests,
+)
+Gauge(
+    'http_requests_in_flight', 'Обрабатываемые сейчас запросы.',
+    callback=_in_flight,
+)
+Gauge(
+    'events_subscribers', 'Открытые потоки /api/events/.',
+    callback=_event_subscribers,
+)
+Gauge(
+    'jobs_queued', 'Готовые к выполнению фоновые задачи.', ('queue',),
+    callback=_job_stats('depth'), per_process=False,
+)
+Gauge(
+    'jobs_running', 'Выполняемые сейчас фоновые задачи.', ('queue',),
+    callback=_job_stats('running'), per_process=False,
+)
+
+_request_queries = contextvars.ContextVar('request_queries', default=None)
+
+
+def _observe_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        alias = context['connection'].alias
+        DB_QUERIES.inc(alias=alias)
+        DB_LATENCY.observe(time.perf_counter() - start, alias=alias)
+        counter = _request_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if _observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_observe_query)
+
+
+# Соединения, открытые до импорта модуля.
+for _connection in connections.all():
+    instrument_connection(None, _connection)
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched', ''
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), '')
+    return match.url_name or match.view_name or 'unnamed', action
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        request._metrics_started = time.perf_counter()
+        request._metrics_queries = [0]
+        _request_queries.set(request._metrics_queries)
+
+    def process_response(self, request, response):
+        started = getattr(request, '_metrics_started', None)
+        if started is None:
+            return response
+        _request_queries.set(None)
+        route, action = _route(request)
+        LATENCY.observe(
+            time.perf_counter() - started, route=route, action=action
+        )
+        REQUEST_QUERIES.observe(
+            request._metrics_queries[0], route=route, action=action
+        )
+        REQUESTS.inc(
+            route=route, action=action, method=request.method,
+            status=response.status_code,
+        )
+        registry.maybe_flush()
+        return response
+
+
+@require_safe
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
+
+atexit.register(registry.flush)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -45,16 +46,20 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 AUTH_USER_MODEL = 'users.User' 
 
 MIDDLEWARE = [
+    'foodgram.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -85,9 +90,18 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
+    'DEFAULT_THROTTLE_RATES': {
+        'recipe_write': '30/hour',
+        'cart_download': '20/min',
+        'ingredient_search': '300/min',
+    },
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPaginator',
     'PAGE_SIZE': 6,
 }
@@ -109,6 +123,128 @@ DJOSER = {
 }
 
 
+# Переключатели избранного, корзины и подписок:
+# 'direct' — одна идемпотентная операция на запрос,
+# 'batched' — операции копятся в очереди процесса и сбрасываются пачками.
+TOGGLE_WRITE_MODE = 'direct'
+TOGGLE_BATCH_SIZE = 64
+TOGGLE_FLUSH_INTERVAL = 0.005
+
+# Списки и детальные страницы рецептов собираются из .values() без
+# ModelSerializer (api/fastpath.py).
+FAST_READ_PATH = True
+
+# Готовый JSON рецептов без пользовательских флагов (api/fragments.py):
+# алиас кеша из CACHES и время жизни фрагмента в секундах. Включаются
+# вместе с общим для процессов кешем (CACHE_BACKEND): с LocMemCache и
+# DummyCache фрагменты не используются.
+RECIPE_FRAGMENTS = os.environ.get('RECIPE_FRAGMENTS') == '1'
+RECIPE_FRAGMENT_CACHE = 'default'
+RECIPE_FRAGMENT_TTL = 300
+
+# Наибольшее число id в пакетном чтении ?ids=1,2,3 (api/batch.py).
+BATCH_MAX_IDS = 100
+
+# Наибольшее число записей каждого вида в ответе /api/sync/.
+SYNC_BATCH_SIZE = 200
+# Сколько дней хранятся записи об удалениях для /api/sync/ (их чистит
+# manage.py prune_tombstones); более старый токен ведёт к полной
+# синхронизации.
+SYNC_TOMBSTONE_DAYS = 30
+
+# Поток событий /api/events/ под ASGI (api/events.py): размер очереди
+# клиента, интервал пустых сообщений (секунды) и предел подписчиков.
+EVENTS_QUEUE_SIZE = 100
+EVENTS_HEARTBEAT = 15
+EVENTS_MAX_SUBSCRIBERS = 1000
+
+# Очередь фоновых задач (jobs/queue.py): число воркеров run_workers,
+# пауза опроса пустой очереди, попытки и задержки повторов (секунды),
+# срок захвата задачи и как часто работающий воркер его продлевает.
+JOBS_WORKERS = 2
+JOBS_POLL_INTERVAL = 1.0
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+JOBS_RETRY_MAX_DELAY = 3600
+JOBS_LEASE = 600
+JOBS_HEARTBEAT = 60
+
+# Защита от одновременного пересчёта одинаковых ответов (api/singleflight.py):
+# алиас кеша, блокировка между процессами через кеш и её таймаут, секунды.
+SINGLE_FLIGHT_CACHE = 'default'
+SINGLE_FLIGHT_LOCK = False
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10
+# Страницы рецептов для анонимов: свежесть и сколько ещё секунд
+# отдаётся устаревшая копия, пока она пересчитывается в фоне.
+FEED_CACHE_TTL = 5
+FEED_CACHE_STALE = 30
+
+# Сжатие ответов (foodgram/compression.py). brotli и zstd включаются,
+# если установлены пакеты brotli и zstandard.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_LEVELS = {'zstd': 6, 'br': 5, 'gzip': 6}
+COMPRESSION_CACHE_SIZE = 256
+
+# Выгрузка и загрузка рецептов в JSONL (api/bulk.py): рецептов в пачке
+# и строк в одном INSERT.
+BULK_CHUNK_SIZE = 500
+BULK_INSERT_BATCH_SIZE = 500
+
+# Архив данных пользователя (api/archive.py): архив больше
+# USER_EXPORT_STREAM_LIMIT байт собирается в фоне, готовый файл
+# отдаётся по ссылке USER_EXPORT_TTL секунд, затем собирается заново.
+USER_EXPORT_STREAM_LIMIT = 200 * 1024 * 1024
+USER_EXPORT_TTL = 24 * 3600
+
+# Метрики Prometheus на /metrics (foodgram/metrics.py). При нескольких
+# процессах METRICS_DIR — общий каталог, куда каждый сбрасывает счётчики
+# раз в METRICS_FLUSH_INTERVAL секунд.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+
+# Профилирование запросов и журнал медленных запросов (api/profiling.py).
+PROFILER_SLOW_THRESHOLD = 1.0
+PROFILER_KEEP = 200
+PROFILER_MAX_QUERIES = 200
+PROFILER_SAMPLE_INTERVAL = 0.002
+
+# Админка: до скольких строк список считается точно и размер пачки
+# при выгрузке в CSV (foodgram/admin_tools.py).
+ADMIN_EXACT_COUNT_LIMIT = 10000
+ADMIN_EXPORT_CHUNK_SIZE = 2000
+
+# Асинхронные обработчики чтения (api/async_views.py); включаются
+# в foodgram/asgi.py. Запросы к базе из них идут в отдельный пул потоков.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS') == '1'
+ASYNC_DB_THREADS = 8
+
+# Время жизни снимков справочников тегов и ингредиентов, секунды.
+CATALOGUE_TTL = 300
+
+# Прогрев справочников, метаданных моделей и URL при старте воркера
+# (api/warmup.py); включается в foodgram/wsgi.py и foodgram/asgi.py.
+API_WARMUP = os.environ.get('API_WARMUP') == '1'
+
+# Кеш токенов CachedTokenAuthentication: число записей, TTL в секундах и
+# алиас кеша из CACHES для версий токенов. Кеш версий должен быть общим
+# для процессов, иначе отзыв токена виден другим процессам только через TTL.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_VERSIONS = 'default'
+
+# Хранилище маркерных корзин TokenBucketThrottle: 'local' — память
+# процесса, 'cache' — кеш Django (общий для процессов).
+THROTTLE_STORE = 'local'
+
+# Одновременные запросы процесса (api/throttling.py): общий предел,
+# пределы по областям и сколько секунд запрос ждёт в очереди до 503.
+CONCURRENCY_MAX_IN_FLIGHT = 64
+CONCURRENCY_LIMITS = {
+    'recipe_write': 4,
+    'cart_download': 4,
+}
+CONCURRENCY_QUEUE_TIMEOUT = 2.0
+
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
@@ -119,6 +255,26 @@ DATABASES = {
     }
 }
 
+# Кеш Django. По умолчанию он в памяти процесса; при нескольких воркерах
+# нужен общий (например, PyMemcacheCache и адрес memcached), без него
+# фрагменты рецептов (RECIPE_FRAGMENTS) не включаются.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Снимки базы (manage.py backup_db): каталог, сколько хранить, страниц
+# SQLite за шаг и пауза между шагами в секундах. Для PostgreSQL нужен
+# путь к pg_dump.
+BACKUP_DIR = BASE_DIR / 'backups'
+BACKUP_KEEP = 7
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.05
+BACKUP_PG_DUMP = os.environ.get('BACKUP_PG_DUMP')
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -158,6 +314,19 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Файлы хранятся один раз под именем из хеша содержимого (foodgram/storage.py).
+DEFAULT_FILE_STORAGE = 'foodgram.storage.ContentAddressedStorage'
+
+# Медиафайлы отдаёт foodgram.media.serve. За nginx байты передаются через
+# X-Accel-Redirect на internal-location MEDIA_ACCEL_PREFIX.
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT') == '1'
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Срок действия подписанных ссылок на личные файлы, в секундах.
+MEDIA_SIGNATURE_MAX_AGE = 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,153 @@
+"""Хранилище медиафайлов с адресацией по содержимому.
+
+Файл записывается под именем из SHA-256 содержимого, разложенным по
+каталогам: ``blobs/ab/cd/abcd….png``. Хеш считается при потоковой
+записи во временный файл, поэтому повторная загрузка той же картинки
+не создаёт копию, а имя (и URL) файла никогда не меняет содержимое —
+его можно кешировать навсегда (``Cache-Control: immutable``).
+
+Один файл может использоваться несколькими объектами, поэтому удаляется
+он, только когда на него не осталось ссылок: ``references`` считает
+значения во всех файловых полях моделей, использующих это хранилище.
+Сигналы ниже освобождают файл при замене или удалении объекта;
+подключаются они в ``RecipesConfig.ready``.
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+BLOBS_DIR = 'blobs'
+CHUNK_SIZE = 64 * 1024
+# Файл, который только что записали или переиспользовали, не удаляется
+# столько секунд: ссылка на него может быть ещё не зафиксирована.
+GRACE_PERIOD = 300
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """``FileSystemStorage`` с именами по хешу содержимого."""
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым в _save, занятость не проверяется.
+        return name
+
+    def blob_name(self, digest, name):
+        extension = os.path.splitext(name)[1].lower()
+        return '/'.join(
+            (BLOBS_DIR, digest[:2], digest[2:4], digest + extension)
+        )
+
+    def _save(self, name, content):
+        tmp_dir = self.path(os.path.join(BLOBS_DIR, 'tmp'))
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek') and content.seekable():
+                    content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            blob = self.blob_name(digest.hexdigest(), name)
+            path = self.path(blob)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                os.utime(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return blob
+
+
+_fields = None
+
+
+def tracked_fields():
+    """Файловые поля моделей, хранящие файлы в ``ContentAddressedStorage``."""
+    global _fields
+    if _fields is None:
+        _fields = [
+            (model, field)
+            for model in apps.get_models()
+            for field in model._meta.concrete_fields
+            if isinstance(field, models.FileField)
+            and isinstance(field.storage, ContentAddressedStorage)
+        ]
+    return _fields
+
+
+def references(name):
+    """Число объектов, ссылающихся на файл ``name``."""
+    return sum(
+        model._base_manager.filter(**{field.name: name}).count()
+        for model, field in tracked_fields()
+    )
+
+
+def is_recent(storage, name):
+    try:
+        modified = os.path.getmtime(storage.path(name))
+        return time.time() - modified < GRACE_PERIOD
+    except FileNotFoundError:
+        return False
+
+
+def release(storage, name):
+    """Удаляет файл, если на него больше не ссылается ни один объект.
+
+    Недавно записанные файлы остаются; их подчищает ``prune_media``.
+    """
+    if name and references(name) == 0 and not is_recent(storage, name):
+        storage.delete(name)
+
+
+def _release_on_commit(field, name):
+    transaction.on_commit(lambda: release(field.storage, name))
+
+
+def _model_fields(sender):
+    return [field for model, field in tracked_fields() if model is sender]
+
+
+@receiver(pre_save)
+def remember_files(sender, instance, update_fields=None, **kwargs):
+    fields = _model_fields(sender)
+    if update_fields is not None:
+        fields = [field for field in fields if field.name in update_fields]
+    if not fields or instance.pk is None:
+        return
+    instance._stored_files = sender._base_manager.filter(
+        pk=instance.pk
+    ).values(*(field.name for field in fields)).first()
+
+
+@receiver(post_save)
+def release_replaced_files(sender, instance, **kwargs):
+    old = instance.__dict__.pop('_stored_files', None)
+    if not old:
+        return
+    for field in _model_fields(sender):
+        name = old.get(field.name)
+        if name and name != getattr(instance, field.name).name:
+            _release_on_commit(field, name)
+
+
+@receiver(post_delete)
+def release_deleted_files(sender, instance, **kwargs):
+    for field in _model_fields(sender):
+        name = getattr(instance, field.name).name
+        if name:
+            _release_on_commit(field, name)
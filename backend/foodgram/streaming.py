@@ -0,0 +1,78 @@
+"""Потоковые ответы под ASGI.
+
+Django 3.2 перебирает ``StreamingHttpResponse`` прямо в цикле событий:
+генератор, который обращается к базе (выгрузка рецептов, архив данных
+пользователя, CSV из админки), падает с ``SynchronousOnlyOperation``
+уже после отправленного заголовка 200, и тело остаётся пустым.
+
+``ASGIHandler`` ниже забирает части таких ответов в отдельном потоке —
+своём на каждый ответ, чтобы все запросы генератора шли через одно
+соединение с базой; по окончании они закрываются в том же потоке. Цикл
+событий, пока генератор работает, свободен.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+from django.db import connections
+
+_END = object()
+
+
+def _headers(response):
+    headers = []
+    for header, value in response.items():
+        if isinstance(header, str):
+            header = header.encode('ascii')
+        if isinstance(value, str):
+            value = value.encode('latin1')
+        headers.append((bytes(header), bytes(value)))
+    for cookie in response.cookies.values():
+        headers.append(
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+        )
+    return headers
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """``ASGIHandler``, перебирающий потоковые ответы вне цикла событий."""
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': _headers(response),
+        })
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='streaming-response'
+        )
+        parts = iter(response)
+        try:
+            while True:
+                part = await loop.run_in_executor(
+                    executor, next, parts, _END
+                )
+                if part is _END:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            await send({'type': 'http.response.body'})
+        finally:
+            await loop.run_in_executor(executor, connections.close_all)
+            executor.shutdown(wait=False)
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_asgi_application():
+    """Как ``django.core.asgi.get_asgi_application``, но с ``ASGIHandler``."""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
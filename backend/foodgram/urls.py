@@ -1,7 +1,18 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from foodgram.media import serve
+from foodgram.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
-]
\ No newline at end of file
+    path('metrics', metrics_view, name='metrics'),
+    re_path(
+        r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'),
+        serve,
+        name='media',
+    ),
+    path('', include('recipes.urls')),
+]
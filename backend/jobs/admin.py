@@ -0,0 +1,20 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'name', 'queue', 'status', 'attempts', 'run_at',
+        'created_at', 'finished_at',
+    )
+    list_filter = ('status', 'queue', 'name')
+    readonly_fields = ('locked_by', 'started_at', 'finished_at', 'last_error')
+    actions = ('retry',)
+
+    @admin.action(description='Повторить')
+    def retry(self, request, queryset):
+        queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, last_error=''
+        )
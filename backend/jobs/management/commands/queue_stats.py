@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = 'Показывает глубину очередей фоновых задач и задержки'
+
+    def handle(self, *args, **options):
+        stats = queue.stats()
+        if not stats:
+            self.stdout.write('Задач нет')
+            return
+        self.stdout.write(
+            f'{"очередь":<16}{"готово":>8}{"отложено":>10}{"идёт":>6}'
+            f'{"ошибок":>8}{"старейшая, с":>14}{"ожидание, с":>13}'
+        )
+        for name, row in stats.items():
+            self.stdout.write(
+                f'{name:<16}{row["depth"]:>8}{row["delayed"]:>10}'
+                f'{row["running"]:>6}{row["failed"]:>8}'
+                f'{row["oldest"]:>14.1f}{row["wait"]:>13.1f}'
+            )
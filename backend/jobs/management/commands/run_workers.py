@@ -0,0 +1,95 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs import queue
+
+logger = logging.getLogger(__name__)
+
+
+def _work(queues, poll, burst, stop):
+    """Цикл воркера: забирает и выполняет задачи до сигнала ``stop``."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    # Соединение, унаследованное от родителя, использовать нельзя.
+    connections.close_all()
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    last_reaped = 0
+    while not stop.is_set():
+        close_old_connections()
+        if time.monotonic() - last_reaped > settings.JOBS_LEASE / 2:
+            queue.requeue_stale()
+            last_reaped = time.monotonic()
+        job = queue.claim(queues, worker)
+        if job is None:
+            if burst:
+                return
+            stop.wait(poll)
+            continue
+        queue.run(job)
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOBS_WORKERS,
+            help='Число процессов-воркеров',
+        )
+        parser.add_argument(
+            '--queues', default='default',
+            help='Очереди через запятую',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=settings.JOBS_POLL_INTERVAL,
+            help='Пауза в секундах, когда задач нет',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Завершиться, когда очередь опустеет',
+        )
+
+    def handle(self, *args, **options):
+        queues = [name.strip() for name in options['queues'].split(',')]
+        stop = multiprocessing.Event()
+        connections.close_all()
+
+        def spawn():
+            process = multiprocessing.Process(
+                target=_work,
+                args=(queues, options['poll'], options['burst'], stop),
+                daemon=True,
+            )
+            process.start()
+            return process
+
+        def shutdown(*args):
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+        processes = [spawn() for _ in range(options['workers'])]
+        self.stdout.write(
+            f'Воркеров: {len(processes)}, очереди: {", ".join(queues)}'
+        )
+        while processes:
+            for process in list(processes):
+                process.join(timeout=0.5)
+                if process.is_alive():
+                    continue
+                processes.remove(process)
+                if process.exitcode and not stop.is_set():
+                    logger.error(
+                        'Воркер %s завершился с кодом %s, перезапуск',
+                        process.pid, process.exitcode,
+                    )
+                    processes.append(spawn())
+        self.stdout.write('Воркеры остановлены')
@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-19 11:00
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_lease_until(apps, schema_editor):
+    Job = apps.get_model('jobs', 'Job')
+    Job.objects.filter(status='running').update(
+        lease_until=F('started_at') + timedelta(seconds=settings.JOBS_LEASE)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Захвачена до'),
+        ),
+        migrations.RunPython(fill_lease_until, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    queue = models.CharField(
+        max_length=50,
+        default='default',
+        verbose_name='Очередь',
+    )
+    name = models.CharField(max_length=100, verbose_name='Обработчик')
+    payload = models.JSONField(default=dict, verbose_name='Аргументы')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='Статус',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Попыток'
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5, verbose_name='Наибольшее число попыток'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Выполнить не раньше'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name='Создана'
+    )
+    started_at = models.DateTimeField(
+        null=True, blank=True, verbose_name='Начата'
+    )
+    finished_at = models.DateTimeField(
+        null=True, blank=True, verbose_name='Завершена'
+    )
+    locked_by = models.CharField(
+        max_length=100, blank=True, default='', verbose_name='Воркер'
+    )
+    lease_until = models.DateTimeField(
+        null=True, blank=True, verbose_name='Захвачена до'
+    )
+    result = models.JSONField(null=True, blank=True, verbose_name='Результат')
+    last_error = models.TextField(
+        blank=True, default='', verbose_name='Последняя ошибка'
+    )
+
+    class Meta:
+        ordering = ('-id',)
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(
+                fields=('status', 'queue', 'run_at'),
+                name='job_claim_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,271 @@
+"""Очередь фоновых задач в таблице ``Job``.
+
+Обработчик регистрируется декоратором ``handler`` в модуле ``tasks.py``
+приложения и ставится в очередь через ``enqueue``::
+
+    @handler('recipes.notify_followers')
+    def notify_followers(recipe_id):
+        ...
+
+    enqueue('recipes.notify_followers', recipe_id=recipe.pk)
+
+Воркеры (``manage.py run_workers``) забирают задачи построчно: на
+PostgreSQL — ``SELECT ... FOR UPDATE SKIP LOCKED``, на SQLite — одним
+``UPDATE ... WHERE id IN (SELECT ... LIMIT 1)`` с меткой захвата.
+Упавшая задача повторяется с экспоненциальной задержкой до
+``max_attempts`` раз.
+
+Захват задачи действует до ``lease_until``: пока обработчик работает,
+поток-пульс каждые ``JOBS_HEARTBEAT`` секунд продлевает его на
+``JOBS_LEASE`` секунд. Задача с истёкшим захватом — её воркер умер —
+возвращается в очередь, а если попытки исчерпаны, помечается упавшей.
+"""
+import logging
+import random
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def handler(name):
+    """Регистрирует функцию как обработчик задач ``name``."""
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, queue='default', delay=0, max_attempts=None, **payload):
+    """Ставит задачу в очередь; аргументы должны сериализоваться в JSON."""
+    if name not in _handlers:
+        raise LookupError(f'Нет обработчика задач {name!r}')
+    return Job.objects.create(
+        name=name,
+        queue=queue,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def enqueue_on_commit(name, **kwargs):
+    """``enqueue`` после фиксации текущей транзакции."""
+    transaction.on_commit(lambda: enqueue(name, **kwargs))
+
+
+def _lease():
+    return timezone.now() + timedelta(seconds=settings.JOBS_LEASE)
+
+
+def _ready(queues):
+    return Job.objects.filter(
+        status=Job.QUEUED, queue__in=queues, run_at__lte=timezone.now()
+    ).order_by('run_at', 'id')
+
+
+def _claim_skip_locked(queues, worker):
+    with transaction.atomic():
+        job = _ready(queues).select_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.locked_by = worker
+        job.started_at = timezone.now()
+        job.lease_until = _lease()
+        job.attempts += 1
+        job.save(update_fields=(
+            'status', 'locked_by', 'started_at', 'lease_until', 'attempts'
+        ))
+        return job
+
+
+def _claim_update(queues, worker):
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'
+    claimed = Job.objects.filter(
+        pk__in=_ready(queues).values('pk')[:1], status=Job.QUEUED
+    ).update(
+        status=Job.RUNNING,
+        locked_by=token,
+        started_at=timezone.now(),
+        lease_until=_lease(),
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return None
+    return Job.objects.get(locked_by=token, status=Job.RUNNING)
+
+
+def claim(queues, worker):
+    """Забирает одну готовую задачу из ``queues`` или возвращает None."""
+    if connection.features.has_select_for_update_skip_locked:
+        return _claim_skip_locked(queues, worker)
+    return _claim_update(queues, worker)
+
+
+def backoff(attempts):
+    """Задержка перед повтором в секундах: 2^n * JOBS_RETRY_DELAY ± 10%."""
+    delay = min(
+        settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOBS_RETRY_MAX_DELAY,
+    )
+    return delay * random.uniform(0.9, 1.1)
+
+
+def extend(job):
+    """Продлевает захват ``job``; False, если задача уже не за воркером."""
+    return bool(Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by
+    ).update(lease_until=_lease()))
+
+
+class _Heartbeat(threading.Thread):
+    """Продлевает захват задачи, пока выполняется блок ``with``."""
+
+    def __init__(self, job):
+        super().__init__(name=f'job-heartbeat-{job.pk}', daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.JOBS_HEARTBEAT):
+                try:
+                    if not extend(self.job):
+                        logger.warning('Задача %s потеряла захват', self.job)
+                        return
+                except Exception:
+                    logger.exception('Не удалось продлить задачу %s', self.job)
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.join()
+
+
+def _finish(job, worker, fields):
+    """Записывает итог ``job``, только пока захват за ``worker``.
+
+    С истёкшим захватом задачу мог вернуть в очередь ``requeue_stale`` и
+    забрать другой воркер; его состояние не перетирается.
+    """
+    updated = Job.objects.filter(
+        pk=job.pk,
+        status=Job.RUNNING,
+        locked_by=worker,
+        lease_until__gt=timezone.now(),
+    ).update(**{field: getattr(job, field) for field in fields})
+    if not updated:
+        logger.warning('Задача %s потеряла захват, итог не записан', job)
+    return bool(updated)
+
+
+def run(job):
+    """Выполняет захваченную задачу и записывает итог.
+
+    Возвращает True, если задача выполнена и итог записан.
+    """
+    now = timezone.now
+    worker = job.locked_by
+    try:
+        func = _handlers[job.name]
+        with _Heartbeat(job):
+            result = func(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = now() + timedelta(seconds=backoff(job.attempts))
+            logger.warning(
+                'Задача %s упала (попытка %s), повтор в %s',
+                job, job.attempts, job.run_at,
+            )
+        else:
+            job.status = Job.FAILED
+            job.finished_at = now()
+            logger.error('Задача %s не выполнена:\n%s', job, job.last_error)
+        job.locked_by = ''
+        job.lease_until = None
+        _finish(job, worker, (
+            'status', 'run_at', 'finished_at', 'locked_by', 'lease_until',
+            'last_error',
+        ))
+        return False
+    job.status = Job.DONE
+    job.result = result
+    job.finished_at = now()
+    job.lease_until = None
+    return _finish(
+        job, worker, ('status', 'result', 'finished_at', 'lease_until')
+    )
+
+
+def requeue_stale():
+    """Разбирает задачи с истёкшим захватом: их воркер пропал.
+
+    Задача с оставшимися попытками возвращается в очередь, с
+    исчерпанными — помечается упавшей. Возвращает число возвращённых.
+    """
+    now = timezone.now()
+    expired = Job.objects.filter(status=Job.RUNNING, lease_until__lt=now)
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        finished_at=now,
+        locked_by='',
+        lease_until=None,
+        last_error='Воркер пропал, попытки исчерпаны',
+    )
+    if failed:
+        logger.error('Задач без воркера и попыток: %s', failed)
+    return expired.update(
+        status=Job.QUEUED, locked_by='', lease_until=None, run_at=now
+    )
+
+
+def stats(window=timedelta(hours=1)):
+    """Глубина очередей и задержки, в секундах, по каждой очереди.
+
+    ``depth`` — готовые к выполнению задачи, ``delayed`` — ждущие
+    повтора, ``oldest`` — возраст самой старой готовой задачи,
+    ``wait`` — среднее ожидание задач, начатых за ``window``.
+    """
+    now = timezone.now()
+    rows = Job.objects.values('queue').annotate(
+        depth=Count('id', filter=Q(status=Job.QUEUED, run_at__lte=now)),
+        delayed=Count('id', filter=Q(status=Job.QUEUED, run_at__gt=now)),
+        running=Count('id', filter=Q(status=Job.RUNNING)),
+        failed=Count('id', filter=Q(status=Job.FAILED)),
+        oldest=Min('run_at', filter=Q(status=Job.QUEUED, run_at__lte=now)),
+    ).order_by('queue')
+    waits = dict(
+        Job.objects
+        .filter(started_at__gte=now - window)
+        .values('queue')
+        .annotate(wait=Avg(F('started_at') - F('run_at')))
+        .values_list('queue', 'wait')
+    )
+    result = {}
+    for row in rows:
+        queue = row.pop('queue')
+        oldest = row.pop('oldest')
+        wait = waits.get(queue)
+        row['oldest'] = (now - oldest).total_seconds() if oldest else 0.0
+        row['wait'] = wait.total_seconds() if wait else 0.0
+        result[queue] = row
+    return result
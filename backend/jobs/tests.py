@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+
+
+@queue.handler('jobs.tests.noop')
+def noop():
+    return 'ok'
+
+
+@queue.handler('jobs.tests.fail')
+def fail():
+    raise RuntimeError('fail')
+
+
+class LeaseTests(TestCase):
+
+    def claim(self, **fields):
+        Job.objects.create(name='jobs.tests.noop', **fields)
+        return queue.claim(['default'], 'worker')
+
+    def expire(self, job):
+        Job.objects.filter(pk=job.pk).update(
+            lease_until=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_claim_sets_lease(self):
+        job = self.claim()
+        self.assertGreater(job.lease_until, timezone.now())
+
+    def test_live_lease_is_kept(self):
+        # Долгая задача: начата давно, но пульс продлевает захват.
+        job = self.claim()
+        Job.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(queue.requeue_stale(), 0)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.RUNNING)
+
+    def test_expired_lease_is_requeued(self):
+        job = self.claim()
+        self.expire(job)
+        self.assertEqual(queue.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.locked_by, '')
+        self.assertIsNone(job.lease_until)
+
+    def test_exhausted_attempts_fail(self):
+        job = self.claim(max_attempts=1)
+        self.expire(job)
+        self.assertEqual(queue.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(JOBS_LEASE=3600)
+    def test_extend(self):
+        job = self.claim()
+        self.expire(job)
+        self.assertTrue(queue.extend(job))
+        self.assertEqual(queue.requeue_stale(), 0)
+        Job.objects.filter(pk=job.pk).update(locked_by='other')
+        self.assertFalse(queue.extend(job))
+
+    def test_run_clears_lease(self):
+        job = self.claim()
+        self.assertTrue(queue.run(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (Job.DONE, 'ok'))
+        self.assertIsNone(job.lease_until)
+
+    def test_result_after_lost_lease_is_dropped(self):
+        # Захват истёк, задачу вернули в очередь и забрал другой воркер.
+        job = self.claim()
+        self.expire(job)
+        queue.requeue_stale()
+        other = queue.claim(['default'], 'other')
+        self.assertFalse(queue.run(job))
+        other.refresh_from_db()
+        self.assertEqual(other.status, Job.RUNNING)
+        self.assertTrue(other.locked_by.startswith('other'))
+        self.assertIsNone(other.result)
+
+    def test_expired_lease_result_is_dropped(self):
+        job = self.claim()
+        self.expire(job)
+        self.assertFalse(queue.run(job))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.RUNNING)
+
+    def test_failure_after_lost_lease_is_dropped(self):
+        Job.objects.create(name='jobs.tests.fail')
+        job = queue.claim(['default'], 'worker')
+        Job.objects.filter(pk=job.pk).update(locked_by='other')
+        self.assertFalse(queue.run(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), (Job.RUNNING, ''))
@@ -1,6 +1,18 @@
 from django.contrib import admin
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
-from .models import Ingredient, Recipe, Tag, ShoppingCart, Favorite
+from foodgram.admin_tools import ScalableAdminMixin
+
+from .models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    Tag,
+    ShoppingCart,
+    Favorite,
+)
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -10,26 +22,80 @@ class TagAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = (
         'id', 'name', 'measurement_unit'
     )
     search_fields = ('name',)
+    export_fields = ('id', 'name', 'measurement_unit')
+
+
+class RecipeIngredientInline(admin.TabularInline):
+    model = RecipeIngredient
+    autocomplete_fields = ('ingredient',)
+    extra = 1
+    min_num = 1
+
+
+class RecipeTagInline(admin.TabularInline):
+    model = RecipeTag
+    autocomplete_fields = ('tag',)
+    extra = 1
+    min_num = 1
+
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = (
-        'id', 'name', 'author', 'cooking_time', 'created'
+        'id', 'name', 'author', 'cooking_time', 'created', 'favorites_count'
     )
-    search_fields = ('name', 'author__username', 'tags__name')
+    list_select_related = ('author',)
+    # Поиск по tags__name дублировал строки и требовал DISTINCT.
+    search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author',)
+    inlines = (RecipeIngredientInline, RecipeTagInline)
+    export_fields = (
+        'id',
+        'name',
+        ('author', 'author__username'),
+        'cooking_time',
+        'created',
+        'favorites_count',
+    )
+
+    def get_queryset(self, request):
+        # Подзапрос вместо JOIN + GROUP BY: не размножает строки и не
+        # мешает подсчёту строк пагинатором.
+        favorites = Favorite.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(count=Count('id'))
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(
+                Subquery(favorites.values('count')), 0,
+                output_field=IntegerField(),
+            )
+        )
+
+    @admin.display(description='В избранном', ordering='favorites_count')
+    def favorites_count(self, obj):
+        return obj.favorites_count
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    export_fields = (
+        'id', ('user', 'user__username'), ('recipe', 'recipe__name')
+    )
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
-
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    export_fields = (
+        'id', ('user', 'user__username'), ('recipe', 'recipe__name')
+    )
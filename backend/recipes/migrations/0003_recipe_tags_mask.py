@@ -0,0 +1,34 @@
+# Generated by Django 3.2 on 2026-10-19 10:16
+
+from django.db import migrations, models
+
+TAGS_MASK_BITS = 63
+
+
+def fill_tags_mask(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeTag = apps.get_model('recipes', 'RecipeTag')
+    masks = {}
+    for recipe_id, tag_id in RecipeTag.objects.values_list('recipe_id', 'tag_id'):
+        if 0 < tag_id <= TAGS_MASK_BITS:
+            masks[recipe_id] = masks.get(recipe_id, 0) | 1 << (tag_id - 1)
+    recipes = list(Recipe.objects.filter(pk__in=masks).only('pk'))
+    for recipe in recipes:
+        recipe.tags_mask = masks[recipe.pk]
+    Recipe.objects.bulk_update(recipes, ['tags_mask'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_add_short_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Битовая маска тегов'),
+        ),
+        migrations.RunPython(fill_tags_mask, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2 on 2026-10-19 10:23
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_updated_at(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(updated_at=F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_tags_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('recipe', 'Рецепт'), ('favorite', 'Избранное'), ('shopping_cart', 'Список покупок')], max_length=16, verbose_name='Тип')),
+                ('recipe_id', models.BigIntegerField(verbose_name='id рецепта')),
+                ('user_id', models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='id пользователя')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Удалён')),
+            ],
+            options={
+                'verbose_name': 'Удаление',
+                'verbose_name_plural': 'Удаления',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Изменён'),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
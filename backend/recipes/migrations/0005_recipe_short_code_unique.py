@@ -0,0 +1,41 @@
+# Generated by Django 3.2 on 2026-10-19 11:13
+
+import secrets
+
+from django.db import migrations, models
+import recipes.models
+
+
+def fill_short_codes(apps, schema_editor):
+    """Коды пустым и повторяющимся short_code; первый из повторов остаётся."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    used = set()
+    changed = []
+    for recipe in Recipe.objects.order_by('pk').only('pk', 'short_code'):
+        if recipe.short_code and recipe.short_code not in used:
+            used.add(recipe.short_code)
+            continue
+        changed.append(recipe)
+    for recipe in changed:
+        code = secrets.token_urlsafe(6)
+        while code in used:
+            code = secrets.token_urlsafe(6)
+        used.add(code)
+        recipe.short_code = code
+    Recipe.objects.bulk_update(changed, ('short_code',), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_updated_at_tombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_short_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_code',
+            field=models.CharField(default=recipes.models.new_short_code, max_length=20, unique=True),
+        ),
+    ]
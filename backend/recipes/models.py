@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+import secrets
 import uuid
 from django.db import models
 from colorfield.fields import ColorField
@@ -7,6 +8,29 @@ from django.core.validators import MinValueValidator
 User = get_user_model()
 
 
+def new_short_code():
+    """Случайный код короткой ссылки и ключ рецепта в api/bulk.py."""
+    return secrets.token_urlsafe(6)
+
+
+# Теги с id от 1 до 63 кодируются битами Recipe.tags_mask (бит id - 1).
+TAGS_MASK_BITS = 63
+
+
+def tag_bit(tag_id):
+    """Бит тега в ``Recipe.tags_mask`` или 0, если тег в маску не входит."""
+    if 0 < tag_id <= TAGS_MASK_BITS:
+        return 1 << (tag_id - 1)
+    return 0
+
+
+def tags_mask(tag_ids):
+    mask = 0
+    for tag_id in tag_ids:
+        mask |= tag_bit(tag_id)
+    return mask
+
+
 class Tag(models.Model):
     name = models.CharField(
         max_length=50,
@@ -98,11 +122,24 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    # Теги и ингредиенты пишутся в одной транзакции с рецептом; правки
+    # тегов и справочников сдвигают его через recipes/signals.py. По нему
+    # работает /api/sync/.
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Изменён',
+    )
 
     short_code = models.CharField(
         max_length=20,
-        blank=True,
-        default=""
+        unique=True,
+        default=new_short_code,
+    )
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Битовая маска тегов',
     )
 
 
@@ -214,4 +251,44 @@ class Favorite(models.Model):
                 fields=('user', 'recipe'),
                 name='unique_favorite'
             )
-        ]
\ No newline at end of file
+        ]
+
+
+class Tombstone(models.Model):
+    """Запись об удалении рецепта или его удалении из избранного/корзины."""
+
+    RECIPE = 'recipe'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    KINDS = (
+        (RECIPE, 'Рецепт'),
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+    )
+
+    kind = models.CharField(
+        max_length=16,
+        choices=KINDS,
+        verbose_name='Тип',
+    )
+    recipe_id = models.BigIntegerField(verbose_name='id рецепта')
+    # Без внешнего ключа: записи создаются и при каскадном удалении
+    # самого пользователя.
+    user_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='id пользователя',
+    )
+    deleted_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Удалён',
+    )
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Удаление'
+        verbose_name_plural = 'Удаления'
+
+    def __str__(self):
+        return f'{self.kind} {self.recipe_id}'
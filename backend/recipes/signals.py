@@ -0,0 +1,167 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeTag,
+    ShoppingCart,
+    Tag,
+    Tombstone,
+    tag_bit,
+)
+
+User = get_user_model()
+
+# Поля автора, которые входят в ответ о рецепте.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name', 'avatar')
+
+
+def _clear_bit(tag_id):
+    bit = tag_bit(tag_id)
+    if bit:
+        Recipe.objects.filter(
+            tags_mask__gt=0
+        ).update(tags_mask=F('tags_mask').bitand(~bit))
+
+
+@receiver(post_delete, sender=Tag)
+def clear_tag_bit(instance, **kwargs):
+    """Снимает бит удалённого тега с рецептов."""
+    _clear_bit(instance.id)
+
+
+def refresh_tags_mask(recipe_ids):
+    """Пересчитывает ``tags_mask`` рецептов по их тегам; возвращает маски."""
+    recipe_ids = set(recipe_ids)
+    masks = dict.fromkeys(recipe_ids, 0)
+    rows = RecipeTag.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'tag_id')
+    for recipe_id, tag_id in rows:
+        masks[recipe_id] |= tag_bit(tag_id)
+    by_mask = defaultdict(list)
+    for recipe_id, mask in masks.items():
+        by_mask[mask].append(recipe_id)
+    for mask, ids in by_mask.items():
+        Recipe.objects.filter(pk__in=ids).update(tags_mask=mask)
+    return masks
+
+
+# Массовые вставки RecipeTag (bulk_create) сигналов не вызывают, поэтому
+# api/bulk.py задаёт маску сам.
+@receiver(post_save, sender=RecipeTag)
+@receiver(post_delete, sender=RecipeTag)
+def update_tags_mask(instance, **kwargs):
+    refresh_tags_mask([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_tags_mask_m2m(instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.tags_mask = refresh_tags_mask([instance.pk])[instance.pk]
+    elif pk_set is not None:
+        refresh_tags_mask(pk_set)
+    else:
+        _clear_bit(instance.pk)
+
+
+def touch(recipes):
+    """Обновляет ``updated_at`` рецептов (queryset)."""
+    recipes.update(updated_at=timezone.now())
+
+
+# Теги и ингредиенты самого рецепта пишутся вместе с ним в одной
+# транзакции (RecipeWriteSerializer, админка, api/bulk.py): updated_at
+# сдвигает сохранение рецепта, а не каждая строка RecipeIngredient и
+# RecipeTag. Здесь — только изменения со стороны тегов и справочников.
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_tagged_recipes(instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_') or not reverse:
+        return
+    if pk_set is not None:
+        touch(Recipe.objects.filter(pk__in=pk_set))
+    else:
+        touch(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Tag)
+def touch_tag_recipes(instance, created, **kwargs):
+    if not created:
+        touch(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_ingredient_recipes(instance, created, **kwargs):
+    if not created:
+        touch(Recipe.objects.filter(ingredients=instance))
+
+
+def _author_values(values):
+    # Пустое имя файла и NULL у аватара равнозначны.
+    *fields, avatar = values
+    return (*fields, avatar or None)
+
+
+@receiver(pre_save, sender=User)
+def remember_author(instance, update_fields=None, **kwargs):
+    """Запоминает поля автора до сохранения для ``touch_author_recipes``."""
+    instance._author_values = None
+    if instance.pk is None or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    row = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*AUTHOR_FIELDS).first()
+    if row is not None:
+        instance._author_values = _author_values(row)
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(instance, **kwargs):
+    """Автор входит в ответ о рецепте: его правка меняет рецепты."""
+    old = getattr(instance, '_author_values', None)
+    new = _author_values(
+        [getattr(instance, field) for field in AUTHOR_FIELDS[:-1]]
+        + [instance.avatar.name]
+    )
+    if old is not None and old != new:
+        touch(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_delete, sender=Recipe)
+def bury_recipe(instance, **kwargs):
+    Tombstone.objects.create(kind=Tombstone.RECIPE, recipe_id=instance.pk)
+
+
+@receiver(post_delete, sender=Favorite)
+def bury_favorite(instance, **kwargs):
+    Tombstone.objects.create(
+        kind=Tombstone.FAVORITE,
+        recipe_id=instance.recipe_id,
+        user_id=instance.user_id,
+    )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def bury_shopping_cart(instance, **kwargs):
+    Tombstone.objects.create(
+        kind=Tombstone.SHOPPING_CART,
+        recipe_id=instance.recipe_id,
+        user_id=instance.user_id,
+    )
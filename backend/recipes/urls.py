@@ -1,5 +1,10 @@
+from django.conf import settings
 from django.urls import path
-from recipes.views import redirect_short_link
+
+if settings.ASYNC_READ_VIEWS:
+    from api.async_views import redirect_short_link
+else:
+    from recipes.views import redirect_short_link
 
 urlpatterns = [
     path(
@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
+from foodgram.admin_tools import ScalableAdminMixin
+
 from .models import User
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ScalableAdminMixin, BaseUserAdmin):
     list_display = (
         'id',
         'email',
@@ -24,4 +27,13 @@ class UserAdmin(BaseUserAdmin):
         'is_active',
         'groups'
     )
-    ordering = ('id',)
\ No newline at end of file
+    ordering = ('id',)
+    export_fields = (
+        'id',
+        'email',
+        'username',
+        'first_name',
+        'last_name',
+        'is_staff',
+        'date_joined',
+    )